@@ -0,0 +1,340 @@
+"""
+Applying Exotel call status events to the database.
+
+Shared by POST /api/calls/webhook (inline mode), the webhook queue worker
+(`manage.py process_webhooks`) and the stuck-call sync job, so nothing here
+depends on the request. Exotel prices missing from a webhook are looked up by
+the `exotel_price` background job (`manage.py runworker`).
+"""
+from datetime import datetime
+
+from django.conf import settings
+from django.db import transaction
+
+from api.call_stats import TERMINAL_CALL_STATUSES, record_terminal_calls
+from api.db_utils import execute_query, execute_insert, execute_update
+from api.entitlements import invalidate_entitlements
+from api.exotel_client import parse_price, get_call_details
+from api.jobs import enqueue, job
+from api.metrics import bump_daily_metrics, record_completed_call
+
+
+def _mark_webhook_processed(webhook_log_id):
+    if webhook_log_id:
+        execute_update("UPDATE webhook_logs SET processed = 1 WHERE id = %s", [webhook_log_id])
+
+
+# One row per (user, minutes) pair; each user's total comes off their
+# earliest-expiring active credit allocation. The derived table is grouped, so
+# MySQL materialises it before updating user_call_credits.
+_DEDUCT_CREDITS_SQL = """
+    UPDATE user_call_credits c
+    JOIN (
+        SELECT t.user_id, SUM(t.minutes) AS minutes,
+               (SELECT cc.id FROM user_call_credits cc
+                WHERE cc.user_id = t.user_id
+                  AND cc.credits_remaining > 0
+                  AND cc.expires_at > NOW()
+                ORDER BY cc.expires_at ASC
+                LIMIT 1) AS credit_id
+        FROM ({usage}) t
+        GROUP BY t.user_id
+    ) d ON c.id = d.credit_id
+    SET c.credits_remaining = GREATEST(0, c.credits_remaining - d.minutes),
+        c.last_used_at = NOW(),
+        c.updated_at = NOW()
+"""
+
+# call_sessions columns written on settlement, in the order _session_values() returns them
+_SETTLED_COLUMNS = (
+    'status', 'duration', 'cost', 'exotel_price', 'ended_at', 'recording_url',
+    'conversation_duration', 'leg1_status', 'leg1_duration', 'leg2_status', 'leg2_duration',
+)
+
+
+def _session_values(event):
+    legs = event.get('legs') or []
+    return [
+        event['status'],
+        event['duration'],
+        event['cost'],
+        event.get('exotel_price'),
+        event.get('ended_at'),
+        event.get('recording_url') or None,
+        event.get('conversation_duration') or 0,
+        legs[0].get('Status') if len(legs) > 0 else None,
+        legs[0].get('OnCallDuration', 0) if len(legs) > 0 else 0,
+        legs[1].get('Status') if len(legs) > 1 else None,
+        legs[1].get('OnCallDuration', 0) if len(legs) > 1 else 0,
+    ]
+
+
+def _update_settled_sessions(settled):
+    """One UPDATE for all settled (session, event) pairs, a CASE per column"""
+    rows = [(s['id'], _session_values(event)) for s, event in settled]
+    assignments = []
+    params = []
+    for index, column in enumerate(_SETTLED_COLUMNS):
+        value_sql = 'COALESCE(%s, NOW())' if column == 'ended_at' else '%s'
+        assignments.append(f"{column} = CASE id {' '.join([f'WHEN %s THEN {value_sql}'] * len(rows))} END")
+        for session_id, values in rows:
+            params += [session_id, values[index]]
+
+    ids = [session_id for session_id, _ in rows]
+    execute_update(f"""
+        UPDATE call_sessions
+        SET {', '.join(assignments)}, updated_at = NOW()
+        WHERE id IN ({', '.join(['%s'] * len(ids))})
+    """, params + ids)
+
+
+def settle_terminal_calls(events, reason='Call completed', webhook_log_id=None):
+    """
+    Settle calls that reached a terminal status, each exactly once.
+
+    `events` are dicts with call_sid, status and duration, and optionally
+    exotel_price, ended_at (default NOW()), recording_url,
+    conversation_duration and legs.
+
+    One transaction holding the sessions' row locks covers the session
+    updates, the call_logs rows, the credit deductions, the credit log
+    entries, the call stats rollup and marking the webhook row processed,
+    with one statement per step however many calls are settled. Sessions that
+    are already terminal (a duplicate or replayed event, or the sync job got
+    there first) are left alone.
+
+    Returns {call_sid: 'processed' | 'duplicate' | 'no_session'}.
+    """
+    events = {event['call_sid']: event for event in events}
+    outcomes = {call_sid: 'no_session' for call_sid in events}
+    if not events:
+        return outcomes
+
+    with transaction.atomic():
+        sessions = execute_query(f"""
+            SELECT id, exotel_call_sid, caller_id, receiver_id, status, cost_per_minute, created_at
+            FROM call_sessions
+            WHERE exotel_call_sid IN ({', '.join(['%s'] * len(events))})
+            ORDER BY id
+            FOR UPDATE
+        """, list(events))
+
+        settled = []
+        for s in sessions:
+            event = events[s['exotel_call_sid']]
+            if s['status'] in TERMINAL_CALL_STATUSES:
+                print(f"Call session {s['id']} already settled as {s['status']}; ignoring {event['status']}")
+                outcomes[s['exotel_call_sid']] = 'duplicate'
+                continue
+
+            event['duration'] = event.get('duration') or 0
+            event['minutes'] = (event['duration'] + 59) // 60 # Ceiling division
+            cost_per_minute = s['cost_per_minute'] if s['cost_per_minute'] is not None else 1.0
+            event['cost'] = event['minutes'] * cost_per_minute if event['duration'] > 0 else 0
+            settled.append((s, event))
+            outcomes[s['exotel_call_sid']] = 'processed'
+
+        if settled:
+            _update_settled_sessions(settled)
+            for s, event in settled:
+                print(f"Updated call session {s['id']} with status: {event['status']}")
+
+            record_terminal_calls([
+                (s, event['status'], event['duration'], event['cost'])
+                for s, event in settled
+                if event['status'] in TERMINAL_CALL_STATUSES
+            ])
+
+        completed = [
+            (s, event) for s, event in settled
+            if event['status'] == 'completed' and event['duration'] > 0
+        ]
+        credits_used = 0
+        if completed:
+            log_params = []
+            for s, event in completed:
+                for user_id, other_user_id in ((s['caller_id'], s['receiver_id']),
+                                               (s['receiver_id'], s['caller_id'])):
+                    log_params += [user_id, other_user_id, s['id'], event['duration'],
+                                   event['cost'], event.get('exotel_price')]
+            execute_insert(f"""
+                INSERT INTO call_logs (
+                    user_id, other_user_id, call_session_id, call_type,
+                    duration, cost, exotel_price, created_at
+                ) VALUES {', '.join(["(%s, %s, %s, 'outgoing', %s, %s, %s, NOW()), "
+                                     "(%s, %s, %s, 'incoming', %s, %s, %s, NOW())"] * len(completed))}
+            """, log_params)
+
+            # Only deduct credits if no database trigger handles it
+            if not getattr(settings, 'HAS_CREDIT_DEDUCTION_TRIGGER', False):
+                usage = []
+                credit_log = []
+                for s, event in completed:
+                    usage += [s['caller_id'], event['minutes'], s['receiver_id'], event['minutes']]
+                    credit_log += [
+                        event['minutes'], s['caller_id'], s['id'], f'{reason} - caller',
+                        event['minutes'], s['receiver_id'], s['id'], f'{reason} - receiver',
+                    ]
+                    credits_used += 2 * event['minutes']
+
+                usage_sql = ' UNION ALL '.join(
+                    ['SELECT %s AS user_id, %s AS minutes'] + ['SELECT %s, %s'] * (2 * len(completed) - 1)
+                )
+                execute_update(_DEDUCT_CREDITS_SQL.format(usage=usage_sql), usage)
+
+                execute_insert(f"""
+                    INSERT INTO exotel_credit_log (
+                        action, credits, user_id, call_session_id, reason, created_at
+                    ) VALUES {', '.join(["('used', %s, %s, %s, %s, NOW())"] * (2 * len(completed)))}
+                """, credit_log)
+                print(f"Call logs created and credits deducted for {len(completed)} session(s)")
+            else:
+                print(f"Call logs created for {len(completed)} session(s) (credits handled by trigger)")
+
+        if any(outcome != 'no_session' for outcome in outcomes.values()):
+            _mark_webhook_processed(webhook_log_id)
+
+        # Daily metrics are best effort and must run outside the transaction
+        for s, event in settled:
+            if event['status'] == 'completed':
+                transaction.on_commit(
+                    lambda s=s, event=event: record_completed_call(s, event['duration'], event.get('exotel_price'))
+                )
+        if credits_used:
+            transaction.on_commit(lambda: bump_daily_metrics(credits_used=credits_used))
+        if completed:
+            # Their cached credit balances just changed
+            user_ids = {s['caller_id'] for s, _ in completed} | {s['receiver_id'] for s, _ in completed}
+            transaction.on_commit(lambda: invalidate_entitlements(*user_ids))
+
+    return outcomes
+
+
+def settle_terminal_call(call_sid, final_status, duration, exotel_price=None, ended_at=None,
+                         recording_url=None, conversation_duration=0, legs=None,
+                         webhook_log_id=None, reason='Call completed'):
+    """
+    Settle one call that reached terminal `final_status`, exactly once (see
+    settle_terminal_calls). Returns 'processed', 'duplicate' or 'no_session'.
+    """
+    return settle_terminal_calls([{
+        'call_sid': call_sid,
+        'status': final_status,
+        'duration': duration,
+        'exotel_price': exotel_price,
+        'ended_at': ended_at,
+        'recording_url': recording_url,
+        'conversation_duration': conversation_duration,
+        'legs': legs,
+    }], reason=reason, webhook_log_id=webhook_log_id)[call_sid]
+
+
+@job('exotel_price', concurrency=4, timeout=60, max_attempts=6)
+def fill_exotel_price(call_sid):
+    """
+    Record what Exotel charged for a settled call whose event had no Price.
+
+    Raises (so the job is retried with backoff) while Exotel is unreachable or
+    has not priced the call yet.
+    """
+    details = get_call_details(call_sid)
+    if details is None:
+        raise RuntimeError(f'Call details unavailable for {call_sid}')
+    exotel_price = parse_price(details.get('Price'))
+    if exotel_price is None:
+        if (details.get('Status') or '').lower() not in ('', 'completed'):
+            return  # busy / failed / no-answer calls are never priced
+        raise RuntimeError(f'No price from Exotel yet for {call_sid}')
+
+    with transaction.atomic():
+        session = execute_query("""
+            SELECT id, status, created_at
+            FROM call_sessions
+            WHERE exotel_call_sid = %s AND exotel_price IS NULL
+            FOR UPDATE
+        """, [call_sid])
+        if not session:
+            return  # Already priced (e.g. by the sync job)
+        session = session[0]
+
+        execute_update(
+            "UPDATE call_sessions SET exotel_price = %s, updated_at = NOW() WHERE id = %s",
+            [exotel_price, session['id']]
+        )
+        execute_update(
+            "UPDATE call_logs SET exotel_price = %s WHERE call_session_id = %s",
+            [exotel_price, session['id']]
+        )
+        if session['status'] == 'completed':
+            transaction.on_commit(
+                lambda: bump_daily_metrics(session['created_at'].date(), exotel_spend=exotel_price)
+            )
+    print(f"Recorded Exotel price {exotel_price} for call session {session['id']}")
+
+
+def process_call_event(webhook_data, webhook_log_id=None):
+    """
+    Apply one parsed webhook payload to its call session.
+
+    `webhook_log_id` is the webhook_logs row to mark processed along with the
+    change. Returns 'processed', 'duplicate' (terminal event for a call that is
+    already settled), 'no_session' (unknown CallSid) or 'ignored' (unsupported
+    event type). Errors propagate to the caller.
+    """
+    call_sid = webhook_data.get('CallSid')
+    event_type = (webhook_data.get('EventType') or '').lower()
+    call_status = webhook_data.get('Status')
+
+    # Handle different event types - matches Node.js switch/case exactly
+    if event_type == 'answered':
+        session = execute_query(
+            "SELECT id FROM call_sessions WHERE exotel_call_sid = %s",
+            [call_sid]
+        )
+        if not session:
+            print(f'Call session not found for CallSid: {call_sid}')
+            return 'no_session'
+
+        start_time = webhook_data.get('StartTime')
+        with transaction.atomic():
+            # Never move a call that has already ended back to in_progress
+            execute_update("""
+                UPDATE call_sessions
+                SET status = 'in_progress', started_at = %s, updated_at = NOW()
+                WHERE id = %s AND status IN ('initiated', 'ringing', 'in_progress')
+            """, [start_time if start_time else datetime.now(), session[0]['id']])
+            _mark_webhook_processed(webhook_log_id)
+        print(f"Updated call session {session[0]['id']} with status: in_progress")
+        return 'processed'
+
+    if event_type == 'terminal':
+        # Actual amount Exotel charged (real money), separate from internal credits.
+        exotel_price = parse_price(webhook_data.get('Price'))
+
+        conversation_duration = webhook_data.get('ConversationDuration', 0)
+        end_time = webhook_data.get('EndTime')
+        with transaction.atomic():
+            outcome = settle_terminal_call(
+                call_sid,
+                (call_status or 'unknown').lower(),
+                conversation_duration or 0,
+                exotel_price=exotel_price,
+                ended_at=end_time if end_time else datetime.now(),
+                recording_url=webhook_data.get('RecordingUrl'),
+                conversation_duration=conversation_duration,
+                legs=webhook_data.get('Legs', []),
+                webhook_log_id=webhook_log_id,
+            )
+            # Exotel's webhook doesn't always include Price. Pull it from the
+            # Call details API in the background so the real per-call cost is
+            # never lost, without an HTTP round trip on the webhook path.
+            # Only completed calls are charged, so only they are looked up.
+            if (outcome == 'processed' and exotel_price is None
+                    and (call_status or '').lower() == 'completed'):
+                enqueue('exotel_price', {'call_sid': call_sid})
+        if outcome == 'no_session':
+            print(f'Call session not found for CallSid: {call_sid}')
+        return outcome
+
+    print(f'Unknown event type: {webhook_data.get("EventType")}')
+    return 'ignored'
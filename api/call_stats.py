@@ -0,0 +1,111 @@
+"""
+Per-user call statistics rollup (table `user_call_stats`).
+
+Each call session is folded into both participants' rows exactly once, when it
+reaches a terminal status (see TERMINAL_CALL_STATUSES). Admin call dashboards
+read these rows instead of aggregating call_sessions on every page view;
+`manage.py rebuild_call_stats` recomputes the table from call_sessions.
+"""
+from django.db import transaction
+
+from api.db_utils import execute_update
+
+# Final statuses Exotel reports for a call. Anything else is still in flight.
+TERMINAL_CALL_STATUSES = ('completed', 'failed', 'busy', 'no-answer', 'canceled')
+_TERMINAL_SQL_LIST = ', '.join(f"'{status}'" for status in TERMINAL_CALL_STATUSES)
+
+_UPSERT_SQL = """
+    INSERT INTO user_call_stats (
+        user_id, outgoing_calls, incoming_calls, completed_calls, total_minutes,
+        completed_seconds, completed_with_duration, total_cost, last_call_at, updated_at
+    ) VALUES {rows}
+    ON DUPLICATE KEY UPDATE
+        outgoing_calls = outgoing_calls + VALUES(outgoing_calls),
+        incoming_calls = incoming_calls + VALUES(incoming_calls),
+        completed_calls = completed_calls + VALUES(completed_calls),
+        total_minutes = total_minutes + VALUES(total_minutes),
+        completed_seconds = completed_seconds + VALUES(completed_seconds),
+        completed_with_duration = completed_with_duration + VALUES(completed_with_duration),
+        total_cost = total_cost + VALUES(total_cost),
+        last_call_at = GREATEST(COALESCE(last_call_at, VALUES(last_call_at)), VALUES(last_call_at)),
+        updated_at = NOW()
+"""
+_UPSERT_ROW = "(%s, %s, %s, %s, %s, %s, %s, %s, %s, NOW())"
+
+# Same numbers computed from scratch over every finished session. The receiver
+# side skips self-calls so a session never counts twice for one user.
+REBUILD_SQL = f"""
+    INSERT INTO user_call_stats (
+        user_id, outgoing_calls, incoming_calls, completed_calls, total_minutes,
+        completed_seconds, completed_with_duration, total_cost, last_call_at, updated_at
+    )
+    SELECT
+        user_id,
+        SUM(outgoing),
+        SUM(incoming),
+        SUM(CASE WHEN status = 'completed' THEN 1 ELSE 0 END),
+        SUM(CASE WHEN status = 'completed' THEN CEIL(COALESCE(duration, 0)/60) ELSE 0 END),
+        SUM(CASE WHEN status = 'completed' AND duration > 0 THEN duration ELSE 0 END),
+        SUM(CASE WHEN status = 'completed' AND duration > 0 THEN 1 ELSE 0 END),
+        SUM(COALESCE(cost, 0)),
+        MAX(created_at),
+        NOW()
+    FROM (
+        SELECT caller_id AS user_id, 1 AS outgoing,
+               CASE WHEN receiver_id = caller_id THEN 1 ELSE 0 END AS incoming,
+               status, duration, cost, created_at
+        FROM call_sessions
+        WHERE status IN ({_TERMINAL_SQL_LIST})
+        UNION ALL
+        SELECT receiver_id, 0, 1, status, duration, cost, created_at
+        FROM call_sessions
+        WHERE status IN ({_TERMINAL_SQL_LIST})
+          AND receiver_id <> caller_id
+    ) sides
+    GROUP BY user_id
+"""
+
+
+def record_terminal_call(session, status, duration, cost):
+    """
+    Fold a session that just reached terminal `status` into both users' rollups.
+
+    Callers must only call this on the transition into a terminal status, or
+    the call is counted again.
+    """
+    record_terminal_calls([(session, status, duration, cost)])
+
+
+def record_terminal_calls(calls):
+    """record_terminal_call() for many (session, status, duration, cost) at once, in one statement."""
+    rows = []
+    params = []
+    for session, status, duration, cost in calls:
+        completed = status == 'completed'
+        duration = duration or 0
+        values = [
+            1 if completed else 0,
+            (duration + 59) // 60 if completed else 0,
+            duration if completed and duration > 0 else 0,
+            1 if completed and duration > 0 else 0,
+            cost or 0,
+            session['created_at'],
+        ]
+        if session['caller_id'] == session['receiver_id']:
+            # A self-call counts once, as both outgoing and incoming
+            rows.append(_UPSERT_ROW)
+            params += [session['caller_id'], 1, 1, *values]
+        else:
+            rows += [_UPSERT_ROW, _UPSERT_ROW]
+            params += [session['caller_id'], 1, 0, *values,
+                       session['receiver_id'], 0, 1, *values]
+
+    if rows:
+        execute_update(_UPSERT_SQL.format(rows=', '.join(rows)), params)
+
+
+def rebuild_user_call_stats():
+    """Recompute the whole rollup from call_sessions; returns the number of users written."""
+    with transaction.atomic():
+        execute_update("DELETE FROM user_call_stats")
+        return execute_update(REBUILD_SQL)
@@ -0,0 +1,213 @@
+"""
+Stuck-call reconciliation: settle call sessions whose terminal webhook never
+arrived, using Exotel's call details API.
+
+Call details are fetched concurrently by a bounded thread pool, throttled by a
+shared rate limit, while the calling thread settles finished calls in batches
+(api.call_events.settle_terminal_calls: one transaction and a handful of
+statements per batch).
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta
+
+from django.conf import settings
+
+from api.call_events import settle_terminal_calls
+from api.call_stats import TERMINAL_CALL_STATUSES
+from api.db_utils import execute_query, execute_update
+from api.exotel_client import get_call_details, parse_price
+from api.scheduler import start_leader_thread
+
+# scheduler_leases row that elects the one process running the job (api/scheduler.py)
+CALL_SYNC_LEASE = 'call_sync'
+
+
+class RateLimiter:
+    """Spaces acquire() calls at least 1/rate seconds apart across threads."""
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate > 0 else 0
+        self._lock = threading.Lock()
+        self._next = 0.0
+
+    def acquire(self):
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            wait = self._next - now
+            self._next = max(now, self._next) + self.interval
+        if wait > 0:
+            time.sleep(wait)
+
+
+_metrics_lock = threading.Lock()
+_metrics = {
+    'runs': 0,
+    'lastRunAt': None,
+    'lastDurationMs': None,
+    'lastStuck': 0,
+    'lastReconciled': 0,
+    'lastExotelErrors': 0,
+    'totalReconciled': 0,
+    'totalExotelErrors': 0,
+    'lastError': None,
+}
+
+
+def sync_metrics():
+    """Counters for this process's reconciler runs (GET /api/admin/runtime-stats)."""
+    with _metrics_lock:
+        return dict(_metrics)
+
+
+def _fetch(call, limiter):
+    limiter.acquire()
+    return call, get_call_details(call['exotel_call_sid'])
+
+
+def _to_event(call, call_data):
+    # Actual amount Exotel charged for this call (real money, kept separate
+    # from the internal per-minute credit accounting).
+    return {
+        'call_sid': call['exotel_call_sid'],
+        'status': (call_data.get('Status') or 'unknown').lower(),
+        'duration': int(call_data.get('Duration') or 0),
+        'exotel_price': parse_price(call_data.get('Price')),
+        'recording_url': call_data.get('RecordingUrl'),
+        'conversation_duration': int(call_data.get('ConversationDuration') or 0),
+        'legs': call_data.get('Legs', []),
+    }
+
+
+def _settle(batch):
+    try:
+        outcomes = settle_terminal_calls(batch, reason='Call synced')
+    except Exception as e:
+        print(f"[SYNC JOB] Error settling {len(batch)} call(s): {e}")
+        return 0
+    return sum(1 for outcome in outcomes.values() if outcome == 'processed')
+
+
+def _mark_synced(calls):
+    """Record this look at each session; it counts towards CALL_SYNC_MAX_ATTEMPTS"""
+    execute_update(f"""
+        UPDATE call_sessions
+        SET last_synced_at = NOW(), sync_attempts = sync_attempts + 1
+        WHERE id IN ({', '.join(['%s'] * len(calls))})
+    """, [call['id'] for call in calls])
+    last_look = sum(1 for call in calls if call['sync_attempts'] + 1 >= settings.CALL_SYNC_MAX_ATTEMPTS)
+    if last_look:
+        print(f"[SYNC JOB] Last sync attempt for {last_look} session(s); "
+              f"they are left alone after {settings.CALL_SYNC_MAX_ATTEMPTS} tries")
+
+
+def sync_stuck_calls():
+    """
+    Reconcile sessions stuck in initiated/ringing/in_progress for over 2 minutes.
+
+    Returns {'stuck', 'reconciled', 'exotelErrors', 'durationMs'} for the run.
+    """
+    started = time.monotonic()
+    stuck_count = reconciled = exotel_errors = 0
+    error = None
+
+    try:
+        print('[SYNC JOB] Starting sync job for stuck calls')
+
+        # Least recently synced first (never-synced sessions sort first), so
+        # sessions Exotel can't resolve don't keep newer ones out of the
+        # CALL_SYNC_MAX_CALLS window; after CALL_SYNC_MAX_ATTEMPTS looks a
+        # session is left alone
+        two_minutes_ago = datetime.now() - timedelta(minutes=2)
+        stuck_calls = execute_query("""
+            SELECT id, exotel_call_sid, sync_attempts
+            FROM call_sessions
+            WHERE status IN ('initiated', 'ringing', 'in_progress')
+              AND created_at < %s
+              AND sync_attempts < %s
+            ORDER BY last_synced_at, id
+            LIMIT %s
+        """, [two_minutes_ago, settings.CALL_SYNC_MAX_ATTEMPTS, settings.CALL_SYNC_MAX_CALLS])
+        stuck_count = len(stuck_calls)
+
+        if stuck_calls:
+            print(f'[SYNC JOB] Found {stuck_count} stuck calls to sync')
+            _mark_synced(stuck_calls)
+
+            limiter = RateLimiter(settings.CALL_SYNC_RATE_LIMIT)
+            batch = []
+            with ThreadPoolExecutor(max_workers=settings.CALL_SYNC_CONCURRENCY,
+                                    thread_name_prefix='call-sync') as pool:
+                futures = [pool.submit(_fetch, call, limiter) for call in stuck_calls]
+                for future in as_completed(futures):
+                    call, call_data = future.result()
+                    if call_data is None:
+                        exotel_errors += 1
+                        continue
+
+                    event = _to_event(call, call_data)
+                    if event['status'] not in TERMINAL_CALL_STATUSES:
+                        # Still ringing / in progress at Exotel; look again next run
+                        continue
+
+                    batch.append(event)
+                    if len(batch) >= settings.CALL_SYNC_BATCH_SIZE:
+                        reconciled += _settle(batch)
+                        batch = []
+
+            if batch:
+                reconciled += _settle(batch)
+
+    except Exception as e:
+        error = str(e)
+        print(f'[SYNC JOB] Sync job error: {e}')
+
+    duration_ms = int((time.monotonic() - started) * 1000)
+    if stuck_count:
+        print(f'[SYNC JOB] Reconciled {reconciled}/{stuck_count} stuck calls in {duration_ms} ms '
+              f'({exotel_errors} Exotel errors)')
+
+    with _metrics_lock:
+        _metrics['runs'] += 1
+        _metrics['lastRunAt'] = datetime.now().isoformat(timespec='seconds')
+        _metrics['lastDurationMs'] = duration_ms
+        _metrics['lastStuck'] = stuck_count
+        _metrics['lastReconciled'] = reconciled
+        _metrics['lastExotelErrors'] = exotel_errors
+        _metrics['totalReconciled'] += reconciled
+        _metrics['totalExotelErrors'] += exotel_errors
+        _metrics['lastError'] = error
+
+    return {
+        'stuck': stuck_count,
+        'reconciled': reconciled,
+        'exotelErrors': exotel_errors,
+        'durationMs': duration_ms,
+    }
+
+
+_sync_job_started = False
+
+
+def start_sync_job():
+    """
+    Start the sync job scheduler thread for this process (once).
+
+    Called from gunicorn's post_worker_init hook (gunicorn.conf.py), so only
+    web workers run it - never migrate, test or the worker commands. Every
+    worker runs the thread, but the job itself only runs in the one process
+    cluster-wide that holds the 'call_sync' lease (api/scheduler.py).
+    With CALL_SYNC_SCHEDULER=off the job is left to `manage.py sync_stuck_calls --loop`.
+    """
+    global _sync_job_started
+
+    if _sync_job_started or settings.CALL_SYNC_SCHEDULER != 'embedded':
+        return
+
+    _sync_job_started = True
+    start_leader_thread(CALL_SYNC_LEASE, sync_stuck_calls, settings.CALL_SYNC_INTERVAL)
+
+    print(f'[SYNC JOB] Call sync scheduler started - runs every {settings.CALL_SYNC_INTERVAL}s on the lease holder')
@@ -0,0 +1,222 @@
+"""
+Process-wide MySQL connection pool for the raw-SQL helpers in api.db_utils.
+
+Django's MySQL backend has no pooling of its own, so without this every request
+pays a fresh TCP + auth handshake. Connections are opened with the exact same
+parameters Django would use (charset, init_command, FOUND_ROWS, isolation level)
+so query results and rowcounts are unchanged.
+"""
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+import pymysql
+from django.conf import settings
+from django.db import connection as django_connection
+
+
+class PoolTimeout(Exception):
+    """Raised when no connection becomes free within the checkout timeout."""
+
+
+class _PooledConnection:
+    __slots__ = ('raw', 'created_at')
+
+    def __init__(self, raw):
+        self.raw = raw
+        self.created_at = time.monotonic()
+
+
+class ConnectionPool:
+    """
+    Fixed-size pool of autocommit PyMySQL connections.
+
+    - `size`: max connections open at once in this process
+    - `max_age`: seconds after which an idle connection is closed and replaced
+    - `timeout`: seconds a checkout waits for a free connection before failing
+    - `health_check`: ping idle connections on checkout and replace dead ones
+    """
+
+    def __init__(self, size, max_age, timeout, health_check=True):
+        self.size = size
+        self.max_age = max_age
+        self.timeout = timeout
+        self.health_check = health_check
+        self._idle = deque()
+        self._open = 0
+        self._cond = threading.Condition()
+        self._stats = {
+            'checkouts': 0,
+            'waits': 0,
+            'wait_time': 0.0,
+            'timeouts': 0,
+            'created': 0,
+            'recycled': 0,
+            'health_check_failures': 0,
+            'discarded': 0,
+        }
+
+    # ---------- connection lifecycle ----------
+
+    def _connect(self):
+        params = django_connection.get_connection_params()
+        raw = pymysql.connect(autocommit=True, **params)
+        assignments = ["SET SQL_AUTO_IS_NULL = 0"]
+        isolation_level = getattr(django_connection, 'isolation_level', None)
+        if isolation_level:
+            assignments.append(f"SET SESSION TRANSACTION ISOLATION LEVEL {isolation_level.upper()}")
+        with raw.cursor() as cursor:
+            for statement in assignments:
+                cursor.execute(statement)
+        return _PooledConnection(raw)
+
+    @staticmethod
+    def _close(pooled):
+        try:
+            pooled.raw.close()
+        except Exception:
+            pass
+
+    def _is_usable(self, pooled):
+        if time.monotonic() - pooled.created_at > self.max_age:
+            self._bump('recycled')
+            return False
+        if self.health_check:
+            try:
+                pooled.raw.ping(reconnect=False)
+            except Exception:
+                self._bump('health_check_failures')
+                return False
+        return True
+
+    def _bump(self, key):
+        with self._cond:
+            self._stats[key] += 1
+
+    # ---------- checkout / checkin ----------
+
+    def checkout(self):
+        started = time.monotonic()
+        waited = False
+        with self._cond:
+            while True:
+                if self._idle:
+                    pooled = self._idle.pop()
+                    break
+                if self._open < self.size:
+                    self._open += 1
+                    pooled = None
+                    break
+                remaining = self.timeout - (time.monotonic() - started)
+                if remaining <= 0:
+                    self._stats['timeouts'] += 1
+                    raise PoolTimeout(
+                        f'No database connection available after {self.timeout}s '
+                        f'(pool size {self.size})'
+                    )
+                waited = True
+                self._cond.wait(remaining)
+
+            self._stats['checkouts'] += 1
+            if waited:
+                self._stats['waits'] += 1
+                self._stats['wait_time'] += time.monotonic() - started
+
+        # Connect / ping outside the lock so one slow handshake doesn't stall
+        # every other thread waiting on the pool.
+        try:
+            if pooled is not None and not self._is_usable(pooled):
+                self._close(pooled)
+                pooled = None
+            if pooled is None:
+                pooled = self._connect()
+                self._bump('created')
+        except Exception:
+            with self._cond:
+                self._open -= 1
+                self._cond.notify()
+            raise
+        return pooled
+
+    def checkin(self, pooled, discard=False):
+        if not discard and not pooled.raw.get_autocommit():
+            # A caller left a transaction open; never hand that to someone else.
+            discard = True
+        with self._cond:
+            if discard:
+                self._stats['discarded'] += 1
+                self._open -= 1
+            else:
+                self._idle.append(pooled)
+            self._cond.notify()
+        if discard:
+            self._close(pooled)
+
+    @contextmanager
+    def connection(self):
+        """Check out a raw connection; connections that hit a driver-level error are discarded."""
+        pooled = self.checkout()
+        discard = False
+        try:
+            yield pooled.raw
+        except (pymysql.err.OperationalError, pymysql.err.InterfaceError):
+            discard = True
+            raise
+        finally:
+            self.checkin(pooled, discard=discard)
+
+    def close_all(self):
+        with self._cond:
+            idle, self._idle = list(self._idle), deque()
+            self._open -= len(idle)
+        for pooled in idle:
+            self._close(pooled)
+
+    def stats(self):
+        with self._cond:
+            idle = len(self._idle)
+            return {
+                'size': self.size,
+                'open': self._open,
+                'idle': idle,
+                'checked_out': self._open - idle,
+                'max_age': self.max_age,
+                **self._stats,
+                'wait_time': round(self._stats['wait_time'], 4),
+            }
+
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """
+    Return this process's pool, creating it on first use.
+
+    Keyed by pid so a pool inherited across fork() (gunicorn --preload) is never
+    shared between workers.
+    """
+    global _pool, _pool_pid
+    pid = os.getpid()
+    if _pool is None or _pool_pid != pid:
+        with _pool_lock:
+            if _pool is None or _pool_pid != pid:
+                _pool = ConnectionPool(
+                    size=settings.DB_POOL_SIZE,
+                    max_age=settings.DB_POOL_MAX_AGE,
+                    timeout=settings.DB_POOL_TIMEOUT,
+                    health_check=settings.DB_POOL_HEALTH_CHECKS,
+                )
+                _pool_pid = pid
+    return _pool
+
+
+def pool_stats():
+    """Runtime stats for this worker's pool (empty pool stats if never used)."""
+    if not settings.DB_POOL_ENABLED:
+        return {'enabled': False}
+    return {'enabled': True, 'pid': os.getpid(), **get_pool().stats()}
@@ -1,15 +1,37 @@
 # api/db_utils.py
+import pymysql
+from django.conf import settings
 from django.db import connection
 from contextlib import contextmanager
+from api.db_pool import get_pool
 
 @contextmanager
-def get_db_cursor():
-    """Context manager for database cursor"""
-    cursor = connection.cursor()
-    try:
-        yield cursor
-    finally:
-        cursor.close()
+def get_db_cursor(unbuffered=False):
+    """
+    Context manager for database cursor.
+
+    Uses a pooled connection, except inside transaction.atomic() where the
+    statement has to run on Django's own connection to join the transaction.
+    `unbuffered=True` gives a server-side (SSCursor) cursor on pooled
+    connections; Django's own cursor is always buffered.
+    """
+    if not settings.DB_POOL_ENABLED or connection.in_atomic_block:
+        cursor = connection.cursor()
+        try:
+            yield cursor
+        finally:
+            cursor.close()
+        return
+
+    # wrap_database_errors re-raises driver errors as django.db exceptions, same
+    # as a cursor from django.db.connection would.
+    with connection.wrap_database_errors:
+        with get_pool().connection() as conn:
+            cursor = conn.cursor(pymysql.cursors.SSCursor if unbuffered else None)
+            try:
+                yield cursor
+            finally:
+                cursor.close()
 
 def execute_query(query, params=None):
     """Execute a query and return results"""
@@ -29,3 +51,25 @@ def execute_insert(query, params=None):
     with get_db_cursor() as cursor:
         cursor.execute(query, params or [])
         return cursor.lastrowid
+
+def iter_query_batches(query, params=None, batch_size=500):
+    """
+    Stream a query's results as lists of at most `batch_size` row dicts.
+
+    Rows are read from an unbuffered server-side cursor, so only one batch is in
+    memory at a time. The connection stays checked out until the generator is
+    exhausted or closed, so consume it promptly.
+    """
+    with get_db_cursor(unbuffered=True) as cursor:
+        cursor.execute(query, params or [])
+        columns = [col[0] for col in cursor.description] if cursor.description else []
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            yield [dict(zip(columns, row)) for row in rows]
+
+def iter_query(query, params=None, batch_size=500):
+    """Stream a query's results one row dict at a time (fetched in batches)"""
+    for batch in iter_query_batches(query, params, batch_size):
+        yield from batch
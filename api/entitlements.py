@@ -0,0 +1,110 @@
+"""
+Per-user entitlement snapshots: the active normal plan and the unexpired call
+credit allocations, cached so gated endpoints don't join user_subscriptions /
+user_call_credits with plans on every request.
+
+A snapshot is cached until the nearest expiry in it (capped at
+ENTITLEMENT_CACHE_TTL), so a plan or allocation running out is never served
+from cache. Writes that change entitlements call invalidate_entitlements():
+payment verification, adjust_credits and call settlement.
+
+The cache is CACHES['default']. With the per-process default (LocMemCache)
+an invalidation only reaches the worker that made it, so reads that have to
+be current pass fresh=True (which also refreshes the cached copy): the credit
+check in initiate_call and the views that show balances (subscription_status,
+active_plan, call_credits). The profile detail views don't load a snapshot at
+all; they fold VIEW_DETAILS_SQL into their one query.
+"""
+from django.conf import settings
+from django.core.cache import cache
+
+from api.db_utils import execute_query
+
+_KEY = 'entitlements:{}'
+
+# can_view_details of the user's current normal plan (the one _load picks),
+# 0 without one; a scalar subquery taking the user id as its one parameter
+VIEW_DETAILS_SQL = """
+    COALESCE((
+        SELECT p.can_view_details
+        FROM user_subscriptions us
+        JOIN plans p ON us.plan_id = p.id
+        WHERE us.user_id = %s
+            AND us.status = 'active'
+            AND p.type = 'normal'
+            AND us.expires_at > NOW()
+        ORDER BY us.expires_at DESC
+        LIMIT 1
+    ), 0)
+"""
+
+
+def _load(user_id):
+    normal_plan = execute_query("""
+        SELECT us.plan_id, us.expires_at, p.name as plan_name, p.price, p.duration_months,
+               p.can_view_details, p.can_make_calls,
+               TIMESTAMPDIFF(SECOND, NOW(), us.expires_at) as expires_in
+        FROM user_subscriptions us
+        JOIN plans p ON us.plan_id = p.id
+        WHERE us.user_id = %s
+            AND us.status = 'active'
+            AND p.type = 'normal'
+            AND us.expires_at > NOW()
+        ORDER BY us.expires_at DESC
+        LIMIT 1
+    """, [user_id])
+
+    credits = execute_query("""
+        SELECT uc.id, uc.plan_id, uc.credits_remaining, uc.credits_purchased,
+               uc.expires_at, uc.admin_allocated, uc.allocation_notes, uc.last_used_at,
+               p.name as plan_name, p.price, p.duration_months, p.call_credits,
+               TIMESTAMPDIFF(SECOND, NOW(), uc.expires_at) as expires_in
+        FROM user_call_credits uc
+        LEFT JOIN plans p ON uc.plan_id = p.id
+        WHERE uc.user_id = %s AND uc.expires_at > NOW()
+        ORDER BY uc.expires_at ASC
+    """, [user_id])
+
+    ttl = settings.ENTITLEMENT_CACHE_TTL
+    for row in normal_plan + credits:
+        ttl = min(ttl, row.pop('expires_in'))
+
+    return {
+        'normal_plan': normal_plan[0] if normal_plan else None,
+        'credits': credits,
+    }, ttl
+
+
+def get_entitlements(user_id, fresh=False):
+    """
+    The user's entitlement snapshot:
+
+        {'normal_plan': {plan_id, plan_name, price, duration_months, expires_at,
+                         can_view_details, can_make_calls} or None,
+         'credits': [unexpired user_call_credits rows with plan name, price,
+                     duration_months and call_credits, soonest expiry first]}
+
+    `fresh=True` reads the database and refreshes the cached copy.
+    """
+    key = _KEY.format(user_id)
+    if not fresh and settings.ENTITLEMENT_CACHE_TTL > 0:
+        snapshot = cache.get(key)
+        if snapshot is not None:
+            return snapshot
+
+    snapshot, ttl = _load(user_id)
+    if ttl > 0:
+        cache.set(key, snapshot, ttl)
+    return snapshot
+
+
+def invalidate_entitlements(*user_ids):
+    """Drop the cached snapshots after a write that changes the users' plans or credits"""
+    try:
+        cache.delete_many([_KEY.format(user_id) for user_id in user_ids])
+    except Exception as e:
+        print(f"[ENTITLEMENTS] Failed to invalidate {user_ids}: {e}")
+
+
+def has_call_credits(snapshot):
+    return any(c['credits_remaining'] > 0 for c in snapshot['credits'])
@@ -3,11 +3,173 @@
 Thin client for talking to the live Exotel account.
 
 Kept in its own module so both admin_views (balance display) and call_views
-(per-call price capture) can use it without importing each other.
+(per-call price capture) can use it without importing each other. All Exotel
+traffic goes through _request(), which uses one keep-alive requests.Session
+per process (pooled connections, bounded retries with jittered backoff) and a
+circuit breaker that fails fast while Exotel is down.
 """
 import base64
+import json
+import os
+import threading
+import time
+
 import requests
 from django.conf import settings
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+
+class ExotelUnavailable(Exception):
+    """Exotel is failing; the circuit breaker is refusing requests for now."""
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker.
+
+    After `threshold` failures in a row the circuit opens and every request is
+    refused for `reset_timeout` seconds. Then a single trial request is let
+    through (half-open): success closes the circuit, failure re-opens it.
+    """
+
+    def __init__(self, threshold, reset_timeout):
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = None
+        self._trial_in_flight = False
+        self._counters = {'requests': 0, 'failures': 0, 'rejected': 0, 'opened': 0}
+
+    def allow(self):
+        with self._lock:
+            if self._opened_at is None:
+                self._counters['requests'] += 1
+                return True
+            if time.monotonic() - self._opened_at >= self.reset_timeout and not self._trial_in_flight:
+                self._trial_in_flight = True
+                self._counters['requests'] += 1
+                return True
+            self._counters['rejected'] += 1
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._counters['failures'] += 1
+            self._failures += 1
+            if self._trial_in_flight or (self._opened_at is None and self._failures >= self.threshold):
+                if self._opened_at is None:
+                    self._counters['opened'] += 1
+                self._opened_at = time.monotonic()
+            self._trial_in_flight = False
+
+    @property
+    def state(self):
+        with self._lock:
+            if self._opened_at is None:
+                return 'closed'
+            if time.monotonic() - self._opened_at >= self.reset_timeout:
+                return 'half_open'
+            return 'open'
+
+    def stats(self):
+        state = self.state
+        with self._lock:
+            return {'state': state, 'consecutiveFailures': self._failures, **self._counters}
+
+
+# Per-operation (connect, read) timeouts in seconds
+TIMEOUTS = {
+    'balance': (3.05, 10),
+    'call_details': (3.05, 10),
+    'connect_call': (3.05, 15),
+}
+
+_client = None
+_client_pid = None
+_client_lock = threading.Lock()
+
+
+def _build_session():
+    # GET is retried on connection errors, read errors and 429/5xx. Anything
+    # else (the call-connect POST) only on connection errors, when the request
+    # never reached Exotel - retrying a POST that did could place a second call.
+    retry = Retry(
+        total=settings.EXOTEL_HTTP_RETRIES,
+        connect=settings.EXOTEL_HTTP_RETRIES,
+        read=settings.EXOTEL_HTTP_RETRIES,
+        status=settings.EXOTEL_HTTP_RETRIES,
+        other=0,
+        allowed_methods=frozenset({'GET'}),
+        status_forcelist=(429, 500, 502, 503, 504),
+        backoff_factor=0.3,
+        backoff_jitter=0.3,
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(
+        pool_connections=1,
+        pool_maxsize=settings.EXOTEL_HTTP_POOL_SIZE,
+        max_retries=retry,
+    )
+    session = requests.Session()
+    session.mount('https://', adapter)
+    session.headers.update({'Accept': 'application/json'})
+    return session
+
+
+def _get_client():
+    """(session, breaker) for this process, created on first use (and again after a fork)."""
+    global _client, _client_pid
+    pid = os.getpid()
+    if _client is None or _client_pid != pid:
+        with _client_lock:
+            if _client is None or _client_pid != pid:
+                _client = (
+                    _build_session(),
+                    CircuitBreaker(settings.EXOTEL_BREAKER_THRESHOLD, settings.EXOTEL_BREAKER_RESET_SECONDS),
+                )
+                _client_pid = pid
+    return _client
+
+
+def _request(operation, method, path, **kwargs):
+    """
+    Send one request to the Exotel account API and return the response.
+
+    Raises ExotelUnavailable while the circuit is open, and requests'
+    RequestException once retries are exhausted. Only network errors and 5xx
+    responses count against the breaker; a 4xx is Exotel answering.
+    """
+    session, breaker = _get_client()
+    if not breaker.allow():
+        raise ExotelUnavailable('Exotel is unavailable (circuit open)')
+
+    url = f"https://{settings.EXOTEL_SUBDOMAIN}/v1/Accounts/{settings.EXOTEL_SID}/{path}"
+    headers = {'Authorization': _auth_header(), **kwargs.pop('headers', {})}
+    try:
+        resp = session.request(method, url, headers=headers, timeout=TIMEOUTS[operation], **kwargs)
+    except Exception:
+        breaker.record_failure()
+        raise
+
+    if resp.status_code >= 500:
+        breaker.record_failure()
+    else:
+        breaker.record_success()
+    return resp
+
+
+def client_stats():
+    """Breaker state and request counters for this worker (GET /api/admin/runtime-stats)."""
+    return _get_client()[1].stats()
 
 
 def _auth_header():
@@ -25,7 +187,7 @@ def _creds_configured():
     ])
 
 
-def get_account_balance(timeout=10):
+def get_account_balance():
     """
     Fetch the live wallet balance from Exotel.
     GET https://<subdomain>/v1/Accounts/<sid>/Balance.json
@@ -40,10 +202,10 @@ def get_account_balance(timeout=10):
     if not _creds_configured():
         return {'available': False, 'error': 'Exotel credentials not configured'}
 
-    url = f"https://{settings.EXOTEL_SUBDOMAIN}/v1/Accounts/{settings.EXOTEL_SID}/Balance.json"
-
     try:
-        resp = requests.get(url, headers={'Authorization': _auth_header()}, timeout=timeout)
+        resp = _request('balance', 'GET', 'Balance.json')
+    except ExotelUnavailable as e:
+        return {'available': False, 'error': str(e)}
     except requests.RequestException as e:
         return {'available': False, 'error': f'Network error contacting Exotel: {e}'}
 
@@ -83,7 +245,7 @@ def get_account_balance(timeout=10):
     }
 
 
-def get_call_details(call_sid, timeout=10):
+def get_call_details(call_sid):
     """
     Fetch a single call's details from Exotel, including the actual `Price` charged.
     GET https://<subdomain>/v1/Accounts/<sid>/Calls/<CallSid>.json
@@ -93,17 +255,70 @@ def get_call_details(call_sid, timeout=10):
     if not _creds_configured() or not call_sid:
         return None
 
-    url = f"https://{settings.EXOTEL_SUBDOMAIN}/v1/Accounts/{settings.EXOTEL_SID}/Calls/{call_sid}.json"
-
     try:
-        resp = requests.get(url, headers={'Authorization': _auth_header()}, timeout=timeout)
+        resp = _request('call_details', 'GET', f'Calls/{call_sid}.json')
         if not resp.ok:
             return None
         return resp.json().get('Call', {})
-    except (requests.RequestException, ValueError):
+    except (ExotelUnavailable, requests.RequestException, ValueError):
         return None
 
 
+def connect_call(caller_number, receiver_number, user_id, target_user_id):
+    """
+    Ask Exotel to ring both numbers and bridge them.
+    POST https://<subdomain>/v1/Accounts/<sid>/Calls/connect.json
+
+    Returns {'success': True, 'callSid', 'status', 'virtualNumber'}; raises on
+    any failure (including ExotelUnavailable while the circuit is open).
+    """
+    custom_field = json.dumps({
+        'userId': user_id,
+        'targetUserId': target_user_id,
+        'timestamp': str(int(time.time() * 1000))
+    })
+    data = {
+        'From': caller_number,
+        'To': receiver_number,
+        'CallerId': settings.EXOTEL_VIRTUAL_NUMBER,
+        'CallType': 'trans',
+        'TimeLimit': '3600',
+        'TimeOut': '30',
+        'StatusCallback': f"{settings.APP_URL}/api/calls/webhook",
+        'StatusCallbackEvents[0]': 'terminal',
+        'StatusCallbackEvents[1]': 'answered',
+        'StatusCallbackContentType': 'application/json',
+        'Record': 'true',
+        'CustomField': custom_field
+    }
+    print('Initiating Exotel call with params:', {
+        'From': caller_number,
+        'To': receiver_number,
+        'CallerId': settings.EXOTEL_VIRTUAL_NUMBER,
+        'StatusCallback': f"{settings.APP_URL}/api/calls/webhook",
+        'StatusCallbackEvents': ['terminal', 'answered']
+    })
+
+    resp = _request('connect_call', 'POST', 'Calls/connect.json', data=data)
+    result = resp.json()
+    print('Exotel API Response:', result)
+
+    if resp.ok and result.get('Call', {}).get('Sid'):
+        return {
+            'success': True,
+            'callSid': result['Call']['Sid'],
+            'status': result['Call']['Status'],
+            'virtualNumber': settings.EXOTEL_VIRTUAL_NUMBER
+        }
+
+    print('Exotel API Error:', result)
+    raise Exception(
+        result.get('RestException', {}).get('Message') or
+        result.get('message') or
+        'Exotel API call failed'
+    )
+
+
 def parse_price(value):
     """
     Normalise an Exotel `Price` value (often a negative string like "-0.7000")
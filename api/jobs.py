@@ -0,0 +1,193 @@
+"""
+Durable background jobs stored in MySQL (table `background_jobs`).
+
+Slow work is moved off the request path by enqueueing a job; `manage.py
+runworker` claims and runs due jobs. No external broker is involved.
+
+    @job('exotel_price', concurrency=4, timeout=60)
+    def fill_exotel_price(call_sid): ...
+
+    enqueue('exotel_price', {'call_sid': sid})
+
+  * Durability - a job is a row, so it survives restarts. Enqueueing inside
+    transaction.atomic() commits or rolls back with the surrounding writes.
+  * Retries - a handler that raises is retried with exponential backoff;
+    after max_attempts the job is dead (status 'dead', last_error kept).
+  * Visibility timeout - a claim leases the row for the type's `timeout`. If
+    the worker dies, the job becomes claimable again once the lease expires,
+    so delivery is at-least-once and handlers must be idempotent.
+  * Concurrency - at most `concurrency` jobs of a type run at once across all
+    workers (checked when claiming; two workers racing for the last slot can
+    overshoot by one until the next claim).
+
+Handlers register in the modules that own the work; JOB_MODULES lists them so
+the worker can import them.
+"""
+import json
+from importlib import import_module
+
+from django.conf import settings
+
+from api.db_utils import execute_insert, execute_query, execute_update
+from api.scheduler import holder_id
+
+QUEUED, RUNNING, DONE, DEAD = 'queued', 'running', 'done', 'dead'
+
+# Modules whose @job handlers the worker loads
+JOB_MODULES = ('api.call_events',)
+
+_MAX_BACKOFF_SECONDS = 3600
+
+_registry = {}
+
+
+class JobType:
+    def __init__(self, name, func, concurrency, timeout, max_attempts):
+        self.name = name
+        self.func = func
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.max_attempts = max_attempts
+
+
+def job(name, concurrency=1, timeout=60, max_attempts=None):
+    """Register the decorated function as the handler for job type `name`"""
+    def register(func):
+        _registry[name] = JobType(
+            name, func, concurrency, timeout,
+            max_attempts or settings.BACKGROUND_JOB_MAX_ATTEMPTS,
+        )
+        return func
+    return register
+
+
+def load_job_modules():
+    """Import JOB_MODULES so their handlers register; returns the registry"""
+    for module in JOB_MODULES:
+        import_module(module)
+    return dict(_registry)
+
+
+def enqueue(name, payload=None, delay=0):
+    """
+    Queue a `name` job, runnable after `delay` seconds; returns its id.
+
+    `payload` (JSON-serialisable dict) is passed to the handler as keyword
+    arguments.
+    """
+    if name not in _registry:
+        raise ValueError(f"Unknown job type: {name}")
+    return execute_insert("""
+        INSERT INTO background_jobs (
+            job_type, payload, status, attempts, max_attempts, run_at, created_at, updated_at
+        ) VALUES (%s, %s, 'queued', 0, %s, NOW() + INTERVAL %s SECOND, NOW(), NOW())
+    """, [name, json.dumps(payload or {}), _registry[name].max_attempts, int(delay)])
+
+
+def claim_job(types=None):
+    """
+    Lease the oldest due job whose type has a free concurrency slot.
+
+    Returns the row (id, job_type, payload, attempts, max_attempts) or None.
+    """
+    types = [name for name in (types or _registry) if name in _registry]
+    if not types:
+        return None
+
+    running = execute_query(f"""
+        SELECT job_type, COUNT(*) as count
+        FROM background_jobs
+        WHERE status = 'running' AND locked_until >= NOW()
+          AND job_type IN ({', '.join(['%s'] * len(types))})
+        GROUP BY job_type
+    """, types)
+    busy = {row['job_type']: row['count'] for row in running}
+    types = [name for name in types if busy.get(name, 0) < _registry[name].concurrency]
+    if not types:
+        return None
+
+    candidates = execute_query(f"""
+        SELECT id, job_type
+        FROM background_jobs
+        WHERE job_type IN ({', '.join(['%s'] * len(types))})
+          AND ((status = 'queued' AND run_at <= NOW())
+               OR (status = 'running' AND locked_until < NOW()))
+        ORDER BY run_at, id
+        LIMIT %s
+    """, types + [settings.BACKGROUND_JOB_CLAIM_SCAN])
+
+    for row in candidates:
+        leased = execute_update("""
+            UPDATE background_jobs
+            SET status = 'running', locked_until = NOW() + INTERVAL %s SECOND, locked_by = %s,
+                attempts = attempts + 1, updated_at = NOW()
+            WHERE id = %s
+              AND ((status = 'queued' AND run_at <= NOW())
+                   OR (status = 'running' AND locked_until < NOW()))
+        """, [_registry[row['job_type']].timeout, holder_id(), row['id']])
+        if leased:
+            return execute_query("""
+                SELECT id, job_type, payload, attempts, max_attempts
+                FROM background_jobs
+                WHERE id = %s
+            """, [row['id']])[0]
+    return None
+
+
+def _finish(job_id, status, error=None):
+    execute_update("""
+        UPDATE background_jobs
+        SET status = %s, locked_until = NULL, last_error = %s, updated_at = NOW()
+        WHERE id = %s AND locked_by = %s
+    """, [status, error, job_id, holder_id()])
+
+
+def _retry_later(row, error):
+    if row['attempts'] >= row['max_attempts']:
+        print(f"[JOBS] {row['job_type']} job {row['id']} dead after {row['attempts']} attempts: {error}")
+        _finish(row['id'], DEAD, error)
+        return
+
+    delay = min(_MAX_BACKOFF_SECONDS, settings.BACKGROUND_JOB_RETRY_DELAY * 2 ** (row['attempts'] - 1))
+    execute_update("""
+        UPDATE background_jobs
+        SET status = 'queued', locked_until = NULL, run_at = NOW() + INTERVAL %s SECOND,
+            last_error = %s, updated_at = NOW()
+        WHERE id = %s AND locked_by = %s
+    """, [delay, error, row['id'], holder_id()])
+
+
+def run_job(row):
+    """Run one claimed job and record the outcome; returns True if it succeeded"""
+    job_type = _registry.get(row['job_type'])
+    if job_type is None:
+        _finish(row['id'], DEAD, f"No handler registered for {row['job_type']}")
+        return False
+    if row['attempts'] > row['max_attempts']:
+        # Its leases kept expiring (e.g. the worker was killed mid-run)
+        _finish(row['id'], DEAD, 'Visibility timeout exceeded on every attempt')
+        return False
+
+    try:
+        job_type.func(**json.loads(row['payload'] or '{}'))
+    except Exception as e:
+        print(f"[JOBS] {row['job_type']} job {row['id']} failed (attempt {row['attempts']}): {e}")
+        _retry_later(row, str(e)[:1000])
+        return False
+
+    _finish(row['id'], DONE)
+    return True
+
+
+def job_stats():
+    """Queued / running / dead counts per job type for monitoring"""
+    rows = execute_query("""
+        SELECT job_type, status, COUNT(*) as count
+        FROM background_jobs
+        WHERE status IN ('queued', 'running', 'dead')
+        GROUP BY job_type, status
+    """)
+    stats = {}
+    for row in rows:
+        stats.setdefault(row['job_type'], {QUEUED: 0, RUNNING: 0, DEAD: 0})[row['status']] = row['count']
+    return stats
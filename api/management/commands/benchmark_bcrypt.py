@@ -0,0 +1,43 @@
+import statistics
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from api.utils import _hash_password
+
+
+class Command(BaseCommand):
+    help = "Measure bcrypt hash time on this machine for a range of costs, to pick BCRYPT_ROUNDS."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--min-cost', type=int, default=10)
+        parser.add_argument('--max-cost', type=int, default=14)
+        parser.add_argument('--iterations', type=int, default=3, help='hashes per cost (median is reported)')
+        parser.add_argument('--target-ms', type=float, default=250,
+                            help='suggest the highest cost whose median stays under this')
+
+    def handle(self, *args, **options):
+        n = max(1, options['iterations'])
+        target = options['target_ms']
+        suggested = None
+
+        self.stdout.write(f"iterations per cost: {n}, target: {target:.0f} ms")
+        for cost in range(max(4, options['min_cost']), min(31, options['max_cost']) + 1):
+            timings = []
+            for _ in range(n):
+                start = time.perf_counter()
+                _hash_password('benchmark-password', rounds=cost)
+                timings.append((time.perf_counter() - start) * 1000)
+            median = statistics.median(timings)
+            if median <= target:
+                suggested = cost
+
+            marker = '  <- BCRYPT_ROUNDS' if cost == settings.BCRYPT_ROUNDS else ''
+            self.stdout.write(f"cost {cost:2d}: {median:9.1f} ms/hash{marker}")
+
+        if suggested is None:
+            self.stdout.write(f"No cost in range stays under {target:.0f} ms")
+        else:
+            self.stdout.write(f"Suggested BCRYPT_ROUNDS for {target:.0f} ms: {suggested}")
+        self.stdout.write("Existing hashes are upgraded to a new cost as users log in.")
@@ -0,0 +1,62 @@
+import signal
+import threading
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from api.webhook_queue import claim_batch, process_row
+
+
+class Command(BaseCommand):
+    help = "Drain the queued call webhooks (CALL_WEBHOOK_MODE=queue) with a pool of worker threads."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--threads', type=int, default=settings.WEBHOOK_QUEUE_WORKERS,
+            help='Worker threads in this process. Default: WEBHOOK_QUEUE_WORKERS.',
+        )
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Process whatever is due right now, then exit.',
+        )
+
+    def handle(self, *args, **options):
+        self.stop = threading.Event()
+        if not options['once']:
+            signal.signal(signal.SIGTERM, lambda *_: self.stop.set())
+            signal.signal(signal.SIGINT, lambda *_: self.stop.set())
+
+        threads = [
+            threading.Thread(target=self.work, args=(options['once'],), name=f'webhook-worker-{n}')
+            for n in range(max(1, options['threads']))
+        ]
+        for thread in threads:
+            thread.start()
+        self.stdout.write(f"[WEBHOOK QUEUE] {len(threads)} worker thread(s) started")
+
+        # Join with a timeout so the main thread keeps receiving signals
+        while any(thread.is_alive() for thread in threads):
+            for thread in threads:
+                thread.join(timeout=1)
+
+        self.stdout.write("[WEBHOOK QUEUE] Stopped")
+
+    def work(self, once):
+        try:
+            while not self.stop.is_set():
+                try:
+                    rows = claim_batch(settings.WEBHOOK_QUEUE_BATCH_SIZE)
+                except Exception as e:
+                    print(f"[WEBHOOK QUEUE] Claim error: {e}")
+                    rows = []
+
+                for row in rows:
+                    process_row(row)
+
+                if not rows:
+                    if once:
+                        return
+                    self.stop.wait(settings.WEBHOOK_QUEUE_POLL_INTERVAL)
+        finally:
+            connection.close()
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from api.call_stats import rebuild_user_call_stats
+
+
+class Command(BaseCommand):
+    help = "Rebuild the user_call_stats rollup from finished call_sessions."
+
+    def handle(self, *args, **options):
+        written = rebuild_user_call_stats()
+        self.stdout.write(self.style.SUCCESS(
+            f"user_call_stats rebuilt: {written} user row(s) written"
+        ))
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+
+from api.match_counts import find_match_count_drift, rebuild_match_counts
+
+
+class Command(BaseCommand):
+    help = "Recompute users.match_count from the matches table and report drift."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Only report users whose counter is wrong; change nothing.',
+        )
+
+    def handle(self, *args, **options):
+        drift = find_match_count_drift()
+
+        for row in drift[:50]:
+            self.stdout.write(
+                f"user {row['user_id']}: stored {row['stored']}, actual {row['actual']}"
+            )
+        if len(drift) > 50:
+            self.stdout.write(f"... and {len(drift) - 50} more")
+
+        if options['dry_run']:
+            self.stdout.write(f"{len(drift)} user(s) with drifted match counts (dry run)")
+            return
+
+        fixed = rebuild_match_counts()
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(drift)} user(s) had drifted match counts; {fixed} row(s) updated"
+        ))
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+
+from api.profile_completeness import find_profile_complete_drift, rebuild_profile_complete
+
+
+class Command(BaseCommand):
+    help = "Backfill user_profiles.is_complete from the profile fields and report drift."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Only report profiles whose flag is wrong; change nothing.',
+        )
+
+    def handle(self, *args, **options):
+        drift = find_profile_complete_drift()
+
+        for row in drift[:50]:
+            self.stdout.write(
+                f"profile {row['profile_id']} (user {row['user_id']}): "
+                f"stored {row['stored']}, actual {row['actual']}"
+            )
+        if len(drift) > 50:
+            self.stdout.write(f"... and {len(drift) - 50} more")
+
+        if options['dry_run']:
+            self.stdout.write(f"{len(drift)} profile(s) with a wrong is_complete flag (dry run)")
+            return
+
+        fixed = rebuild_profile_complete()
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(drift)} profile(s) had a wrong is_complete flag; {fixed} row(s) updated"
+        ))
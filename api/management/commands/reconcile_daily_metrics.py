@@ -0,0 +1,29 @@
+from datetime import datetime, timedelta
+
+from django.core.management.base import BaseCommand
+
+from api.metrics import reconcile_daily_metrics
+
+
+class Command(BaseCommand):
+    help = "Recompute daily_metrics rows from payments, users, call_sessions and the credit log."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days', type=int, default=3,
+            help='Number of most recent days (including today) to recompute. Default: 3.',
+        )
+        parser.add_argument(
+            '--all', action='store_true',
+            help='Rebuild the whole table from all history.',
+        )
+
+    def handle(self, *args, **options):
+        if options['all']:
+            written = reconcile_daily_metrics()
+        else:
+            today = datetime.now().date()
+            start_day = today - timedelta(days=max(1, options['days']) - 1)
+            written = reconcile_daily_metrics(start_day, today)
+
+        self.stdout.write(self.style.SUCCESS(f"daily_metrics reconciled: {written} day(s)"))
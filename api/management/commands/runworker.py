@@ -0,0 +1,72 @@
+import signal
+import threading
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from api.jobs import claim_job, load_job_modules, run_job
+
+
+class Command(BaseCommand):
+    help = "Run queued background jobs (api/jobs.py) with a pool of worker threads."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--threads', type=int, default=settings.BACKGROUND_JOB_WORKERS,
+            help='Worker threads in this process. Default: BACKGROUND_JOB_WORKERS.',
+        )
+        parser.add_argument(
+            '--types', default='',
+            help='Comma-separated job types to run (default: all registered types).',
+        )
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Run whatever is due right now, then exit.',
+        )
+
+    def handle(self, *args, **options):
+        registry = load_job_modules()
+        types = [t.strip() for t in options['types'].split(',') if t.strip()] or list(registry)
+        unknown = set(types) - set(registry)
+        if unknown:
+            self.stderr.write(f"Unknown job type(s): {', '.join(sorted(unknown))}")
+            return
+
+        self.stop = threading.Event()
+        if not options['once']:
+            signal.signal(signal.SIGTERM, lambda *_: self.stop.set())
+            signal.signal(signal.SIGINT, lambda *_: self.stop.set())
+
+        threads = [
+            threading.Thread(target=self.work, args=(types, options['once']), name=f'job-worker-{n}')
+            for n in range(max(1, options['threads']))
+        ]
+        for thread in threads:
+            thread.start()
+        self.stdout.write(f"[JOBS] {len(threads)} worker thread(s) started for: {', '.join(types)}")
+
+        # Join with a timeout so the main thread keeps receiving signals
+        while any(thread.is_alive() for thread in threads):
+            for thread in threads:
+                thread.join(timeout=1)
+
+        self.stdout.write("[JOBS] Stopped")
+
+    def work(self, types, once):
+        try:
+            while not self.stop.is_set():
+                try:
+                    row = claim_job(types)
+                except Exception as e:
+                    print(f"[JOBS] Claim error: {e}")
+                    row = None
+
+                if row is not None:
+                    run_job(row)
+                elif once:
+                    return
+                else:
+                    self.stop.wait(settings.BACKGROUND_JOB_POLL_INTERVAL)
+        finally:
+            connection.close()
@@ -0,0 +1,44 @@
+import signal
+import threading
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from api.call_sync import CALL_SYNC_LEASE, sync_stuck_calls
+from api.scheduler import acquire_lease, release_lease, run_as_leader
+
+
+class Command(BaseCommand):
+    help = "Reconcile stuck call sessions with Exotel, once or on a schedule, under the cluster-wide call_sync lease."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--loop', action='store_true',
+            help='Keep running every CALL_SYNC_INTERVAL seconds while holding the lease.',
+        )
+        parser.add_argument(
+            '--force', action='store_true',
+            help='Run once without taking the lease (e.g. when the leader is stuck).',
+        )
+
+    def handle(self, *args, **options):
+        if options['loop']:
+            stop = threading.Event()
+            signal.signal(signal.SIGTERM, lambda *_: stop.set())
+            signal.signal(signal.SIGINT, lambda *_: stop.set())
+            self.stdout.write(f"[SYNC JOB] Scheduler started, every {settings.CALL_SYNC_INTERVAL}s while leader")
+            run_as_leader(CALL_SYNC_LEASE, sync_stuck_calls, settings.CALL_SYNC_INTERVAL, stop)
+            release_lease(CALL_SYNC_LEASE)
+            self.stdout.write("[SYNC JOB] Stopped")
+            return
+
+        if not options['force']:
+            if not acquire_lease(CALL_SYNC_LEASE, settings.CALL_SYNC_INTERVAL * 2):
+                self.stdout.write("Another process holds the call_sync lease; skipping (use --force to run anyway)")
+                return
+
+        result = sync_stuck_calls()
+        self.stdout.write(self.style.SUCCESS(
+            f"Reconciled {result['reconciled']}/{result['stuck']} stuck calls in {result['durationMs']} ms "
+            f"({result['exotelErrors']} Exotel errors)"
+        ))
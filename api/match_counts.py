@@ -0,0 +1,53 @@
+"""
+Per-user match counter kept in users.match_count.
+
+A user's count is the number of `matches` rows they appear in on either side,
+which is what admin_profiles used to compute with a COUNT(*) subquery per row.
+Matches are only written by admin_views.admin_matches, which adjusts the
+counter in the same transaction; `manage.py rebuild_match_counts` repairs drift.
+"""
+from api.db_utils import execute_query, execute_update
+
+# Actual count per user: every row counts for user_id, and for matched_user_id
+# unless it is the same user.
+ACTUAL_MATCH_COUNTS_SQL = """
+    SELECT user_id, COUNT(*) AS actual
+    FROM (
+        SELECT user_id FROM matches
+        UNION ALL
+        SELECT matched_user_id FROM matches WHERE matched_user_id <> user_id
+    ) sides
+    GROUP BY user_id
+"""
+
+
+def adjust_match_counts(user_id, other_user_id, delta):
+    """Add `delta` to both users' counters (each match row counts for both sides)."""
+    if not delta:
+        return 0
+    return execute_update("""
+        UPDATE users
+        SET match_count = GREATEST(0, match_count + %s)
+        WHERE id IN (%s, %s)
+    """, [delta, user_id, other_user_id])
+
+
+def find_match_count_drift():
+    """Users whose stored counter differs from the real number of match rows."""
+    return execute_query(f"""
+        SELECT u.id AS user_id, u.match_count AS stored, COALESCE(c.actual, 0) AS actual
+        FROM users u
+        LEFT JOIN ({ACTUAL_MATCH_COUNTS_SQL}) c ON c.user_id = u.id
+        WHERE u.match_count <> COALESCE(c.actual, 0)
+        ORDER BY u.id
+    """)
+
+
+def rebuild_match_counts():
+    """Recompute every counter from `matches`; returns the number of rows changed."""
+    return execute_update(f"""
+        UPDATE users u
+        LEFT JOIN ({ACTUAL_MATCH_COUNTS_SQL}) c ON c.user_id = u.id
+        SET u.match_count = COALESCE(c.actual, 0)
+        WHERE u.match_count <> COALESCE(c.actual, 0)
+    """)
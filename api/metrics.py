@@ -0,0 +1,157 @@
+"""
+Daily business metrics (table `daily_metrics`, one row per calendar day).
+
+Write paths add their deltas with bump_daily_metrics() as things happen, and
+`manage.py reconcile_daily_metrics` (run nightly) recomputes recent days from
+the source tables, so the counters never drift for long. Dashboards sum a
+handful of these rows instead of scanning payments and call_sessions.
+
+Days follow the source rows' created_at, the same bucketing the dashboards used
+when they filtered the source tables directly.
+"""
+from datetime import datetime, time, timedelta
+
+from django.db import transaction
+
+from api.db_utils import execute_query, execute_update
+
+METRIC_COLUMNS = (
+    'signups',            # users with role 'user' created that day
+    'verified_revenue',   # amount of payments created that day and now verified
+    'completed_calls',    # call sessions created that day that completed
+    'call_seconds',       # their total duration
+    'call_minutes',       # their billed minutes (each call rounded up)
+    'credits_used',       # credits logged as 'used' that day (both participants)
+    'exotel_spend',       # what Exotel charged for the completed calls
+)
+
+# First day of the current month, as a SQL expression (DB time zone, like NOW()).
+MONTH_START_SQL = "(CURDATE() - INTERVAL (DAYOFMONTH(CURDATE()) - 1) DAY)"
+
+_COLUMN_LIST = ', '.join(METRIC_COLUMNS)
+
+# Per-day totals from the source tables; {range} limits each source's created_at.
+_RECOMPUTE_SQL = f"""
+    INSERT INTO daily_metrics (day, {_COLUMN_LIST}, updated_at)
+    SELECT day, SUM(signups), SUM(verified_revenue), SUM(completed_calls),
+           SUM(call_seconds), SUM(call_minutes), SUM(credits_used), SUM(exotel_spend), NOW()
+    FROM (
+        SELECT DATE(created_at) AS day, COUNT(*) AS signups, 0 AS verified_revenue,
+               0 AS completed_calls, 0 AS call_seconds, 0 AS call_minutes,
+               0 AS credits_used, 0 AS exotel_spend
+        FROM users
+        WHERE role = 'user' {{range}}
+        GROUP BY DATE(created_at)
+        UNION ALL
+        SELECT DATE(created_at), 0, SUM(amount), 0, 0, 0, 0, 0
+        FROM payments
+        WHERE status = 'verified' {{range}}
+        GROUP BY DATE(created_at)
+        UNION ALL
+        SELECT DATE(created_at), 0, 0, COUNT(*), SUM(COALESCE(duration, 0)),
+               SUM(CASE WHEN duration > 0 THEN CEIL(duration/60) ELSE 0 END),
+               0, SUM(COALESCE(exotel_price, 0))
+        FROM call_sessions
+        WHERE status = 'completed' {{range}}
+        GROUP BY DATE(created_at)
+        UNION ALL
+        SELECT DATE(created_at), 0, 0, 0, 0, 0, SUM(credits), 0
+        FROM exotel_credit_log
+        WHERE action = 'used' {{range}}
+        GROUP BY DATE(created_at)
+    ) src
+    GROUP BY day
+    ON DUPLICATE KEY UPDATE
+        {', '.join(f'{c} = VALUES({c})' for c in METRIC_COLUMNS)},
+        updated_at = NOW()
+"""
+
+
+def bump_daily_metrics(day=None, **deltas):
+    """
+    Add `deltas` (column=amount) to the row for `day` (default: today in the DB).
+
+    Best effort: a failure is logged and left for the nightly reconcile, so it
+    never fails the write it is accounting for. Call it outside
+    transaction.atomic() blocks.
+    """
+    unknown = set(deltas) - set(METRIC_COLUMNS)
+    if unknown:
+        raise ValueError(f"Unknown daily metric(s): {', '.join(sorted(unknown))}")
+    columns = [column for column, amount in deltas.items() if amount]
+    if not columns:
+        return
+
+    try:
+        execute_update(f"""
+            INSERT INTO daily_metrics (day, {', '.join(columns)}, updated_at)
+            VALUES (COALESCE(%s, CURDATE()), {', '.join(['%s'] * len(columns))}, NOW())
+            ON DUPLICATE KEY UPDATE
+                {', '.join(f'{c} = {c} + VALUES({c})' for c in columns)},
+                updated_at = NOW()
+        """, [day] + [deltas[column] for column in columns])
+    except Exception as e:
+        print(f"[METRICS] Failed to record {deltas} for {day or 'today'}: {e}")
+
+
+def record_completed_call(session, duration, exotel_price):
+    """Account for a session that just completed (bucketed by its created_at day)."""
+    duration = duration or 0
+    bump_daily_metrics(
+        session['created_at'].date(),
+        completed_calls=1,
+        call_seconds=duration,
+        call_minutes=(duration + 59) // 60,
+        exotel_spend=exotel_price or 0,
+    )
+
+
+def record_payment_status_change(payment, old_status, new_status):
+    """Move a payment's amount in or out of verified revenue when its status changes."""
+    was_verified = old_status == 'verified'
+    is_verified = new_status == 'verified'
+    if was_verified != is_verified:
+        amount = payment['amount'] if is_verified else -payment['amount']
+        bump_daily_metrics(payment['created_at'].date(), verified_revenue=amount)
+
+
+def reconcile_daily_metrics(start_day=None, end_day=None):
+    """
+    Recompute the rows for start_day..end_day (inclusive) from the source tables.
+
+    With no start_day, every day with any activity is rebuilt. Returns the
+    number of days written.
+    """
+    params = []
+    range_sql = ''
+    if start_day is not None:
+        end_day = end_day or datetime.now().date()
+        range_sql = 'AND created_at >= %s AND created_at < %s'
+        params = [datetime.combine(start_day, time.min),
+                  datetime.combine(end_day + timedelta(days=1), time.min)] * 4
+
+    with transaction.atomic():
+        # Days whose sources no longer have rows must end up at zero, not stale
+        if start_day is None:
+            execute_update("DELETE FROM daily_metrics")
+        else:
+            execute_update(f"""
+                UPDATE daily_metrics
+                SET {', '.join(f'{c} = 0' for c in METRIC_COLUMNS)}, updated_at = NOW()
+                WHERE day BETWEEN %s AND %s
+            """, [start_day, end_day])
+        execute_update(_RECOMPUTE_SQL.format(range=range_sql), params)
+
+    if start_day is None:
+        return execute_query("SELECT COUNT(*) as days FROM daily_metrics")[0]['days']
+    return (end_day - start_day).days + 1
+
+
+def get_daily_metrics(start_day, end_day):
+    """Rows for start_day..end_day (inclusive), one dict per stored day."""
+    return execute_query(f"""
+        SELECT day, {_COLUMN_LIST}
+        FROM daily_metrics
+        WHERE day BETWEEN %s AND %s
+        ORDER BY day
+    """, [start_day, end_day])
@@ -0,0 +1,56 @@
+"""
+Building blocks for the raw-SQL migrations in api/migrations.
+
+The tables behind this app predate Django migrations (there are no models), so
+schema changes are shipped as guarded DDL: each operation checks
+information_schema first and is a no-op when the change is already in place.
+"""
+from django.db import migrations
+
+
+def _index_exists(schema_editor, table, name):
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("""
+            SELECT 1 FROM information_schema.statistics
+            WHERE table_schema = DATABASE() AND table_name = %s AND index_name = %s
+            LIMIT 1
+        """, [table, name])
+        return cursor.fetchone() is not None
+
+
+def _column_exists(schema_editor, table, column):
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("""
+            SELECT 1 FROM information_schema.columns
+            WHERE table_schema = DATABASE() AND table_name = %s AND column_name = %s
+            LIMIT 1
+        """, [table, column])
+        return cursor.fetchone() is not None
+
+
+def add_index(table, name, columns, unique=False):
+    """Create index `name` on `table (columns)` unless it exists; reverse drops it."""
+    def forwards(apps, schema_editor):
+        if not _index_exists(schema_editor, table, name):
+            kind = 'UNIQUE INDEX' if unique else 'INDEX'
+            schema_editor.execute(f"CREATE {kind} {name} ON {table} ({columns})")
+
+    def backwards(apps, schema_editor):
+        if _index_exists(schema_editor, table, name):
+            schema_editor.execute(f"DROP INDEX {name} ON {table}")
+
+    return migrations.RunPython(forwards, backwards)
+
+
+
+def add_column(table, column, definition):
+    """Add `column definition` to `table` unless it exists; reverse drops it."""
+    def forwards(apps, schema_editor):
+        if not _column_exists(schema_editor, table, column):
+            schema_editor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+
+    def backwards(apps, schema_editor):
+        if _column_exists(schema_editor, table, column):
+            schema_editor.execute(f"ALTER TABLE {table} DROP COLUMN {column}")
+
+    return migrations.RunPython(forwards, backwards)
@@ -0,0 +1,17 @@
+from django.db import migrations
+
+from api.migration_utils import add_index
+
+
+class Migration(migrations.Migration):
+    """Index for keyset pagination of GET /api/admin/profiles on (created_at, id)."""
+
+    initial = True
+
+    dependencies = []
+
+    operations = [
+        # InnoDB appends the primary key to secondary indexes, so this also
+        # covers the `id` tie-breaker.
+        add_index('users', 'idx_users_role_created_at', 'role, created_at'),
+    ]
@@ -0,0 +1,33 @@
+from django.db import migrations
+
+from api.migration_utils import add_column
+
+
+class Migration(migrations.Migration):
+    """Denormalised per-user match counter read by GET /api/admin/profiles."""
+
+    dependencies = [
+        ('api', '0001_admin_profiles_index'),
+    ]
+
+    operations = [
+        add_column('users', 'match_count', 'INT NOT NULL DEFAULT 0'),
+        # Frozen copy of api.match_counts.ACTUAL_MATCH_COUNTS_SQL as of this
+        # migration: what it does must not change when the live rule does.
+        migrations.RunSQL(
+            """
+            UPDATE users u
+            LEFT JOIN (
+                SELECT user_id, COUNT(*) AS actual
+                FROM (
+                    SELECT user_id FROM matches
+                    UNION ALL
+                    SELECT matched_user_id FROM matches WHERE matched_user_id <> user_id
+                ) sides
+                GROUP BY user_id
+            ) c ON c.user_id = u.id
+            SET u.match_count = COALESCE(c.actual, 0)
+            """,
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
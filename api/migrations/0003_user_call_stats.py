@@ -0,0 +1,65 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    """Per-user call statistics rollup read by GET /api/admin/user-call-logs."""
+
+    dependencies = [
+        ('api', '0002_users_match_count'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            """
+            CREATE TABLE IF NOT EXISTS user_call_stats (
+                user_id INT NOT NULL PRIMARY KEY,
+                outgoing_calls INT NOT NULL DEFAULT 0,
+                incoming_calls INT NOT NULL DEFAULT 0,
+                completed_calls INT NOT NULL DEFAULT 0,
+                total_minutes INT NOT NULL DEFAULT 0,
+                completed_seconds BIGINT NOT NULL DEFAULT 0,
+                completed_with_duration INT NOT NULL DEFAULT 0,
+                total_cost DECIMAL(12, 2) NOT NULL DEFAULT 0,
+                last_call_at DATETIME NULL,
+                updated_at DATETIME NOT NULL
+            )
+            """,
+            reverse_sql="DROP TABLE IF EXISTS user_call_stats",
+        ),
+        migrations.RunSQL("DELETE FROM user_call_stats", reverse_sql=migrations.RunSQL.noop),
+        # Frozen copy of api.call_stats.REBUILD_SQL as of this migration: what
+        # it does must not change when the live rollup rule does.
+        migrations.RunSQL(
+            """
+            INSERT INTO user_call_stats (
+                user_id, outgoing_calls, incoming_calls, completed_calls, total_minutes,
+                completed_seconds, completed_with_duration, total_cost, last_call_at, updated_at
+            )
+            SELECT
+                user_id,
+                SUM(outgoing),
+                SUM(incoming),
+                SUM(CASE WHEN status = 'completed' THEN 1 ELSE 0 END),
+                SUM(CASE WHEN status = 'completed' THEN CEIL(COALESCE(duration, 0)/60) ELSE 0 END),
+                SUM(CASE WHEN status = 'completed' AND duration > 0 THEN duration ELSE 0 END),
+                SUM(CASE WHEN status = 'completed' AND duration > 0 THEN 1 ELSE 0 END),
+                SUM(COALESCE(cost, 0)),
+                MAX(created_at),
+                NOW()
+            FROM (
+                SELECT caller_id AS user_id, 1 AS outgoing,
+                       CASE WHEN receiver_id = caller_id THEN 1 ELSE 0 END AS incoming,
+                       status, duration, cost, created_at
+                FROM call_sessions
+                WHERE status IN ('completed', 'failed', 'busy', 'no-answer', 'canceled')
+                UNION ALL
+                SELECT receiver_id, 0, 1, status, duration, cost, created_at
+                FROM call_sessions
+                WHERE status IN ('completed', 'failed', 'busy', 'no-answer', 'canceled')
+                  AND receiver_id <> caller_id
+            ) sides
+            GROUP BY user_id
+            """,
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
@@ -0,0 +1,34 @@
+from django.db import migrations
+
+
+def backfill(apps, schema_editor):
+    from api.metrics import reconcile_daily_metrics
+    reconcile_daily_metrics()
+
+
+class Migration(migrations.Migration):
+    """Per-day signups, revenue and call totals read by the admin dashboards."""
+
+    dependencies = [
+        ('api', '0003_user_call_stats'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            """
+            CREATE TABLE IF NOT EXISTS daily_metrics (
+                day DATE NOT NULL PRIMARY KEY,
+                signups INT NOT NULL DEFAULT 0,
+                verified_revenue DECIMAL(12, 2) NOT NULL DEFAULT 0,
+                completed_calls INT NOT NULL DEFAULT 0,
+                call_seconds BIGINT NOT NULL DEFAULT 0,
+                call_minutes INT NOT NULL DEFAULT 0,
+                credits_used INT NOT NULL DEFAULT 0,
+                exotel_spend DECIMAL(12, 4) NOT NULL DEFAULT 0,
+                updated_at DATETIME NOT NULL
+            )
+            """,
+            reverse_sql="DROP TABLE IF EXISTS daily_metrics",
+        ),
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,21 @@
+from django.db import migrations
+
+from api.migration_utils import add_column, add_index
+
+
+class Migration(migrations.Migration):
+    """Queue bookkeeping on webhook_logs for CALL_WEBHOOK_MODE=queue."""
+
+    dependencies = [
+        ('api', '0004_daily_metrics'),
+    ]
+
+    operations = [
+        add_column('webhook_logs', 'queued', 'TINYINT NOT NULL DEFAULT 0'),
+        add_column('webhook_logs', 'attempts', 'INT NOT NULL DEFAULT 0'),
+        add_column('webhook_logs', 'next_attempt_at', 'DATETIME NULL'),
+        add_column('webhook_logs', 'locked_until', 'DATETIME NULL'),
+        add_column('webhook_logs', 'last_error', 'TEXT NULL'),
+        add_index('webhook_logs', 'idx_webhook_logs_queue', 'queued, processed, id'),
+        add_index('webhook_logs', 'idx_webhook_logs_call_sid', 'call_sid, id'),
+    ]
@@ -0,0 +1,23 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    """Lease rows used to elect a single leader for periodic jobs (api/scheduler.py)."""
+
+    dependencies = [
+        ('api', '0005_webhook_queue'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            """
+            CREATE TABLE IF NOT EXISTS scheduler_leases (
+                name VARCHAR(64) NOT NULL PRIMARY KEY,
+                holder VARCHAR(128) NOT NULL,
+                expires_at DATETIME NOT NULL,
+                acquired_at DATETIME NOT NULL
+            )
+            """,
+            reverse_sql="DROP TABLE IF EXISTS scheduler_leases",
+        ),
+    ]
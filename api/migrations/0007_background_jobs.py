@@ -0,0 +1,33 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    """Durable background job queue (api/jobs.py, `manage.py runworker`)."""
+
+    dependencies = [
+        ('api', '0006_scheduler_leases'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            """
+            CREATE TABLE IF NOT EXISTS background_jobs (
+                id BIGINT NOT NULL AUTO_INCREMENT PRIMARY KEY,
+                job_type VARCHAR(64) NOT NULL,
+                payload TEXT NOT NULL,
+                status VARCHAR(16) NOT NULL DEFAULT 'queued',
+                attempts INT NOT NULL DEFAULT 0,
+                max_attempts INT NOT NULL,
+                run_at DATETIME NOT NULL,
+                locked_until DATETIME NULL,
+                locked_by VARCHAR(128) NULL,
+                last_error TEXT NULL,
+                created_at DATETIME NOT NULL,
+                updated_at DATETIME NOT NULL,
+                KEY idx_background_jobs_due (status, run_at, id),
+                KEY idx_background_jobs_type (job_type, status)
+            )
+            """,
+            reverse_sql="DROP TABLE IF EXISTS background_jobs",
+        ),
+    ]
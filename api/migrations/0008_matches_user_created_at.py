@@ -0,0 +1,16 @@
+from django.db import migrations
+
+from api.migration_utils import add_index
+
+
+class Migration(migrations.Migration):
+    """Index for keyset pagination of GET /api/user/matches on (matched_at, id)."""
+
+    dependencies = [
+        ('api', '0007_background_jobs'),
+    ]
+
+    operations = [
+        # The primary key is appended by InnoDB, covering the m.id tie-breaker.
+        add_index('matches', 'idx_matches_user_created_at', 'user_id, created_at'),
+    ]
@@ -0,0 +1,26 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    """Revoked JWTs: single tokens (logout) and per-user cut-offs (api/token_revocations.py)."""
+
+    dependencies = [
+        ('api', '0008_matches_user_created_at'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            """
+            CREATE TABLE IF NOT EXISTS token_revocations (
+                id BIGINT NOT NULL AUTO_INCREMENT PRIMARY KEY,
+                user_id INT NULL,
+                token_digest CHAR(64) NULL,
+                not_before BIGINT NULL,
+                expires_at BIGINT NOT NULL,
+                created_at DATETIME NOT NULL,
+                KEY idx_token_revocations_expires_at (expires_at)
+            )
+            """,
+            reverse_sql="DROP TABLE IF EXISTS token_revocations",
+        ),
+    ]
@@ -0,0 +1,17 @@
+from django.db import migrations
+
+from api.migration_utils import add_index
+
+
+class Migration(migrations.Migration):
+    """Index for admin login by name (POST /api/auth/login with type=admin)."""
+
+    dependencies = [
+        ('api', '0009_token_revocations'),
+    ]
+
+    operations = [
+        # Email and phone logins use the existing unique indexes on
+        # users.email / users.phone.
+        add_index('users', 'idx_users_role_name', 'role, name'),
+    ]
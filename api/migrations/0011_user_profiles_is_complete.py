@@ -0,0 +1,33 @@
+from django.db import migrations
+
+from api.migration_utils import add_column, add_index
+
+
+class Migration(migrations.Migration):
+    """Persisted profile completeness read by POST /api/auth/login and GET /api/auth/verify."""
+
+    dependencies = [
+        ('api', '0010_users_role_name'),
+    ]
+
+    operations = [
+        add_column('user_profiles', 'is_complete', 'TINYINT(1) NOT NULL DEFAULT 0'),
+        # Covers the auth lookup by user_id; InnoDB appends the primary key,
+        # so profile existence (up.id) is read from the index too.
+        add_index('user_profiles', 'idx_user_profiles_user_complete', 'user_id, is_complete'),
+        # Frozen copy of api.profile_completeness.IS_COMPLETE_SQL as of this
+        # migration: what it does must not change when the live rule does.
+        migrations.RunSQL(
+            """
+            UPDATE user_profiles
+            SET is_complete = (
+                COALESCE(status, '') <> 'rejected' AND COALESCE(age, 0) <> 0
+                AND TRIM(COALESCE(gender, '')) <> '' AND TRIM(COALESCE(caste, '')) <> ''
+                AND TRIM(COALESCE(religion, '')) <> '' AND TRIM(COALESCE(education, '')) <> ''
+                AND TRIM(COALESCE(occupation, '')) <> '' AND TRIM(COALESCE(state, '')) <> ''
+                AND TRIM(COALESCE(city, '')) <> '' AND TRIM(COALESCE(marital_status, '')) <> ''
+            )
+            """,
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
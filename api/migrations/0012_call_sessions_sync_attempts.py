@@ -0,0 +1,18 @@
+from django.db import migrations
+
+from api.migration_utils import add_column, add_index
+
+
+class Migration(migrations.Migration):
+    """Per-session bookkeeping for the stuck-call sync job (api/call_sync.py)."""
+
+    dependencies = [
+        ('api', '0011_user_profiles_is_complete'),
+    ]
+
+    operations = [
+        add_column('call_sessions', 'last_synced_at', 'DATETIME NULL'),
+        add_column('call_sessions', 'sync_attempts', 'INT NOT NULL DEFAULT 0'),
+        # Stuck sessions, least recently synced first
+        add_index('call_sessions', 'idx_call_sessions_status_synced', 'status, last_synced_at'),
+    ]
@@ -0,0 +1,63 @@
+"""
+Keyset ("seek") pagination helpers.
+
+List endpoints hand out an opaque `nextCursor` holding the sort key of the last
+row on the page; the next request continues with `WHERE (key) < (cursor)`, which
+stays an index range scan no matter how deep the client pages.
+"""
+import base64
+import json
+from datetime import date, datetime
+
+
+class InvalidPageParam(ValueError):
+    """A `cursor` or `limit` query parameter that can't be used."""
+
+
+def encode_cursor(*values):
+    """Pack the sort key of the last row into an opaque URL-safe token."""
+    plain = [
+        v.isoformat(sep=' ') if isinstance(v, datetime)
+        else v.isoformat() if isinstance(v, date)
+        else v
+        for v in values
+    ]
+    raw = json.dumps(plain, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(token, size):
+    """Unpack a token from encode_cursor(); raises InvalidPageParam if it's malformed."""
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        values = json.loads(raw)
+    except (ValueError, TypeError):
+        raise InvalidPageParam('Invalid cursor')
+    if not isinstance(values, list) or len(values) != size:
+        raise InvalidPageParam('Invalid cursor')
+    # Values go straight into SQL parameters: only scalars (no bools) allowed
+    if any(isinstance(v, bool) or not isinstance(v, (str, int, float)) for v in values):
+        raise InvalidPageParam('Invalid cursor')
+    return values
+
+
+def parse_limit(value, default=50, maximum=200):
+    """Page size from a query string value, clamped to 1..maximum."""
+    if value in (None, ''):
+        return default
+    try:
+        return min(maximum, max(1, int(value)))
+    except (TypeError, ValueError):
+        raise InvalidPageParam('limit must be an integer')
+
+
+def parse_bool(value):
+    """'1'/'true'/'yes' -> True, '0'/'false'/'no' -> False, missing -> None."""
+    if value in (None, ''):
+        return None
+    lowered = str(value).lower()
+    if lowered in ('1', 'true', 'yes'):
+        return True
+    if lowered in ('0', 'false', 'no'):
+        return False
+    raise InvalidPageParam(f'Invalid boolean value: {value}')
@@ -0,0 +1,132 @@
+"""
+Bounded execution of bcrypt work (hash_password / verify_password in api.utils).
+
+A bcrypt call costs hundreds of milliseconds of CPU. Left unbounded, a burst
+of logins occupies every gunicorn worker and starves all other endpoints, so
+bcrypt runs:
+
+  * on a small per-process executor (BCRYPT_THREADS threads, at most
+    BCRYPT_QUEUE_SIZE calls waiting), and
+  * in at most BCRYPT_HOST_SLOTS processes per host at once, enforced with
+    flock()ed slot files, so the remaining sync workers stay free for
+    other requests.
+
+When no slot frees up within BCRYPT_MAX_WAIT_MS, or the executor queue is
+full, PasswordHasherBusy is raised and views answer 503 straight away.
+"""
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+
+try:
+    import fcntl
+except ImportError:  # Windows development machines: no host-wide limit
+    fcntl = None
+
+
+class PasswordHasherBusy(Exception):
+    """All bcrypt capacity is in use; the caller should answer 503."""
+
+
+_lock = threading.Lock()
+_executor = None
+_executor_pid = None
+_admission = None
+
+_metrics = {
+    'calls': 0,
+    'rejected': 0,
+    'inFlight': 0,
+    'totalMs': 0.0,
+    'maxMs': 0.0,
+    'lastMs': None,
+}
+
+
+def _get_executor():
+    global _executor, _executor_pid, _admission
+    if _executor_pid != os.getpid():
+        with _lock:
+            if _executor_pid != os.getpid():
+                _executor = ThreadPoolExecutor(max_workers=settings.BCRYPT_THREADS,
+                                               thread_name_prefix='bcrypt')
+                _admission = threading.BoundedSemaphore(settings.BCRYPT_THREADS + settings.BCRYPT_QUEUE_SIZE)
+                _executor_pid = os.getpid()
+    return _executor, _admission
+
+
+def _slot_path(n):
+    return os.path.join(settings.BCRYPT_SLOT_DIR or tempfile.gettempdir(), f'matrimony-bcrypt-{n}.lock')
+
+
+def _acquire_host_slot():
+    """Lock one of the host-wide slot files; returns its fd, or None if none freed up in time"""
+    deadline = time.monotonic() + settings.BCRYPT_MAX_WAIT_MS / 1000
+    while True:
+        for n in range(settings.BCRYPT_HOST_SLOTS):
+            fd = os.open(_slot_path(n), os.O_RDWR | os.O_CREAT, 0o600)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                return fd
+            except OSError:
+                os.close(fd)
+        if time.monotonic() >= deadline:
+            return None
+        time.sleep(0.01)
+
+
+def _run_in_slot(func, args):
+    fd = None
+    if fcntl is not None and settings.BCRYPT_HOST_SLOTS > 0:
+        fd = _acquire_host_slot()
+        if fd is None:
+            raise PasswordHasherBusy('No bcrypt slot free on this host')
+    try:
+        started = time.monotonic()
+        result = func(*args)
+        elapsed_ms = (time.monotonic() - started) * 1000
+    finally:
+        if fd is not None:
+            os.close(fd)  # releases the flock
+
+    with _lock:
+        _metrics['calls'] += 1
+        _metrics['totalMs'] += elapsed_ms
+        _metrics['maxMs'] = max(_metrics['maxMs'], elapsed_ms)
+        _metrics['lastMs'] = round(elapsed_ms, 1)
+    return result
+
+
+def run_bcrypt(func, *args):
+    """Run func(*args) on the bounded bcrypt executor; raises PasswordHasherBusy when saturated"""
+    executor, admission = _get_executor()
+    if not admission.acquire(blocking=False):
+        with _lock:
+            _metrics['rejected'] += 1
+        raise PasswordHasherBusy('bcrypt queue is full')
+
+    with _lock:
+        _metrics['inFlight'] += 1
+    try:
+        return executor.submit(_run_in_slot, func, args).result()
+    except PasswordHasherBusy:
+        with _lock:
+            _metrics['rejected'] += 1
+        raise
+    finally:
+        with _lock:
+            _metrics['inFlight'] -= 1
+        admission.release()
+
+
+def hasher_stats():
+    """Queue depth and bcrypt latency for this process (GET /api/admin/runtime-stats)"""
+    with _lock:
+        stats = dict(_metrics)
+    stats['avgMs'] = round(stats.pop('totalMs') / stats['calls'], 1) if stats['calls'] else None
+    stats['maxMs'] = round(stats['maxMs'], 1)
+    return stats
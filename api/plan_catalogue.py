@@ -0,0 +1,90 @@
+"""
+The public plan catalogue (GET /api/plans), cached per worker as the
+serialised response body.
+
+Plans change a few times a year, so the body is built once and served as
+bytes until an admin plan write calls invalidate_plan_catalogue() or
+PLAN_CATALOGUE_TTL runs out. Invalidation drops this worker's copy and bumps a
+generation counter in CACHES['default']; with a shared cache backend every
+worker sees the bump on its next request, with the per-process default the
+others pick up the change when their TTL expires.
+"""
+import hashlib
+import json
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+
+from api.db_utils import execute_query
+
+GENERATION_KEY = 'plans:catalogue:generation'
+
+_lock = threading.Lock()
+_cached = None  # (body, digest, generation, expires_at monotonic)
+
+
+def _generation():
+    try:
+        return cache.get(GENERATION_KEY, 0)
+    except Exception as e:
+        print(f"[PLANS] Catalogue generation lookup failed: {e}")
+        return 0
+
+
+def _build():
+    plans = execute_query("""
+        SELECT * FROM plans
+        WHERE is_active = 1
+        ORDER BY type, price ASC
+    """)
+
+    # Parse features
+    formatted_plans = []
+    for plan in plans:
+        plan_data = dict(plan)
+        if plan_data.get('features'):
+            plan_data['features'] = [
+                f.strip() for f in plan_data['features'].split(',')
+                if f.strip()
+            ]
+        else:
+            plan_data['features'] = None
+        formatted_plans.append(plan_data)
+
+    # Same encoding JsonResponse uses
+    return json.dumps({'plans': formatted_plans}, cls=DjangoJSONEncoder).encode()
+
+
+def get_plan_catalogue():
+    """The catalogue as (JSON body bytes, hex digest of the body)"""
+    global _cached
+    generation = _generation()
+    cached = _cached
+    if cached and cached[2] == generation and cached[3] > time.monotonic():
+        return cached[0], cached[1]
+
+    with _lock:
+        # Another thread may have rebuilt it while we waited
+        cached = _cached
+        if cached and cached[2] == generation and cached[3] > time.monotonic():
+            return cached[0], cached[1]
+
+        body = _build()
+        digest = hashlib.sha1(body).hexdigest()
+        _cached = (body, digest, generation, time.monotonic() + settings.PLAN_CATALOGUE_TTL)
+        return body, digest
+
+
+def invalidate_plan_catalogue():
+    """Call after any write to plans"""
+    global _cached
+    _cached = None
+    try:
+        cache.incr(GENERATION_KEY)
+    except ValueError:
+        cache.set(GENERATION_KEY, 1, None)
+    except Exception as e:
+        print(f"[PLANS] Catalogue invalidation failed: {e}")
@@ -0,0 +1,48 @@
+"""
+Profile completeness kept in user_profiles.is_complete.
+
+A profile is complete when it has not been rejected and every required field
+is filled in, which is what login and verify used to work out in Python from
+nine columns on every call. The flag is written together with the profile:
+edit_profile and approve_profile set it in the same UPDATE, and the two
+create_profile views refresh it straight after their INSERT.
+`manage.py rebuild_profile_complete` repairs drift.
+"""
+from api.db_utils import execute_query, execute_update
+
+PROFILE_REQUIRED_FIELDS = ['age', 'gender', 'caste', 'religion', 'education',
+                           'occupation', 'state', 'city', 'marital_status']
+
+# The completeness rule over a user_profiles row (unqualified columns). In an
+# UPDATE, MySQL evaluates SET assignments left to right, so placing
+# `is_complete = <this>` last sees the values set before it.
+IS_COMPLETE_SQL = "(COALESCE(status, '') <> 'rejected' AND COALESCE(age, 0) <> 0 AND " + " AND ".join(
+    f"TRIM(COALESCE({field}, '')) <> ''" for field in PROFILE_REQUIRED_FIELDS if field != 'age'
+) + ")"
+
+
+def refresh_profile_complete(user_id):
+    """Recompute is_complete for the user's profile after an INSERT."""
+    return execute_update(
+        f"UPDATE user_profiles SET is_complete = {IS_COMPLETE_SQL} WHERE user_id = %s",
+        [user_id]
+    )
+
+
+def find_profile_complete_drift():
+    """Profiles whose stored flag disagrees with their fields."""
+    return execute_query(f"""
+        SELECT id AS profile_id, user_id, is_complete AS stored, {IS_COMPLETE_SQL} AS actual
+        FROM user_profiles
+        WHERE is_complete <> {IS_COMPLETE_SQL}
+        ORDER BY id
+    """)
+
+
+def rebuild_profile_complete():
+    """Recompute every flag; returns the number of rows changed."""
+    return execute_update(f"""
+        UPDATE user_profiles
+        SET is_complete = {IS_COMPLETE_SQL}
+        WHERE is_complete <> {IS_COMPLETE_SQL}
+    """)
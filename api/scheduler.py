@@ -0,0 +1,96 @@
+"""
+Cluster-wide single-leader scheduling for periodic jobs.
+
+Every gunicorn worker on every host may run a scheduler thread, but a job only
+runs in the process holding its lease row in `scheduler_leases`. The holder
+renews the lease on every tick; if it dies, the lease expires and the next
+process to tick takes over.
+"""
+import os
+import socket
+import threading
+import uuid
+
+from api.db_utils import execute_query, execute_update
+
+_holder = None
+_holder_pid = None
+
+
+def holder_id():
+    """This process's lease holder id, e.g. "web-1:4123:9f2c1a" (new after a fork)."""
+    global _holder, _holder_pid
+    if _holder_pid != os.getpid():
+        _holder = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        _holder_pid = os.getpid()
+    return _holder
+
+
+def acquire_lease(name, ttl):
+    """
+    Take or renew lease `name` for `ttl` seconds; True if this process holds it.
+
+    The upsert only changes the row when the lease is free, expired or already
+    ours (holder must be assigned before expires_at: MySQL applies the SET
+    list left to right).
+    """
+    me = holder_id()
+    execute_update("""
+        INSERT INTO scheduler_leases (name, holder, expires_at, acquired_at)
+        VALUES (%s, %s, NOW() + INTERVAL %s SECOND, NOW())
+        ON DUPLICATE KEY UPDATE
+            acquired_at = IF(expires_at < NOW(), VALUES(acquired_at), acquired_at),
+            holder = IF(holder = VALUES(holder) OR expires_at < NOW(), VALUES(holder), holder),
+            expires_at = IF(holder = VALUES(holder), VALUES(expires_at), expires_at)
+    """, [name, me, int(ttl)])
+    rows = execute_query("SELECT holder FROM scheduler_leases WHERE name = %s", [name])
+    return bool(rows) and rows[0]['holder'] == me
+
+
+def release_lease(name):
+    """Give up lease `name` if this process holds it, so another can take over at once."""
+    execute_update("""
+        UPDATE scheduler_leases SET expires_at = NOW() - INTERVAL 1 SECOND
+        WHERE name = %s AND holder = %s
+    """, [name, holder_id()])
+
+
+def lease_status(name):
+    rows = execute_query(
+        "SELECT holder, expires_at, acquired_at FROM scheduler_leases WHERE name = %s", [name]
+    )
+    if not rows:
+        return None
+    return {
+        'holder': rows[0]['holder'],
+        'isMe': rows[0]['holder'] == holder_id(),
+        'expiresAt': str(rows[0]['expires_at']),
+        'acquiredAt': str(rows[0]['acquired_at']),
+    }
+
+
+def run_as_leader(name, func, interval, stop_event=None):
+    """
+    Call func() every `interval` seconds, but only while holding lease `name`.
+
+    The lease lasts two intervals, so a leader that is slow to finish a run
+    keeps it, and a dead leader is replaced within about two intervals.
+    Runs until stop_event is set (forever if None).
+    """
+    stop_event = stop_event or threading.Event()
+    while not stop_event.is_set():
+        try:
+            if acquire_lease(name, interval * 2):
+                func()
+        except Exception as e:
+            print(f"[SCHEDULER] {name} error: {e}")
+        stop_event.wait(interval)
+
+
+def start_leader_thread(name, func, interval):
+    """Start run_as_leader() in a daemon thread; returns the thread."""
+    thread = threading.Thread(
+        target=run_as_leader, args=(name, func, interval), name=f'scheduler-{name}', daemon=True
+    )
+    thread.start()
+    return thread
@@ -0,0 +1,354 @@
+"""
+Regression tests that run without a database (SimpleTestCase).
+
+The views talk to MySQL through api.db_utils, so view tests patch the view
+module's execute_query / iter_query with a fake that records every call and
+returns canned rows; query counts are asserted on those records.
+"""
+import json
+import time
+from datetime import datetime
+from unittest import mock
+
+import jwt
+from django.conf import settings
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from api import call_sync, token_revocations, utils
+from api.pagination import InvalidPageParam, decode_cursor, encode_cursor
+from api.utils import create_jwt_token, streaming_json_response
+from api.views import admin_views, auth_views, user_views
+
+
+class FakeQueries:
+    """Stands in for execute_query: records each call and answers from `respond(sql)`"""
+
+    def __init__(self, respond):
+        self.respond = respond
+        self.calls = []
+
+    def __call__(self, query, params=None):
+        self.calls.append((query, params))
+        return self.respond(query)
+
+    def iterate(self, query, params=None, *args, **kwargs):
+        return iter(self(query, params))
+
+
+def _bearer(user_id, role):
+    token = create_jwt_token({'id': user_id, 'email': f'{role}@example.com', 'role': role})
+    return {'HTTP_AUTHORIZATION': f'Bearer {token}'}
+
+
+class AuthedViewTestCase(SimpleTestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+        # Token checks would otherwise pull the revocation list from MySQL
+        patcher = mock.patch('api.utils.is_revoked', return_value=False)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def patch_queries(self, module, respond):
+        fake = FakeQueries(respond)
+        for name, func in (('execute_query', fake), ('iter_query', fake.iterate)):
+            if hasattr(module, name):
+                patcher = mock.patch.object(module, name, func)
+                patcher.start()
+                self.addCleanup(patcher.stop)
+        return fake
+
+
+class AdminUserCallLogsQueryCountTests(AuthedViewTestCase):
+    """GET /api/admin/user-call-logs costs the same queries for any page size"""
+
+    def _call_log(self, n):
+        return {
+            'session_id': n, 'caller_id': 7, 'receiver_id': 100 + n, 'status': 'completed',
+            'duration': 60, 'cost': 1.5, 'caller_virtual_number': '080', 'receiver_virtual_number': '080',
+            'started_at': '2026-01-01 10:00:00', 'ended_at': '2026-01-01 10:01:00',
+            'created_at': '2026-01-01 10:00:00', 'caller_name': 'Caller', 'caller_phone': '9000000000',
+            'receiver_name': f'Receiver {n}', 'receiver_phone': '9000000001', 'other_party_photo': None,
+        }
+
+    def _user_stats(self, n):
+        return {
+            'id': n, 'name': f'User {n}', 'email': f'u{n}@example.com', 'phone': '9000000000',
+            'profile_photo': None, 'credits_remaining': 3, 'credits_purchased': 5,
+            'credits_expire': '2026-12-31 00:00:00', 'outgoing_calls': 2, 'incoming_calls': 1,
+            'completed_calls': 2, 'total_minutes': 4, 'completed_seconds': 200,
+            'completed_with_duration': 2, 'total_cost': 3.0, 'last_call_at': '2026-01-01 10:00:00',
+        }
+
+    def _query_count(self, limit, user_id=None):
+        row = self._call_log if user_id else self._user_stats
+
+        def respond(query):
+            if 'COUNT(*)' in query and 'LIMIT' not in query:
+                return [{'total': 500}]
+            return [row(n) for n in range(limit)]
+
+        fake = self.patch_queries(admin_views, respond)
+        params = {'page': 2, 'limit': limit}
+        if user_id:
+            params['userId'] = user_id
+        request = self.factory.get('/api/admin/user-call-logs', params, **_bearer(1, 'admin'))
+        response = admin_views.admin_user_call_logs(request)
+
+        self.assertEqual(response.status_code, 200)
+        body = json.loads(response.content)
+        self.assertEqual(len(body['callLogs'] if user_id else body['users']), limit)
+        return len(fake.calls)
+
+    def test_user_call_logs_fixed_query_count(self):
+        small = self._query_count(1, user_id=7)
+        large = self._query_count(100, user_id=7)
+        self.assertEqual(small, large)
+        self.assertEqual(large, 2)  # page + total
+
+    def test_user_list_fixed_query_count(self):
+        small = self._query_count(1)
+        large = self._query_count(100)
+        self.assertEqual(small, large)
+        self.assertEqual(large, 2)  # page + total
+
+
+class ProfileDetailQueryCountTests(AuthedViewTestCase):
+    """Plan check, match and profile detail lookups take a single round trip"""
+
+    PROFILE = {
+        'id': 42, 'name': 'Match', 'email': 'm@example.com', 'phone': '9000000000',
+        'age': 29, 'gender': 'female', 'city': 'Pune',
+    }
+
+    def _count_queries(self, row):
+        # Any entitlement snapshot load would go through api.entitlements, so
+        # it is counted with the view's own queries
+        fake = self.patch_queries(user_views, lambda query: [dict(row)])
+        patcher = mock.patch('api.entitlements.execute_query', fake)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        return fake
+
+    def _match_details(self, row):
+        fake = self._count_queries(dict(row, match_id=row.get('match_id', 9)))
+        request = self.factory.post('/api/matches', json.dumps({'matchedUserId': 42}),
+                                    content_type='application/json', **_bearer(7, 'user'))
+        return user_views.get_match_details(request), fake
+
+    def _profile_details(self, row):
+        fake = self._count_queries(row)
+        request = self.factory.get('/api/user/profile-details/42', **_bearer(7, 'user'))
+        return user_views.profile_details(request, 42), fake
+
+    def test_match_details_one_query(self):
+        response, fake = self._match_details(dict(self.PROFILE, can_view_details=1))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.content)['profile'], self.PROFILE)
+        self.assertEqual(len(fake.calls), 1)
+
+    def test_match_details_not_matched(self):
+        empty = {field: None for field in self.PROFILE}
+        response, fake = self._match_details(dict(empty, can_view_details=1, match_id=None))
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(len(fake.calls), 1)
+
+    def test_match_details_profile_not_approved(self):
+        response, fake = self._match_details(dict(self.PROFILE, id=None, can_view_details=1))
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(len(fake.calls), 1)
+
+    def test_match_details_without_plan(self):
+        response, fake = self._match_details(dict(self.PROFILE, can_view_details=0))
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(len(fake.calls), 1)
+
+    def test_profile_details_one_query(self):
+        response, fake = self._profile_details(dict(self.PROFILE, can_view_details=1, is_matched=1))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.content)['profile'], dict(self.PROFILE, is_matched=True))
+        self.assertEqual(len(fake.calls), 1)
+
+    def test_profile_details_not_found(self):
+        empty = {field: None for field in self.PROFILE}
+        response, fake = self._profile_details(dict(empty, can_view_details=1, is_matched=0))
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(len(fake.calls), 1)
+
+    def test_profile_details_without_plan(self):
+        response, fake = self._profile_details(dict(self.PROFILE, can_view_details=0, is_matched=0))
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(len(fake.calls), 1)
+
+
+class LoginLookupTests(AuthedViewTestCase):
+    """POST /api/auth/login matches the identifier on one column"""
+
+    def _login(self, identifier):
+        fake = self.patch_queries(auth_views, lambda query: [])
+        request = self.factory.post('/api/auth/login', json.dumps({
+            'identifier': identifier, 'password': 'secret', 'type': 'user',
+        }), content_type='application/json')
+        response = auth_views.login(request)
+        return response, fake.calls
+
+    def test_phone_sent_as_number(self):
+        response, calls = self._login(9876543210)
+        self.assertEqual(response.status_code, 401)
+        self.assertIn('u.phone IN', calls[0][0])
+        self.assertEqual(calls[0][1], ['9876543210', '9876543210'])
+
+    def test_email(self):
+        response, calls = self._login(' someone@example.com ')
+        self.assertEqual(response.status_code, 401)
+        self.assertIn('u.email = %s', calls[0][0])
+        self.assertEqual(calls[0][1], ['someone@example.com'])
+
+
+class DecodeCursorTests(SimpleTestCase):
+    def test_round_trip(self):
+        token = encode_cursor(datetime(2026, 1, 2, 3, 4, 5), 17)
+        self.assertEqual(decode_cursor(token, 2), ['2026-01-02 03:04:05', 17])
+
+    def test_rejects_non_scalar_values(self):
+        for values in ([{'a': 1}, 1], [[1, 2], 1], [None, 1], [True, 1]):
+            token = encode_cursor(*values)
+            with self.assertRaises(InvalidPageParam):
+                decode_cursor(token, 2)
+
+    def test_rejects_wrong_shape(self):
+        with self.assertRaises(InvalidPageParam):
+            decode_cursor(encode_cursor(1), 2)
+        with self.assertRaises(InvalidPageParam):
+            decode_cursor('not base64 json!', 2)
+
+
+class SyncStuckCallsTests(SimpleTestCase):
+    """Every session the sync job looks at is stamped, resolved or not"""
+
+    def test_unresolved_sessions_are_stamped(self):
+        calls = [{'id': n, 'exotel_call_sid': f'sid{n}', 'sync_attempts': 0} for n in (1, 2)]
+        selects, updates = FakeQueries(lambda query: calls), FakeQueries(lambda query: 2)
+        with mock.patch.object(call_sync, 'execute_query', selects), \
+                mock.patch.object(call_sync, 'execute_update', updates), \
+                mock.patch.object(call_sync, 'get_call_details', return_value=None):
+            result = call_sync.sync_stuck_calls()
+
+        self.assertEqual(result['exotelErrors'], 2)
+        self.assertIn('ORDER BY last_synced_at, id', selects.calls[0][0])
+        self.assertEqual(len(updates.calls), 1)
+        self.assertIn('sync_attempts = sync_attempts + 1', updates.calls[0][0])
+        self.assertEqual(updates.calls[0][1], [1, 2])
+
+
+class StreamingJsonResponseTests(SimpleTestCase):
+    """A query failing mid-stream still leaves valid JSON behind"""
+
+    def _rows(self, count):
+        for n in range(count):
+            yield {'id': n}
+        raise RuntimeError('connection lost')
+
+    def _body(self, response):
+        return json.loads(b''.join(response.streaming_content))
+
+    def test_envelope_is_closed_and_marked(self):
+        body = self._body(streaming_json_response(self._rows(3), key='rows', extra={'success': True}))
+        self.assertEqual(body['rows'], [{'id': 0}, {'id': 1}, {'id': 2}])
+        self.assertIs(body['truncated'], True)
+        self.assertIs(body['success'], True)
+
+    def test_array_is_closed(self):
+        self.assertEqual(self._body(streaming_json_response(self._rows(2))), [{'id': 0}, {'id': 1}])
+
+    def test_complete_body_has_no_marker(self):
+        body = self._body(streaming_json_response(({'id': n} for n in range(2)), key='rows'))
+        self.assertEqual(body, {'rows': [{'id': 0}, {'id': 1}]})
+
+
+class TokenVerificationTests(SimpleTestCase):
+    """verify_token's LRU cache and the revocation checks behind it"""
+
+    def setUp(self):
+        for state in (utils._token_cache, token_revocations._revoked_tokens,
+                      token_revocations._user_not_before):
+            state.clear()
+            self.addCleanup(state.clear)
+        # No revocation list pulls from MySQL unless a test asks for one
+        patcher = mock.patch.object(token_revocations, '_next_refresh', float('inf'))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _token(self, user_id=7, **claims):
+        payload = {'userId': user_id, 'role': 'user', 'iat': int(time.time()),
+                   'exp': int(time.time()) + 3600, **claims}
+        return jwt.encode(payload, settings.JWT_SECRET, algorithm=settings.JWT_ALGORITHM)
+
+    def _revoke_user(self, user_id, not_before):
+        token_revocations._user_not_before[user_id] = (not_before, not_before + 3600)
+
+    def test_token_issued_before_not_before_is_revoked(self):
+        now = int(time.time())
+        token = self._token(iat=now - 1)
+        self._revoke_user(7, now)
+        self.assertIsNone(utils.verify_token(token))
+
+    def test_token_issued_in_the_same_second_survives(self):
+        # revoke_user_tokens() and the replacement token from the same password
+        # change share a second; the new token must stay valid
+        now = int(time.time())
+        token = self._token(iat=now)
+        self._revoke_user(7, now)
+        self.assertEqual(utils.verify_token(token)['userId'], 7)
+
+    def test_token_without_iat_counts_as_issued_at_epoch(self):
+        token = self._token()
+        payload = jwt.decode(token, settings.JWT_SECRET, algorithms=[settings.JWT_ALGORITHM])
+        del payload['iat']
+        self._revoke_user(7, 1)
+        self.assertIsNone(utils.verify_token(
+            jwt.encode(payload, settings.JWT_SECRET, algorithm=settings.JWT_ALGORITHM)))
+
+    def test_other_users_are_unaffected(self):
+        token = self._token(user_id=8, iat=int(time.time()) - 60)
+        self._revoke_user(7, int(time.time()))
+        self.assertIsNotNone(utils.verify_token(token))
+
+    def test_revoked_digest(self):
+        token = self._token()
+        self.assertIsNotNone(utils.verify_token(token))  # now cached
+        with mock.patch.object(token_revocations, 'execute_insert') as insert, \
+                mock.patch.object(token_revocations, 'execute_update'):
+            token_revocations.revoke_token(token, utils.verify_token(token))
+        insert.assert_called_once()
+        self.assertIsNone(utils.verify_token(token))
+
+    def test_cached_token_lapses_at_exp(self):
+        token = self._token(exp=int(time.time()) - 1)
+        digest = token_revocations.token_digest(token)
+        utils._token_cache[digest] = {'userId': 7, 'exp': int(time.time()) - 1}
+        self.assertIsNone(utils.verify_token(token))
+        self.assertNotIn(digest, utils._token_cache)
+
+    def test_revocations_are_forgotten_once_their_tokens_expire(self):
+        now = int(time.time())
+        token_revocations._revoked_tokens.update({'gone': now - 1, 'live': now + 60})
+        token_revocations._user_not_before.update({1: (now - 10, now), 2: (now - 10, now + 60)})
+        with mock.patch.object(token_revocations, 'execute_query', return_value=[]):
+            token_revocations._refresh()
+        self.assertEqual(set(token_revocations._revoked_tokens), {'live'})
+        self.assertEqual(set(token_revocations._user_not_before), {2})
+
+    @override_settings(JWT_CACHE_SIZE=2)
+    def test_lru_eviction(self):
+        first, second, third = (self._token(user_id=n) for n in (1, 2, 3))
+        digests = [token_revocations.token_digest(t) for t in (first, second, third)]
+        utils.verify_token(first)
+        utils.verify_token(second)
+        utils.verify_token(first)   # first is now the most recently used
+        utils.verify_token(third)   # evicts second
+        self.assertEqual(list(utils._token_cache), [digests[0], digests[2]])
+
+    def test_callers_get_a_copy(self):
+        token = self._token()
+        utils.verify_token(token)['userId'] = 99
+        self.assertEqual(utils.verify_token(token)['userId'], 7)
@@ -0,0 +1,133 @@
+"""
+JWT revocation (table `token_revocations`).
+
+Two kinds of entries:
+  * one token, by SHA-256 digest - logout
+  * every token of a user issued before `not_before` (epoch seconds) -
+    password change, ban / deactivation
+
+Each worker keeps the unexpired entries in memory and pulls new rows at most
+every JWT_REVOCATION_REFRESH seconds, so checking a token costs two dict
+lookups. A revocation made by this worker applies to it at once; other
+workers apply it on their next refresh. Rows are kept only until the tokens
+they cover would have expired anyway.
+"""
+import hashlib
+import threading
+import time
+
+from django.conf import settings
+from django.db import transaction
+
+from api.db_utils import execute_insert, execute_query, execute_update
+
+_lock = threading.Lock()
+_revoked_tokens = {}    # digest -> exp
+_user_not_before = {}   # user_id -> (not_before, expires_at)
+_last_id = 0
+_next_refresh = 0.0
+
+
+def token_digest(token):
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+def _apply(row):
+    if row['token_digest']:
+        _revoked_tokens[row['token_digest']] = row['expires_at']
+    else:
+        current = _user_not_before.get(row['user_id'])
+        if current is None or row['not_before'] > current[0]:
+            _user_not_before[row['user_id']] = (row['not_before'], row['expires_at'])
+
+
+def _refresh():
+    global _last_id, _next_refresh
+    now = time.time()
+    _next_refresh = time.monotonic() + settings.JWT_REVOCATION_REFRESH
+    try:
+        rows = execute_query("""
+            SELECT id, user_id, token_digest, not_before, expires_at
+            FROM token_revocations
+            WHERE id > %s AND expires_at > %s
+            ORDER BY id
+        """, [_last_id, int(now)])
+    except Exception as e:
+        print(f"[AUTH] Token revocation refresh failed: {e}")
+        return
+
+    for row in rows:
+        _apply(row)
+        _last_id = row['id']
+
+    # Forget entries whose tokens have expired by now
+    for digest in [d for d, exp in _revoked_tokens.items() if exp <= now]:
+        del _revoked_tokens[digest]
+    for user_id in [u for u, (_, exp) in _user_not_before.items() if exp <= now]:
+        del _user_not_before[user_id]
+
+
+def is_revoked(digest, payload):
+    """True if the verified token (its digest and decoded payload) has been revoked"""
+    if time.monotonic() >= _next_refresh:
+        with _lock:
+            if time.monotonic() >= _next_refresh:
+                _refresh()
+
+    if digest in _revoked_tokens:
+        return True
+    entry = _user_not_before.get(payload.get('userId'))
+    # Tokens from before `iat` was added count as issued at the epoch
+    return entry is not None and payload.get('iat', 0) < entry[0]
+
+
+def revoke_token(token, payload):
+    """Revoke one token (logout) until its own expiry"""
+    row = {
+        'user_id': payload.get('userId'),
+        'token_digest': token_digest(token),
+        'not_before': None,
+        'expires_at': int(payload['exp']),
+    }
+    _store(row)
+
+
+def revoke_user_tokens(user_id):
+    """Revoke every token issued to user_id up to now (password change, ban)"""
+    now = int(time.time())
+    row = {
+        'user_id': user_id,
+        'token_digest': None,
+        'not_before': now,
+        'expires_at': now + settings.JWT_EXPIRY_DAYS * 86400,
+    }
+    _store(row)
+
+
+def _store(row):
+    execute_insert("""
+        INSERT INTO token_revocations (user_id, token_digest, not_before, expires_at, created_at)
+        VALUES (%s, %s, %s, %s, NOW())
+    """, [row['user_id'], row['token_digest'], row['not_before'], row['expires_at']])
+    # Inside transaction.atomic() (password change) only a committed
+    # revocation takes effect; outside one (logout) it applies straight away
+    if transaction.get_connection().in_atomic_block:
+        transaction.on_commit(lambda: _apply_locked(row))
+        transaction.on_commit(_purge_expired)
+    else:
+        _apply_locked(row)
+        _purge_expired()
+
+
+def _apply_locked(row):
+    with _lock:
+        _apply(row)
+
+
+def _purge_expired():
+    # Revocations are rare, so this is a good moment to drop rows that no
+    # longer cover any live token. Housekeeping only: never fail the caller.
+    try:
+        execute_update("DELETE FROM token_revocations WHERE expires_at <= %s", [int(time.time())])
+    except Exception as e:
+        print(f"[AUTH] Token revocation purge failed: {e}")
@@ -10,13 +10,16 @@ from api.views import (
 )
 
 urlpatterns = [
-    # ==================== AUTHENTICATION (3 APIs) ====================
+    # ==================== AUTHENTICATION (4 APIs) ====================
     path('auth/register', auth_views.register, name='register'),
     path('auth/login', auth_views.login, name='login'),
     path('auth/verify', auth_views.verify, name='verify'),
+    path('auth/logout', auth_views.logout, name='logout'),
 
-    # ==================== ADMIN - DASHBOARD (1 API) ====================
+    # ==================== ADMIN - DASHBOARD (3 APIs) ====================
     path('admin/stats', admin_views.admin_stats, name='admin_stats'),
+    path('admin/runtime-stats', admin_views.runtime_stats, name='runtime_stats'),
+    path('admin/metrics/daily', admin_views.daily_metrics, name='admin_daily_metrics'),
 
     # ==================== ADMIN - USER MANAGEMENT (5 APIs) ====================
     path('admin/profiles', admin_views.admin_profiles, name='admin_profiles'),
@@ -1,11 +1,18 @@
 # api/utils.py
+import json
+import threading
+import time
 import jwt
 import bcrypt
+from collections import OrderedDict
 from functools import wraps
 from django.conf import settings
-from django.http import JsonResponse
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import JsonResponse, StreamingHttpResponse
 from rest_framework.response import Response
 from rest_framework import status
+from api.password_hashing import PasswordHasherBusy, run_bcrypt
+from api.token_revocations import is_revoked, token_digest
 
 def custom_exception_handler(exc, context):
     """Custom exception handler for REST framework"""
@@ -15,6 +22,64 @@ def custom_exception_handler(exc, context):
     }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
     return response
 
+_STREAM_CHUNK_SIZE = 64 * 1024
+_NO_ITEMS = object()
+
+def streaming_json_response(items, key=None, extra=None, status=200):
+    """
+    Stream a JSON list built from an iterable without holding it in memory.
+
+    With `key=None` the body is a top-level array, like JsonResponse(list, safe=False).
+    With a key it is an envelope `{**extra, key: [...]}`, like JsonResponse({... key: list}).
+    Elements are encoded with DjangoJSONEncoder, so output matches JsonResponse.
+
+    The first element is pulled before the response is built so that a failing
+    query still raises inside the calling view and becomes a normal error response.
+    A failure after that can't change the 200 that was already sent: the body is
+    closed so it stays valid JSON, and an envelope gains
+    `"truncated": true, "error": ...` so clients can tell the list is cut short.
+    A top-level array has nowhere to carry a marker and simply ends early.
+    """
+    items = iter(items)
+    try:
+        first = next(items)
+    except StopIteration:
+        first = _NO_ITEMS
+
+    def encode(value):
+        return json.dumps(value, cls=DjangoJSONEncoder)
+
+    def chunks():
+        if key is None:
+            opening, closing = '[', ']'
+        else:
+            head = encode(extra)[1:-1] + ', ' if extra else ''
+            opening, closing = '{' + head + encode(key) + ': [', ']}'
+
+        buffer = [opening]
+        size = len(opening)
+        try:
+            if first is not _NO_ITEMS:
+                piece = encode(first)
+                buffer.append(piece)
+                size += len(piece)
+                for item in items:
+                    piece = ', ' + encode(item)
+                    buffer.append(piece)
+                    size += len(piece)
+                    if size >= _STREAM_CHUNK_SIZE:
+                        yield ''.join(buffer)
+                        buffer, size = [], 0
+        except Exception as e:
+            # Headers are already sent: log, and end the body as valid JSON
+            print(f"Streaming response error: {e}")
+            if key is not None:
+                closing = '], "truncated": true, "error": "Response truncated by a server error"}'
+        buffer.append(closing)
+        yield ''.join(buffer)
+
+    return StreamingHttpResponse(chunks(), content_type='application/json', status=status)
+
 def get_token_from_request(request):
     """Extract JWT token from Authorization header"""
     auth_header = request.headers.get('Authorization', '')
@@ -22,38 +87,102 @@ def get_token_from_request(request):
         return auth_header.replace('Bearer ', '')
     return None
 
-def verify_token(token):
-    """Verify JWT token and return decoded data"""
+# Verified token payloads by token digest, least recently used first. A hit
+# skips jwt.decode (HMAC check + JSON parsing); entries lapse at the token's exp.
+_token_cache = OrderedDict()
+_token_cache_lock = threading.Lock()
+_token_cache_stats = {'hits': 0, 'misses': 0}
+
+def _decode_token(token):
     try:
-        decoded = jwt.decode(token, settings.JWT_SECRET, algorithms=[settings.JWT_ALGORITHM])
-        return decoded
+        return jwt.decode(token, settings.JWT_SECRET, algorithms=[settings.JWT_ALGORITHM])
     except jwt.ExpiredSignatureError:
         return None
     except jwt.InvalidTokenError:
         return None
 
-def hash_password(password):
-    """Hash password using bcrypt"""
-    salt = bcrypt.gensalt(rounds=12)
+def verify_token(token):
+    """Verify JWT token and return decoded data (None if invalid, expired or revoked)"""
+    digest = token_digest(token)
+    with _token_cache_lock:
+        decoded = _token_cache.get(digest)
+        if decoded is not None:
+            if decoded['exp'] > time.time():
+                _token_cache.move_to_end(digest)
+                _token_cache_stats['hits'] += 1
+            else:
+                del _token_cache[digest]
+                decoded = None
+
+    if decoded is None:
+        decoded = _decode_token(token)
+        if decoded is None:
+            return None
+        with _token_cache_lock:
+            _token_cache_stats['misses'] += 1
+            if settings.JWT_CACHE_SIZE > 0 and 'exp' in decoded:
+                _token_cache[digest] = decoded
+                while len(_token_cache) > settings.JWT_CACHE_SIZE:
+                    _token_cache.popitem(last=False)
+
+    if is_revoked(digest, decoded):
+        return None
+    # Callers get their own copy; the cached payload must not change
+    return dict(decoded)
+
+def token_cache_stats():
+    """Size and hit counts of this process's verified-token cache"""
+    with _token_cache_lock:
+        return {'size': len(_token_cache), **_token_cache_stats}
+
+def _hash_password(password, rounds=None):
+    salt = bcrypt.gensalt(rounds=rounds or settings.BCRYPT_ROUNDS)
     hashed = bcrypt.hashpw(password.encode('utf-8'), salt)
     return hashed.decode('utf-8')
 
-def verify_password(password, hashed):
-    """Verify password against hash"""
+def _check_password(password, hashed):
     try:
         return bcrypt.checkpw(password.encode('utf-8'), hashed.encode('utf-8'))
     except Exception:
         return False
 
+def hash_password(password):
+    """Hash password using bcrypt (bounded; raises PasswordHasherBusy when saturated)"""
+    return run_bcrypt(_hash_password, password)
+
+def verify_password(password, hashed):
+    """Verify password against hash (bounded; raises PasswordHasherBusy when saturated)"""
+    if not hashed:
+        return False
+    return run_bcrypt(_check_password, password, hashed)
+
+def password_needs_rehash(hashed):
+    """True if a stored bcrypt hash was made with a cost other than BCRYPT_ROUNDS"""
+    # Stored as $2b$<cost>$<salt+hash>
+    parts = (hashed or '').split('$')
+    if len(parts) != 4 or not parts[2].isdigit():
+        return False
+    return int(parts[2]) != settings.BCRYPT_ROUNDS
+
+def password_busy_response():
+    """503 for a request turned away by the bcrypt limiter (api/password_hashing.py)"""
+    response = JsonResponse({
+        'error': 'Too many sign-in requests right now. Please try again in a moment.',
+        'code': 'AUTH_BUSY'
+    }, status=503)
+    response['Retry-After'] = '2'
+    return response
+
 def create_jwt_token(user_data):
     """Create JWT token"""
-    import datetime
+    now = int(time.time())
     payload = {
         'userId': user_data['id'],
         'email': user_data.get('email'),
         'role': user_data.get('role', 'user'),
         'type': user_data.get('role', 'user'),
-        'exp': datetime.datetime.utcnow() + datetime.timedelta(days=7)
+        'iat': now,  # lets revoke_user_tokens() cut off tokens issued before a given time
+        'exp': now + settings.JWT_EXPIRY_DAYS * 86400
     }
     token = jwt.encode(payload, settings.JWT_SECRET, algorithm=settings.JWT_ALGORITHM)
     return token
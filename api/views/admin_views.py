@@ -2,257 +2,285 @@ import json
 import random
 import string
 from datetime import datetime, timedelta
+from django.conf import settings
+from django.core.cache import cache
 from django.db import IntegrityError, transaction
 from django.http import JsonResponse
 from django.views.decorators.http import require_http_methods
 from django.views.decorators.csrf import csrf_exempt
-from api.utils import require_admin, hash_password, verify_password
-from api.db_utils import execute_query, execute_insert, execute_update
-from api.exotel_client import get_account_balance
+from api.utils import (
+    require_admin, hash_password, verify_password, streaming_json_response, create_jwt_token, token_cache_stats,
+    password_busy_response,
+)
+from api.password_hashing import PasswordHasherBusy, hasher_stats
+from api.db_utils import execute_query, execute_insert, execute_update, iter_query
+from api.call_sync import CALL_SYNC_LEASE, sync_metrics
+from api.conditional import conditional_get, stamp
+from api.db_pool import pool_stats
+from api.entitlements import invalidate_entitlements
+from api.match_counts import adjust_match_counts
+from api.profile_completeness import IS_COMPLETE_SQL, refresh_profile_complete
+from api.metrics import (
+    METRIC_COLUMNS, MONTH_START_SQL, bump_daily_metrics, get_daily_metrics, record_payment_status_change,
+)
+from api.jobs import job_stats
+from api.scheduler import lease_status
+from api.token_revocations import revoke_user_tokens
+from api.webhook_queue import queue_depth
+from api.plan_catalogue import invalidate_plan_catalogue
+from api.pagination import InvalidPageParam, decode_cursor, encode_cursor, parse_bool, parse_limit
+from api.exotel_client import get_account_balance, client_stats as exotel_client_stats
 
 # ==================== STATS API ====================
+# Every dashboard figure in one round trip. users and user_profiles are read
+# once each with conditional counts (CAST keeps those as integers like
+# COUNT(*)); month-to-date call and revenue totals come from daily_metrics.
+_ADMIN_STATS_SQL = f"""
+    SELECT
+        u.totalUsers,
+        u.activeUsers,
+        up.maleUsers,
+        up.femaleUsers,
+        up.pendingProfiles,
+        up.approvedProfiles,
+        (SELECT COUNT(*) FROM matches) as totalMatches,
+        (SELECT COUNT(*) FROM call_sessions
+         WHERE status IN ('initiated', 'ringing', 'in_progress')) as activeCallSessions,
+        month.callMinutesUsed,
+        month.totalRevenue,
+        (SELECT COUNT(*) FROM user_subscriptions us
+         JOIN plans p ON us.plan_id = p.id
+         WHERE us.status = 'active' AND p.type = 'normal' AND us.expires_at > NOW()) as normalSubscriptions,
+        (SELECT COUNT(*) FROM user_call_credits uc
+         JOIN plans p ON uc.plan_id = p.id
+         WHERE uc.credits_remaining > 0 AND p.type = 'call' AND uc.expires_at > NOW()) as callSubscriptions
+    FROM (
+        SELECT COUNT(*) as totalUsers,
+               CAST(COALESCE(SUM(status = 'active'), 0) AS SIGNED) as activeUsers
+        FROM users
+        WHERE role = 'user'
+    ) u
+    CROSS JOIN (
+        SELECT CAST(COALESCE(SUM(gender = 'Male' AND status = 'approved'), 0) AS SIGNED) as maleUsers,
+               CAST(COALESCE(SUM(gender = 'Female' AND status = 'approved'), 0) AS SIGNED) as femaleUsers,
+               CAST(COALESCE(SUM(status = 'pending'), 0) AS SIGNED) as pendingProfiles,
+               CAST(COALESCE(SUM(status = 'approved'), 0) AS SIGNED) as approvedProfiles
+        FROM user_profiles
+    ) up
+    CROSS JOIN (
+        SELECT COALESCE(SUM(call_seconds), 0) as callMinutesUsed,
+               COALESCE(SUM(verified_revenue), 0) as totalRevenue
+        FROM daily_metrics
+        WHERE day >= {MONTH_START_SQL}
+    ) month
+"""
+
+ADMIN_STATS_CACHE_KEY = 'admin:stats'
+
+
 @csrf_exempt
 @require_http_methods(["GET"])
 @require_admin
 def admin_stats(request):
     """
     Admin Dashboard Stats API
-    GET /api/admin/stats
+    GET /api/admin/stats[?fresh=1]
     Returns: User counts, match stats, revenue, etc.
+
+    Served from a snapshot cached for ADMIN_STATS_CACHE_TTL seconds; `fresh=1`
+    recomputes it.
     """
     try:
-        stats_queries = {
-            'totalUsers': "SELECT COUNT(*) as count FROM users WHERE role = 'user'",
-            'activeUsers': "SELECT COUNT(*) as count FROM users WHERE role = 'user' AND status = 'active'",
-            'maleUsers': "SELECT COUNT(*) as count FROM user_profiles WHERE gender = 'Male' AND status = 'approved'",
-            'femaleUsers': "SELECT COUNT(*) as count FROM user_profiles WHERE gender = 'Female' AND status = 'approved'",
-            'pendingProfiles': "SELECT COUNT(*) as count FROM user_profiles WHERE status = 'pending'",
-            'approvedProfiles': "SELECT COUNT(*) as count FROM user_profiles WHERE status = 'approved'",
-            'totalMatches': "SELECT COUNT(*) as count FROM matches",
-            'activeCallSessions': "SELECT COUNT(*) as count FROM call_sessions WHERE status IN ('initiated', 'ringing', 'in_progress')",
-            'callMinutesUsed': """SELECT COALESCE(SUM(duration), 0) as count
-                                 FROM call_sessions
-                                 WHERE status = 'completed'
-                                 AND MONTH(created_at) = MONTH(NOW())
-                                 AND YEAR(created_at) = YEAR(NOW())""",
-            'totalRevenue': """SELECT COALESCE(SUM(amount), 0) as count
-                              FROM payments
-                              WHERE status = 'verified'
-                              AND MONTH(created_at) = MONTH(NOW())
-                              AND YEAR(created_at) = YEAR(NOW())""",
-            'normalSubscriptions': """SELECT COUNT(*) as count
-                                     FROM user_subscriptions us
-                                     JOIN plans p ON us.plan_id = p.id
-                                     WHERE us.status = 'active'
-                                     AND p.type = 'normal'
-                                     AND us.expires_at > NOW()""",
-            'callSubscriptions': """SELECT COUNT(*) as count
-                                   FROM user_call_credits uc
-                                   JOIN plans p ON uc.plan_id = p.id
-                                   WHERE uc.credits_remaining > 0
-                                   AND p.type = 'call'
-                                   AND uc.expires_at > NOW()"""
-        }
+        ttl = settings.ADMIN_STATS_CACHE_TTL
+        stats = None
+        if ttl > 0 and not parse_bool(request.GET.get('fresh')):
+            stats = cache.get(ADMIN_STATS_CACHE_KEY)
 
-        stats = {}
-        for key, query in stats_queries.items():
-            result = execute_query(query)
-            stats[key] = result[0]['count'] if result else 0
+        if stats is None:
+            result = execute_query(_ADMIN_STATS_SQL)
+            stats = result[0] if result else {}
+            if ttl > 0:
+                cache.set(ADMIN_STATS_CACHE_KEY, stats, ttl)
 
         return JsonResponse(stats)
 
+    except InvalidPageParam as e:
+        return JsonResponse({'error': str(e)}, status=400)
     except Exception as e:
         print(f"Stats error: {e}")
         return JsonResponse({'error': 'Failed to fetch stats'}, status=500)
 
 
-# ==================== PROFILES API ====================
 @csrf_exempt
 @require_http_methods(["GET"])
 @require_admin
-def admin_profiles(request):
+def runtime_stats(request):
     """
-    Admin Get All Profiles API
-    GET /api/admin/profiles
-    Returns: All user profiles with status
+    Admin Runtime Stats API
+    GET /api/admin/runtime-stats
+    Returns: In-process counters (DB pool, ...) of the worker that served the request
     """
     try:
-        query = """
-            SELECT
-                u.id as user_id, u.name, u.email, u.phone, u.recovery_password,
-                u.password_change_count,
-                u.status as user_status, u.created_at as user_created_at,
-                up.id as profile_id, up.age, up.gender, up.height, up.weight,
-                up.caste, up.religion, up.mother_tongue, up.marital_status,
-                up.education, up.occupation, up.income, up.state, up.city,
-                up.family_type, up.family_status, up.about_me, up.partner_preferences,
-                up.profile_photo, up.status as profile_status, up.rejection_reason,
-                up.created_at as profile_created_at, up.updated_at as profile_updated_at,
-                CASE WHEN ns.id IS NOT NULL THEN 1 ELSE 0 END as has_normal_plan,
-                CASE WHEN cc.id IS NOT NULL THEN 1 ELSE 0 END as has_call_plan,
-                COALESCE(cc.credits_remaining, 0) as call_credits_remaining,
-                (SELECT COUNT(*) FROM matches WHERE user_id = u.id OR matched_user_id = u.id) as total_matches,
-                CASE WHEN up.id IS NULL THEN 'incomplete_registration' ELSE up.status END as computed_status
-            FROM users u
-            -- Each join below is collapsed to at most one row per user. Joining the
-            -- raw tables fans out (a user with 2 active credit packs / subscriptions
-            -- would be listed twice).
-            LEFT JOIN (
-                SELECT p.*
-                FROM user_profiles p
-                JOIN (
-                    SELECT user_id, MAX(id) AS id
-                    FROM user_profiles
-                    GROUP BY user_id
-                ) latest_profile ON latest_profile.id = p.id
-            ) up ON up.user_id = u.id
-            LEFT JOIN (
-                SELECT user_id, MAX(id) AS id
-                FROM user_subscriptions
-                WHERE status = 'active' AND expires_at > NOW()
-                GROUP BY user_id
-            ) ns ON ns.user_id = u.id
-            LEFT JOIN (
-                SELECT user_id, MAX(id) AS id, SUM(credits_remaining) AS credits_remaining
-                FROM user_call_credits
-                WHERE credits_remaining > 0 AND expires_at > NOW()
-                GROUP BY user_id
-            ) cc ON cc.user_id = u.id
-            WHERE u.role = 'user'
-            ORDER BY
-                CASE WHEN up.id IS NULL THEN 0 ELSE 1 END,
-                u.created_at DESC
-        """
-
-        profiles = execute_query(query)
-
-        # Format response
-        formatted_profiles = []
-        for row in profiles:
-            formatted_profiles.append({
-                'id': row['profile_id'] or f"incomplete_{row['user_id']}",
-                'user_id': row['user_id'],
-                'name': row['name'],
-                'email': row['email'],
-                'phone': row['phone'],
-                'recovery_password': row['recovery_password'],
-                'password_change_count': row['password_change_count'] or 0,
-                'user_created_at': str(row['user_created_at']),
-                'age': row['age'],
-                'gender': row['gender'],
-                'height': row['height'],
-                'weight': row['weight'],
-                'caste': row['caste'],
-                'religion': row['religion'],
-                'mother_tongue': row['mother_tongue'],
-                'marital_status': row['marital_status'],
-                'education': row['education'],
-                'occupation': row['occupation'],
-                'income': row['income'],
-                'state': row['state'],
-                'city': row['city'],
-                'family_type': row['family_type'],
-                'family_status': row['family_status'],
-                'about_me': row['about_me'],
-                'partner_preferences': row['partner_preferences'],
-                'profile_photo': row['profile_photo'],
-                'status': row['computed_status'],
-                'rejection_reason': row['rejection_reason'],
-                'created_at': str(row['profile_created_at'] or row['user_created_at']),
-                'updated_at': str(row['profile_updated_at']) if row['profile_updated_at'] else None,
-                'user_status': row['user_status'],
-                'has_normal_plan': row['has_normal_plan'] == 1,
-                'has_call_plan': row['has_call_plan'] == 1,
-                'call_credits_remaining': row['call_credits_remaining'],
-                'total_matches': row['total_matches'],
-                'is_incomplete_registration': row['profile_id'] is None
-            })
+        stats = {
+            'dbPool': pool_stats(),
+            'exotel': exotel_client_stats(),
+            'jwtCache': token_cache_stats(),
+            'passwordHasher': hasher_stats(),
+            'callSync': dict(sync_metrics(), lease=lease_status(CALL_SYNC_LEASE)),
+        }
+        if settings.CALL_WEBHOOK_MODE == 'queue':
+            stats['webhookQueue'] = queue_depth()
+        stats['jobs'] = job_stats()
 
-        return JsonResponse(formatted_profiles, safe=False)
+        return JsonResponse(stats)
 
     except Exception as e:
-        print(f"Profiles error: {e}")
-        return JsonResponse({'error': 'Failed to fetch profiles'}, status=500)
-
-
-@csrf_exempt
-@require_http_methods(["POST"])
-@require_admin
-def approve_profile(request):
-    """
-    Admin Approve/Reject Profile API
-    POST /api/admin/approve-profile
-    Body: { profileId, status, rejectionReason? }
-    """
-    try:
-        data = json.loads(request.body)
-        profile_id = data.get('profileId')
-        status = data.get('status')
-        rejection_reason = data.get('rejectionReason')
-
-        if not all([profile_id, status]):
-            return JsonResponse({
-                'error': 'Profile ID and status are required'
-            }, status=400)
-
-        if status not in ['approved', 'rejected']:
-            return JsonResponse({'error': 'Invalid status'}, status=400)
-
-        if status == 'rejected' and not rejection_reason:
-            return JsonResponse({
-                'error': 'Rejection reason is required'
-            }, status=400)
+        print(f"Runtime stats error: {e}")
+        return JsonResponse({'error': 'Failed to fetch runtime stats'}, status=500)
 
-        execute_update(
-            """UPDATE user_profiles
-               SET status = %s, rejection_reason = %s, updated_at = NOW()
-               WHERE id = %s""",
-            [status, rejection_reason if status == 'rejected' else None, profile_id]
-        )
 
-        return JsonResponse({'success': True})
-
-    except Exception as e:
-        print(f"Profile approval error: {e}")
-        return JsonResponse({'error': 'Internal server error'}, status=500)
+_DECIMAL_METRICS = ('verified_revenue', 'exotel_spend')
+_MAX_METRIC_DAYS = 366
 
 
 @csrf_exempt
-@require_http_methods(["POST"])
+@require_http_methods(["GET"])
 @require_admin
-def update_user_status(request):
+def daily_metrics(request):
     """
-    Admin Update User Status API
-    POST /api/admin/update-status
-    Body: { userId, status }
+    Admin Daily Metrics API (trend charts)
+    GET /api/admin/metrics/daily?from=YYYY-MM-DD&to=YYYY-MM-DD
+    Returns: One entry per day in the range (default: last 30 days), plus totals
     """
     try:
-        data = json.loads(request.body)
-        user_id = data.get('userId')
-        status = data.get('status')
-
-        if not all([user_id, status]):
-            return JsonResponse({
-                'error': 'User ID and status are required'
-            }, status=400)
-
-        if status not in ['active', 'inactive', 'banned']:
-            return JsonResponse({'error': 'Invalid status'}, status=400)
-
-        execute_update(
-            "UPDATE users SET status = %s WHERE id = %s AND role = 'user'",
-            [status, user_id]
-        )
+        try:
+            end_day = (datetime.strptime(request.GET['to'], '%Y-%m-%d').date()
+                       if request.GET.get('to') else datetime.now().date())
+            start_day = (datetime.strptime(request.GET['from'], '%Y-%m-%d').date()
+                         if request.GET.get('from') else end_day - timedelta(days=29))
+        except ValueError:
+            return JsonResponse({'error': 'from and to must be dates in YYYY-MM-DD format'}, status=400)
+
+        if start_day > end_day:
+            return JsonResponse({'error': 'from must not be after to'}, status=400)
+        if (end_day - start_day).days + 1 > _MAX_METRIC_DAYS:
+            return JsonResponse({'error': f'Range is limited to {_MAX_METRIC_DAYS} days'}, status=400)
+
+        rows = {row['day']: row for row in get_daily_metrics(start_day, end_day)}
+
+        days = []
+        totals = {column: 0 for column in METRIC_COLUMNS}
+        day = start_day
+        while day <= end_day:
+            row = rows.get(day, {})
+            entry = {'day': day.isoformat()}
+            for column in METRIC_COLUMNS:
+                value = row.get(column) or 0
+                entry[column] = float(value) if column in _DECIMAL_METRICS else int(value)
+                totals[column] += entry[column]
+            days.append(entry)
+            day += timedelta(days=1)
 
-        return JsonResponse({'success': True})
+        return JsonResponse({
+            'from': start_day.isoformat(),
+            'to': end_day.isoformat(),
+            'days': days,
+            'totals': {
+                column: round(value, 2) if column in _DECIMAL_METRICS else value
+                for column, value in totals.items()
+            },
+        })
 
     except Exception as e:
-        print(f"Update status error: {e}")
-        return JsonResponse({'error': 'Internal server error'}, status=500)
-
+        print(f"Daily metrics error: {e}")
+        return JsonResponse({'error': 'Failed to fetch daily metrics'}, status=500)
 
 
 # ==================== PROFILES API ====================
+def _format_admin_profile(row):
+    """Shape one admin_profiles row for the response"""
+    return {
+        'id': row['profile_id'] or f"incomplete_{row['user_id']}",
+        'user_id': row['user_id'],
+        'name': row['name'],
+        'email': row['email'],
+        'phone': row['phone'],
+        'recovery_password': row['recovery_password'],
+        'password_change_count': row['password_change_count'] or 0,
+        'user_created_at': str(row['user_created_at']),
+        'age': row['age'],
+        'gender': row['gender'],
+        'height': row['height'],
+        'weight': row['weight'],
+        'caste': row['caste'],
+        'religion': row['religion'],
+        'mother_tongue': row['mother_tongue'],
+        'marital_status': row['marital_status'],
+        'education': row['education'],
+        'occupation': row['occupation'],
+        'income': row['income'],
+        'state': row['state'],
+        'city': row['city'],
+        'family_type': row['family_type'],
+        'family_status': row['family_status'],
+        'about_me': row['about_me'],
+        'partner_preferences': row['partner_preferences'],
+        'profile_photo': row['profile_photo'],
+        'status': row['computed_status'],
+        'rejection_reason': row['rejection_reason'],
+        'created_at': str(row['profile_created_at'] or row['user_created_at']),
+        'updated_at': str(row['profile_updated_at']) if row['profile_updated_at'] else None,
+        'user_status': row['user_status'],
+        'has_normal_plan': row['has_normal_plan'] == 1,
+        'has_call_plan': row['has_call_plan'] == 1,
+        'call_credits_remaining': row['call_credits_remaining'],
+        'total_matches': row['total_matches'],
+        'is_incomplete_registration': row['profile_id'] is None
+    }
+
+
+# A user can in theory have several profile rows; admin views use the newest.
+_LATEST_PROFILE_JOIN_SQL = """
+            LEFT JOIN user_profiles up
+                ON up.id = (SELECT MAX(p.id) FROM user_profiles p WHERE p.user_id = u.id)
+"""
+
+_ACTIVE_CALL_CREDITS_SQL = """
+                    SELECT 1 FROM user_call_credits cc
+                    WHERE cc.user_id = u.id AND cc.credits_remaining > 0 AND cc.expires_at > NOW()
+"""
+
+# Simple equality filters of GET /api/admin/profiles -> profile column
+_PROFILE_FILTER_COLUMNS = {
+    'gender': 'up.gender',
+    'state': 'up.state',
+    'religion': 'up.religion',
+}
+
+
+def _admin_profile_filters(query_params):
+    """WHERE clauses and params for the optional admin_profiles filters"""
+    where, params = ["u.role = 'user'"], []
+
+    status = query_params.get('status')
+    if status == 'incomplete_registration':
+        where.append("up.id IS NULL")
+    elif status:
+        where.append("up.status = %s")
+        params.append(status)
+
+    for name, column in _PROFILE_FILTER_COLUMNS.items():
+        if query_params.get(name):
+            where.append(f"{column} = %s")
+            params.append(query_params[name])
+
+    has_call_plan = parse_bool(query_params.get('has_call_plan'))
+    if has_call_plan is not None:
+        where.append(f"{'' if has_call_plan else 'NOT '}EXISTS ({_ACTIVE_CALL_CREDITS_SQL})")
+
+    return where, params
+
+
 @csrf_exempt
 @require_http_methods(["GET"])
 @require_admin
@@ -260,10 +288,32 @@ def admin_profiles(request):
     """
     Admin Get All Profiles API
     GET /api/admin/profiles
-    Returns: All user profiles with status
+    Query (all optional):
+        status=pending|approved|rejected|incomplete_registration, gender, state,
+        religion, has_call_plan=true|false   - filters
+        limit, cursor                        - keyset pagination on (created_at, id)
+        includeTotal=1                       - also count all matching users
+    Returns: A plain list of all profiles, or a page envelope
+             { profiles, nextCursor, hasMore[, total] } when limit/cursor is given
+    The plain list is streamed: a database error mid-stream ends it early (still
+    valid JSON, status already 200, no marker possible). Page through with
+    limit/cursor when the list has to be complete.
     """
     try:
-        query = """
+        paginate = 'limit' in request.GET or 'cursor' in request.GET
+        limit = parse_limit(request.GET.get('limit'))
+        where, params = _admin_profile_filters(request.GET)
+        filter_where, filter_params = list(where), list(params)
+
+        if request.GET.get('cursor'):
+            cursor_created_at, cursor_id = decode_cursor(request.GET['cursor'], 2)
+            where.append("(u.created_at < %s OR (u.created_at = %s AND u.id < %s))")
+            params += [cursor_created_at, cursor_created_at, cursor_id]
+
+        # Everything per user is looked up through correlated, index-backed
+        # subqueries rather than joined aggregates over whole tables, so a page
+        # only touches the rows it returns (fan-out is still one row per user).
+        query = f"""
             SELECT
                 u.id as user_id, u.name, u.email, u.phone, u.recovery_password,
                 u.password_change_count,
@@ -274,88 +324,59 @@ def admin_profiles(request):
                 up.family_type, up.family_status, up.about_me, up.partner_preferences,
                 up.profile_photo, up.status as profile_status, up.rejection_reason,
                 up.created_at as profile_created_at, up.updated_at as profile_updated_at,
-                CASE WHEN ns.id IS NOT NULL THEN 1 ELSE 0 END as has_normal_plan,
-                CASE WHEN cc.id IS NOT NULL THEN 1 ELSE 0 END as has_call_plan,
-                COALESCE(cc.credits_remaining, 0) as call_credits_remaining,
-                (SELECT COUNT(*) FROM matches WHERE user_id = u.id OR matched_user_id = u.id) as total_matches,
+                EXISTS (
+                    SELECT 1 FROM user_subscriptions ns
+                    WHERE ns.user_id = u.id AND ns.status = 'active' AND ns.expires_at > NOW()
+                ) as has_normal_plan,
+                EXISTS ({_ACTIVE_CALL_CREDITS_SQL}) as has_call_plan,
+                COALESCE((
+                    SELECT SUM(cc.credits_remaining) FROM user_call_credits cc
+                    WHERE cc.user_id = u.id AND cc.credits_remaining > 0 AND cc.expires_at > NOW()
+                ), 0) as call_credits_remaining,
+                u.match_count as total_matches,
                 CASE WHEN up.id IS NULL THEN 'incomplete_registration' ELSE up.status END as computed_status
             FROM users u
-            -- Each join below is collapsed to at most one row per user. Joining the
-            -- raw tables fans out (a user with 2 active credit packs / subscriptions
-            -- would be listed twice).
-            LEFT JOIN (
-                SELECT p.*
-                FROM user_profiles p
-                JOIN (
-                    SELECT user_id, MAX(id) AS id
-                    FROM user_profiles
-                    GROUP BY user_id
-                ) latest_profile ON latest_profile.id = p.id
-            ) up ON up.user_id = u.id
-            LEFT JOIN (
-                SELECT user_id, MAX(id) AS id
-                FROM user_subscriptions
-                WHERE status = 'active' AND expires_at > NOW()
-                GROUP BY user_id
-            ) ns ON ns.user_id = u.id
-            LEFT JOIN (
-                SELECT user_id, MAX(id) AS id, SUM(credits_remaining) AS credits_remaining
-                FROM user_call_credits
-                WHERE credits_remaining > 0 AND expires_at > NOW()
-                GROUP BY user_id
-            ) cc ON cc.user_id = u.id
-            WHERE u.role = 'user'
+            {_LATEST_PROFILE_JOIN_SQL}
+            WHERE {' AND '.join(where)}
+        """
+
+        if not paginate:
+            query += """
             ORDER BY
                 CASE WHEN up.id IS NULL THEN 0 ELSE 1 END,
                 u.created_at DESC
-        """
+            """
+            # Rows come off a server-side cursor and are written to the response as
+            # they arrive, so neither the result set nor the body is built in memory.
+            return streaming_json_response(
+                _format_admin_profile(row) for row in iter_query(query, params)
+            )
 
-        profiles = execute_query(query)
-
-        # Format response
-        formatted_profiles = []
-        for row in profiles:
-            formatted_profiles.append({
-                'id': row['profile_id'] or f"incomplete_{row['user_id']}",
-                'user_id': row['user_id'],
-                'name': row['name'],
-                'email': row['email'],
-                'phone': row['phone'],
-                'recovery_password': row['recovery_password'],
-                'password_change_count': row['password_change_count'] or 0,
-                'user_created_at': str(row['user_created_at']),
-                'age': row['age'],
-                'gender': row['gender'],
-                'height': row['height'],
-                'weight': row['weight'],
-                'caste': row['caste'],
-                'religion': row['religion'],
-                'mother_tongue': row['mother_tongue'],
-                'marital_status': row['marital_status'],
-                'education': row['education'],
-                'occupation': row['occupation'],
-                'income': row['income'],
-                'state': row['state'],
-                'city': row['city'],
-                'family_type': row['family_type'],
-                'family_status': row['family_status'],
-                'about_me': row['about_me'],
-                'partner_preferences': row['partner_preferences'],
-                'profile_photo': row['profile_photo'],
-                'status': row['computed_status'],
-                'rejection_reason': row['rejection_reason'],
-                'created_at': str(row['profile_created_at'] or row['user_created_at']),
-                'updated_at': str(row['profile_updated_at']) if row['profile_updated_at'] else None,
-                'user_status': row['user_status'],
-                'has_normal_plan': row['has_normal_plan'] == 1,
-                'has_call_plan': row['has_call_plan'] == 1,
-                'call_credits_remaining': row['call_credits_remaining'],
-                'total_matches': row['total_matches'],
-                'is_incomplete_registration': row['profile_id'] is None
-            })
+        # One extra row tells us whether there is a next page.
+        query += " ORDER BY u.created_at DESC, u.id DESC LIMIT %s"
+        rows = execute_query(query, params + [limit + 1])
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+
+        response = {
+            'profiles': [_format_admin_profile(row) for row in rows],
+            'nextCursor': encode_cursor(rows[-1]['user_created_at'], rows[-1]['user_id']) if has_more else None,
+            'hasMore': has_more,
+        }
+
+        if parse_bool(request.GET.get('includeTotal')):
+            total = execute_query(f"""
+                SELECT COUNT(*) as total
+                FROM users u
+                {_LATEST_PROFILE_JOIN_SQL}
+                WHERE {' AND '.join(filter_where)}
+            """, filter_params)
+            response['total'] = total[0]['total'] if total else 0
 
-        return JsonResponse(formatted_profiles, safe=False)
+        return JsonResponse(response)
 
+    except InvalidPageParam as e:
+        return JsonResponse({'error': str(e)}, status=400)
     except Exception as e:
         print(f"Profiles error: {e}")
         return JsonResponse({'error': 'Failed to fetch profiles'}, status=500)
@@ -390,8 +411,9 @@ def approve_profile(request):
             }, status=400)
 
         execute_update(
-            """UPDATE user_profiles
-               SET status = %s, rejection_reason = %s, updated_at = NOW()
+            f"""UPDATE user_profiles
+               SET status = %s, rejection_reason = %s, updated_at = NOW(),
+                   is_complete = {IS_COMPLETE_SQL}
                WHERE id = %s""",
             [status, rejection_reason if status == 'rejected' else None, profile_id]
         )
@@ -425,10 +447,15 @@ def update_user_status(request):
         if status not in ['active', 'inactive', 'banned']:
             return JsonResponse({'error': 'Invalid status'}, status=400)
 
-        execute_update(
-            "UPDATE users SET status = %s WHERE id = %s AND role = 'user'",
-            [status, user_id]
-        )
+        # Banned / deactivated users lose their sessions straight away, in the
+        # same transaction as the status change
+        with transaction.atomic():
+            updated = execute_update(
+                "UPDATE users SET status = %s WHERE id = %s AND role = 'user'",
+                [status, user_id]
+            )
+            if updated and status != 'active':
+                revoke_user_tokens(user_id)
 
         return JsonResponse({'success': True})
 
@@ -525,6 +552,7 @@ def admin_create_plan(request):
              description.strip() if description else None,
              plan_type, can_view_details, can_make_calls, is_active]
         )
+        invalidate_plan_catalogue()
 
         return JsonResponse({
             'success': True,
@@ -620,6 +648,7 @@ def admin_plan_detail(request, plan_id):
                 is_active if is_active is not None else True,
                 plan_id
             ])
+        invalidate_plan_catalogue()
 
         return JsonResponse({
             'success': True,
@@ -657,6 +686,7 @@ def admin_plan_delete(request, plan_id):
             }, status=400)
 
         execute_update("DELETE FROM plans WHERE id = %s", [plan_id])
+        invalidate_plan_catalogue()
 
         return JsonResponse({
             'success': True,
@@ -693,10 +723,12 @@ def admin_payments(request):
     """
     GET: List Pending Payments
     POST: Verify/Reject Payment (Legacy)
+    GET is streamed: a database error mid-stream cuts the list short and adds
+    `"truncated": true` to the envelope (the status is already 200).
     """
     if request.method == "GET":
         try:
-            payments = execute_query("""
+            payments = iter_query("""
                 SELECT p.id, p.user_id, u.name AS user_name,
                        p.plan_id, pl.name AS plan_name, pl.type AS plan_type,
                        p.amount, p.payment_method, p.transaction_id,
@@ -708,7 +740,7 @@ def admin_payments(request):
                 ORDER BY p.created_at DESC
             """)
 
-            return JsonResponse({'payments': payments})
+            return streaming_json_response(payments, key='payments')
 
         except Exception as e:
             print(f"Payments fetch error: {e}")
@@ -731,7 +763,7 @@ def admin_payments(request):
                 return JsonResponse({'error': 'Invalid status'}, status=400)
 
             # Update payment
-            execute_update("""
+            updated = execute_update("""
                 UPDATE payments
                 SET status = %s, admin_notes = %s, verified_by = %s, verified_at = NOW()
                 WHERE id = %s AND status = 'pending'
@@ -742,7 +774,8 @@ def admin_payments(request):
 
             # Get payment details
             payment = execute_query("""
-                SELECT p.user_id, p.plan_id, pl.type, pl.duration_months, pl.call_credits
+                SELECT p.user_id, p.plan_id, p.amount, p.created_at,
+                       pl.type, pl.duration_months, pl.call_credits
                 FROM payments p
                 JOIN plans pl ON p.plan_id = pl.id
                 WHERE p.id = %s
@@ -752,6 +785,8 @@ def admin_payments(request):
                 return JsonResponse({'error': 'Payment not found'}, status=404)
 
             p = payment[0]
+            if updated:
+                record_payment_status_change(p, 'pending', status)
             expires_at = datetime.now() + timedelta(days=30 * (p['duration_months'] or 1))
 
             if p['type'] == 'normal':
@@ -768,6 +803,7 @@ def admin_payments(request):
                     VALUES (%s, %s, %s, %s, %s, NOW(), NOW())
                 """, [p['user_id'], p['plan_id'], p['call_credits'], p['call_credits'], expires_at])
 
+            invalidate_entitlements(p['user_id'])
             return JsonResponse({'success': True})
 
         except Exception as e:
@@ -811,6 +847,7 @@ def admin_payment_detail(request, payment_id):
             SET status = %s, admin_notes = %s, verified_by = %s, verified_at = NOW()
             WHERE id = %s
         """, [status, admin_notes, request.user_data['userId'], payment_id])
+        record_payment_status_change(p, p['status'], status)
 
         if status == 'rejected':
             return JsonResponse({
@@ -872,6 +909,7 @@ def admin_payment_detail(request, payment_id):
                     VALUES (%s, %s, %s, %s, %s, NOW())
                 """, [p['user_id'], pl['id'], pl['call_credits'], pl['call_credits'], expires_at])
 
+        invalidate_entitlements(p['user_id'])
         return JsonResponse({
             'success': True,
             'message': f"Payment verified and {'subscription' if pl['type'] == 'normal' else 'credits'} activated successfully"
@@ -940,11 +978,14 @@ def create_profile(request):
                     data.get('family_type'), data.get('family_status'), data.get('about_me'),
                     data.get('partner_preferences'), data.get('profile_photo')
                 ])
+                refresh_profile_complete(user_id)
         except IntegrityError:
             # Unique index on users.email / users.phone rejected a concurrent duplicate
             # submit that slipped past the SELECT checks above.
             return JsonResponse({'error': 'Email or phone number already exists'}, status=409)
 
+        bump_daily_metrics(signups=1)
+
         return JsonResponse({
             'success': True,
             'userId': user_id,
@@ -953,6 +994,8 @@ def create_profile(request):
             'message': 'Profile created successfully. User can login with the default password. Recovery password for admin use.'
         })
 
+    except PasswordHasherBusy:
+        return password_busy_response()
     except Exception as e:
         print(f"Admin profile creation error: {e}")
         return JsonResponse({'error': 'Internal server error'}, status=500)
@@ -996,16 +1039,29 @@ def admin_change_password(request):
 
         # Update password
         hashed_new_password = hash_password(new_password)
-        execute_update(
-            "UPDATE users SET password = %s, updated_at = NOW() WHERE id = %s",
-            [hashed_new_password, request.user_data['userId']]
-        )
+        # Password and session sign-out commit together
+        with transaction.atomic():
+            execute_update(
+                "UPDATE users SET password = %s, updated_at = NOW() WHERE id = %s",
+                [hashed_new_password, request.user_data['userId']]
+            )
+            revoke_user_tokens(request.user_data['userId'])
+
+        # Hand this session a fresh token
+        token = create_jwt_token({
+            'id': request.user_data['userId'],
+            'email': request.user_data.get('email'),
+            'role': 'admin'
+        })
 
         return JsonResponse({
             'success': True,
-            'message': 'Password changed successfully'
+            'message': 'Password changed successfully',
+            'token': token
         })
 
+    except PasswordHasherBusy:
+        return password_busy_response()
     except Exception as e:
         print(f"Password change error: {e}")
         return JsonResponse({'error': 'Internal server error'}, status=500)
@@ -1106,6 +1162,7 @@ def adjust_credits(request):
             INSERT INTO exotel_credit_log (action, credits, user_id, admin_id, reason, created_at)
             VALUES (%s, %s, %s, %s, %s, NOW())
         """, [log_action, credits, user_id, request.user_data['userId'], reason])
+        invalidate_entitlements(user_id)
 
         return JsonResponse({
             'success': True,
@@ -1128,9 +1185,11 @@ def credit_distributions(request):
     """
     Get Credit Distributions
     GET /api/admin/credit-distributions
+    Streamed: a database error mid-stream cuts the list short and adds
+    `"truncated": true` to the envelope (the status is already 200).
     """
     try:
-        distributions = execute_query("""
+        distributions = iter_query("""
             SELECT uc.user_id, u.name as user_name,
                    uc.credits_purchased as allocated_credits,
                    (uc.credits_purchased - uc.credits_remaining) as used_credits,
@@ -1155,7 +1214,7 @@ def credit_distributions(request):
             ORDER BY uc.updated_at DESC
         """)
 
-        return JsonResponse({'distributions': distributions})
+        return streaming_json_response(distributions, key='distributions')
 
     except Exception as e:
         print(f"Credit distributions error: {e}")
@@ -1186,30 +1245,21 @@ def exotel_credits(request):
 
         cfg = config[0]
 
-        # Calculate used credits
-        used_data = execute_query("""
+        # Used credits (billed minutes x cost per minute) and the actual amount
+        # Exotel charged (real per-call Price, kept separate from the internal
+        # credit accounting), summed over the daily_metrics rollup.
+        totals = execute_query(f"""
             SELECT
-                COALESCE(SUM(CEIL(duration/60) * %s), 0) as used_credits,
-                COALESCE(SUM(CASE
-                    WHEN MONTH(created_at) = MONTH(NOW()) AND YEAR(created_at) = YEAR(NOW())
-                    THEN CEIL(duration/60) * %s ELSE 0 END), 0) as current_month_usage
-            FROM call_sessions
-            WHERE status = 'completed' AND duration > 0
+                COALESCE(SUM(call_minutes), 0) * %s as used_credits,
+                COALESCE(SUM(CASE WHEN day >= {MONTH_START_SQL}
+                    THEN call_minutes ELSE 0 END), 0) * %s as current_month_usage,
+                COALESCE(SUM(exotel_spend), 0) as total_spend,
+                COALESCE(SUM(CASE WHEN day >= {MONTH_START_SQL}
+                    THEN exotel_spend ELSE 0 END), 0) as current_month_spend
+            FROM daily_metrics
         """, [cfg['cost_per_minute'], cfg['cost_per_minute']])
 
-        used = used_data[0]
-
-        # Actual amount Exotel charged for calls (real per-call Price captured from
-        # Exotel), kept separate from the internal credit accounting above.
-        actual_spend = execute_query("""
-            SELECT COALESCE(SUM(exotel_price), 0) as total_spend,
-                   COALESCE(SUM(CASE
-                       WHEN MONTH(created_at) = MONTH(NOW()) AND YEAR(created_at) = YEAR(NOW())
-                       THEN exotel_price ELSE 0 END), 0) as current_month_spend
-            FROM call_sessions
-            WHERE status = 'completed' AND exotel_price IS NOT NULL
-        """)
-        spend = actual_spend[0]
+        used = totals[0]
 
         # Live wallet balance straight from the Exotel account (real-time).
         live_balance = get_account_balance()
@@ -1226,8 +1276,8 @@ def exotel_credits(request):
             },
             'live_balance': live_balance,
             'actual_spend': {
-                'total': float(spend['total_spend'] or 0),
-                'current_month': float(spend['current_month_spend'] or 0),
+                'total': float(used['total_spend'] or 0),
+                'current_month': float(used['current_month_spend'] or 0),
             }
         })
 
@@ -1374,19 +1424,24 @@ def admin_matches(request):
                     'error': 'User ID and matched user IDs are required'
                 }, status=400)
 
-            # Create bidirectional matches
-            for matched_id in matched_user_ids:
-                # User to matched
-                execute_query("""
-                    INSERT IGNORE INTO matches (user_id, matched_user_id, created_by_admin)
-                    VALUES (%s, %s, %s)
-                """, [user_id, matched_id, request.user_data['userId']])
-
-                # Matched to user (bidirectional)
-                execute_query("""
-                    INSERT IGNORE INTO matches (user_id, matched_user_id, created_by_admin)
-                    VALUES (%s, %s, %s)
-                """, [matched_id, user_id, request.user_data['userId']])
+            # Create bidirectional matches. Rows and users.match_count are written
+            # in one transaction so the counter can't drift from the table.
+            with transaction.atomic():
+                for matched_id in matched_user_ids:
+                    # User to matched
+                    created = execute_update("""
+                        INSERT IGNORE INTO matches (user_id, matched_user_id, created_by_admin)
+                        VALUES (%s, %s, %s)
+                    """, [user_id, matched_id, request.user_data['userId']])
+
+                    # Matched to user (bidirectional)
+                    created += execute_update("""
+                        INSERT IGNORE INTO matches (user_id, matched_user_id, created_by_admin)
+                        VALUES (%s, %s, %s)
+                    """, [matched_id, user_id, request.user_data['userId']])
+
+                    # INSERT IGNORE reports 0 rows for pairs that already existed
+                    adjust_match_counts(user_id, matched_id, created)
 
             return JsonResponse({
                 'success': True,
@@ -1409,11 +1464,14 @@ def admin_matches(request):
                 }, status=400)
 
             # Delete both directions
-            execute_update("""
-                DELETE FROM matches
-                WHERE (user_id = %s AND matched_user_id = %s)
-                   OR (user_id = %s AND matched_user_id = %s)
-            """, [user_id, matched_user_id, matched_user_id, user_id])
+            with transaction.atomic():
+                deleted = execute_update("""
+                    DELETE FROM matches
+                    WHERE (user_id = %s AND matched_user_id = %s)
+                       OR (user_id = %s AND matched_user_id = %s)
+                """, [user_id, matched_user_id, matched_user_id, user_id])
+
+                adjust_match_counts(user_id, matched_user_id, -deleted)
 
             return JsonResponse({'success': True})
 
@@ -1432,10 +1490,12 @@ def admin_blocks(request):
     GET: List all blocks
     DELETE: Admin unblock
     PATCH: Toggle call permission
+    GET is streamed: a database error mid-stream cuts the list short and adds
+    `"truncated": true` to the envelope (the status is already 200).
     """
     if request.method == "GET":
         try:
-            blocks = execute_query("""
+            blocks = iter_query("""
                 SELECT ub.id, ub.blocker_id, ub.blocked_id, ub.call_allowed,
                        ub.created_at, ub.updated_at,
                        blocker.name as blocker_name, blocker.email as blocker_email,
@@ -1450,7 +1510,7 @@ def admin_blocks(request):
                 ORDER BY ub.created_at DESC
             """)
 
-            return JsonResponse({'success': True, 'blocks': blocks})
+            return streaming_json_response(blocks, key='blocks', extra={'success': True})
 
         except Exception as e:
             print(f"Blocks fetch error: {e}")
@@ -1553,6 +1613,35 @@ def admin_call_sessions(request):
         return JsonResponse({'error': 'Internal server error'}, status=500)
 
 # ==================== CALL SUBSCRIPTIONS ====================
+def _format_call_subscription(row):
+    """Shape one call_subscriptions row for the response"""
+    return {
+        'id': row['id'],
+        'user_id': row['user_id'],
+        'user_name': row['user_name'],
+        'user_email': row['user_email'],
+        'user_phone': row['user_phone'],
+        'user_photo': row['user_photo'],
+        'plan_name': row['plan_name'],
+        'plan_id': row['plan_id'],
+        'credits_purchased': row['credits_purchased'] or row['plan_credits'] or 0,
+        'credits_remaining': row['credits_remaining'] or 0,
+        'credits_used': row['credits_used'] or 0,
+        'amount_paid': float(row['amount']) if row['amount'] else 0,
+        'payment_status': row['status'],
+        'payment_screenshot': row.get('screenshot'),
+        'transaction_id': row.get('transaction_id'),
+        'admin_notes': row.get('admin_notes', ''),
+        'expires_at': str(row['expires_at']) if row['expires_at'] else None,
+        'created_at': str(row['created_at']),
+        'verified_at': str(row['verified_at']) if row['verified_at'] else None,
+        'verified_by': row['verified_by'],
+        'is_active': row['is_active'] == 1,
+        'total_call_duration': int(row['total_call_duration']) if row['total_call_duration'] else 0,
+        'total_calls_made': int(row['total_calls_made']) if row['total_calls_made'] else 0
+    }
+
+
 @csrf_exempt
 @require_http_methods(["GET"])
 @require_admin
@@ -1560,9 +1649,11 @@ def call_subscriptions(request):
     """
     Get Call Subscriptions
     GET /api/admin/call-subscriptions
+    Streamed: a database error mid-stream cuts the list short and adds
+    `"truncated": true` to the envelope (the status is already 200).
     """
     try:
-        subscriptions = execute_query("""
+        subscriptions = iter_query("""
             SELECT
                 p.*,
                 u.name as user_name,
@@ -1597,35 +1688,10 @@ def call_subscriptions(request):
             ORDER BY p.created_at DESC
         """)
 
-        formatted = []
-        for row in subscriptions:
-            formatted.append({
-                'id': row['id'],
-                'user_id': row['user_id'],
-                'user_name': row['user_name'],
-                'user_email': row['user_email'],
-                'user_phone': row['user_phone'],
-                'user_photo': row['user_photo'],
-                'plan_name': row['plan_name'],
-                'plan_id': row['plan_id'],
-                'credits_purchased': row['credits_purchased'] or row['plan_credits'] or 0,
-                'credits_remaining': row['credits_remaining'] or 0,
-                'credits_used': row['credits_used'] or 0,
-                'amount_paid': float(row['amount']) if row['amount'] else 0,
-                'payment_status': row['status'],
-                'payment_screenshot': row.get('screenshot'),
-                'transaction_id': row.get('transaction_id'),
-                'admin_notes': row.get('admin_notes', ''),
-                'expires_at': str(row['expires_at']) if row['expires_at'] else None,
-                'created_at': str(row['created_at']),
-                'verified_at': str(row['verified_at']) if row['verified_at'] else None,
-                'verified_by': row['verified_by'],
-                'is_active': row['is_active'] == 1,
-                'total_call_duration': int(row['total_call_duration']) if row['total_call_duration'] else 0,
-                'total_calls_made': int(row['total_calls_made']) if row['total_calls_made'] else 0
-            })
-
-        return JsonResponse({'subscriptions': formatted})
+        return streaming_json_response(
+            (_format_call_subscription(row) for row in subscriptions),
+            key='subscriptions'
+        )
 
     except Exception as e:
         print(f"Call subscriptions error: {e}")
@@ -1674,6 +1740,7 @@ def verify_call_payment(request):
             SET status = %s, admin_notes = %s, verified_by = %s, verified_at = NOW()
             WHERE id = %s
         """, [new_status, admin_notes, request.user_data['userId'], subscription_id])
+        record_payment_status_change(p, p['status'], new_status)
 
         if action == 'verify':
             # Create or update credits
@@ -1706,6 +1773,7 @@ def verify_call_payment(request):
                 VALUES ('allocated', %s, %s, %s, %s, NOW())
             """, [p['call_credits'], p['user_id'], request.user_data['userId'],
                   f"Payment verified: {p['plan_name']}"])
+            invalidate_entitlements(p['user_id'])
 
         return JsonResponse({
             'success': True,
@@ -1726,6 +1794,10 @@ def admin_user_call_logs(request):
     """
     Get User Call Logs (Admin)
     GET /api/admin/user-call-logs?userId=<id>&page=<page>&limit=<limit>
+
+    Each branch costs a fixed number of queries (page + count) no matter how
+    many rows the page holds. The user list reads per-user totals from the
+    user_call_stats rollup, which only counts calls that have finished.
     """
     try:
         user_id = request.GET.get('userId')
@@ -1734,7 +1806,8 @@ def admin_user_call_logs(request):
         offset = (page - 1) * limit
 
         if user_id:
-            # Get specific user's call logs
+            # Get specific user's call logs, with both parties' names and the other
+            # party's photo joined in
             call_logs_query = f"""
                 SELECT
                     cs.id as session_id,
@@ -1747,40 +1820,36 @@ def admin_user_call_logs(request):
                     cs.receiver_virtual_number,
                     COALESCE(cs.started_at, cs.created_at) as started_at,
                     cs.ended_at,
-                    cs.created_at
+                    cs.created_at,
+                    caller.name as caller_name, caller.phone as caller_phone,
+                    receiver.name as receiver_name, receiver.phone as receiver_phone,
+                    other_profile.profile_photo as other_party_photo
                 FROM call_sessions cs
+                LEFT JOIN users caller ON caller.id = cs.caller_id
+                LEFT JOIN users receiver ON receiver.id = cs.receiver_id
+                LEFT JOIN user_profiles other_profile ON other_profile.id = (
+                    SELECT MAX(p.id) FROM user_profiles p
+                    WHERE p.user_id = CASE WHEN cs.caller_id = %s THEN cs.receiver_id ELSE cs.caller_id END
+                )
                 WHERE (cs.caller_id = %s OR cs.receiver_id = %s)
                 ORDER BY cs.created_at DESC
                 LIMIT {limit} OFFSET {offset}
             """
 
-            call_logs = execute_query(call_logs_query, [user_id, user_id])
+            call_logs = execute_query(call_logs_query, [user_id, user_id, user_id])
 
-            # Enrich with user details
             enriched = []
             for log in call_logs:
-                other_user_id = log['receiver_id'] if log['caller_id'] == int(user_id) else log['caller_id']
                 call_type = 'outgoing' if log['caller_id'] == int(user_id) else 'incoming'
-
-                other_user = execute_query(
-                    "SELECT name, phone FROM users WHERE id = %s",
-                    [other_user_id]
-                )
-
-                photo = execute_query(
-                    "SELECT profile_photo FROM user_profiles WHERE user_id = %s",
-                    [other_user_id]
-                )
-
-                caller = execute_query("SELECT name FROM users WHERE id = %s", [log['caller_id']])
-                receiver = execute_query("SELECT name FROM users WHERE id = %s", [log['receiver_id']])
+                other = 'receiver' if call_type == 'outgoing' else 'caller'
+                other_found = log[f'{other}_name'] is not None
 
                 enriched.append({
                     'session_id': log['session_id'],
                     'call_type': call_type,
-                    'other_party_name': other_user[0]['name'] if other_user else 'Unknown',
-                    'other_party_phone': other_user[0]['phone'] if other_user else 'Unknown',
-                    'other_party_photo': photo[0]['profile_photo'] if photo else None,
+                    'other_party_name': log[f'{other}_name'] if other_found else 'Unknown',
+                    'other_party_phone': log[f'{other}_phone'] if other_found else 'Unknown',
+                    'other_party_photo': log['other_party_photo'],
                     'status': log['status'],
                     'duration': int(log['duration']),
                     'cost': float(log['cost']),
@@ -1788,8 +1857,8 @@ def admin_user_call_logs(request):
                     'started_at': str(log['started_at']),
                     'ended_at': str(log['ended_at']) if log['ended_at'] else None,
                     'created_at': str(log['created_at']),
-                    'caller_name': caller[0]['name'] if caller else 'Unknown',
-                    'receiver_name': receiver[0]['name'] if receiver else 'Unknown'
+                    'caller_name': log['caller_name'] if log['caller_name'] is not None else 'Unknown',
+                    'receiver_name': log['receiver_name'] if log['receiver_name'] is not None else 'Unknown'
                 })
 
             # Get total count
@@ -1809,16 +1878,26 @@ def admin_user_call_logs(request):
             })
 
         else:
-            # Get all users with call activity
+            # Users with finished calls, read straight from the user_call_stats
+            # rollup, with their photo and latest active credit allocation joined in
             users_query = f"""
-                SELECT DISTINCT u.id, u.name, u.email, u.phone
-                FROM users u
-                WHERE u.role = 'user'
-                AND u.id IN (
-                    SELECT DISTINCT caller_id FROM call_sessions
-                    UNION
-                    SELECT DISTINCT receiver_id FROM call_sessions
+                SELECT u.id, u.name, u.email, u.phone,
+                       up.profile_photo,
+                       c.credits_remaining, c.credits_purchased, c.expires_at as credits_expire,
+                       st.outgoing_calls, st.incoming_calls, st.completed_calls,
+                       st.total_minutes, st.completed_seconds, st.completed_with_duration,
+                       st.total_cost, st.last_call_at
+                FROM user_call_stats st
+                JOIN users u ON u.id = st.user_id
+                LEFT JOIN user_profiles up
+                    ON up.id = (SELECT MAX(p.id) FROM user_profiles p WHERE p.user_id = u.id)
+                LEFT JOIN user_call_credits c ON c.id = (
+                    SELECT cc.id FROM user_call_credits cc
+                    WHERE cc.user_id = u.id AND cc.expires_at > NOW()
+                    ORDER BY cc.expires_at DESC
+                    LIMIT 1
                 )
+                WHERE u.role = 'user'
                 ORDER BY u.id
                 LIMIT {limit} OFFSET {offset}
             """
@@ -1827,81 +1906,39 @@ def admin_user_call_logs(request):
 
             enriched_users = []
             for user in users:
-                # Get profile photo
-                profile = execute_query(
-                    "SELECT profile_photo FROM user_profiles WHERE user_id = %s",
-                    [user['id']]
-                )
-
-                # Get call stats
-                outgoing = execute_query(
-                    "SELECT COUNT(*) as count FROM call_sessions WHERE caller_id = %s",
-                    [user['id']]
-                )
-
-                incoming = execute_query(
-                    "SELECT COUNT(*) as count FROM call_sessions WHERE receiver_id = %s",
-                    [user['id']]
-                )
-
-                completed = execute_query(
-                    "SELECT COUNT(*) as count FROM call_sessions WHERE (caller_id = %s OR receiver_id = %s) AND status = 'completed'",
-                    [user['id'], user['id']]
-                )
-
-                stats = execute_query("""
-                    SELECT
-                        SUM(CASE WHEN status = 'completed' THEN CEIL(COALESCE(duration, 0)/60) ELSE 0 END) as minutes,
-                        SUM(COALESCE(cost, 0)) as total_cost,
-                        AVG(CASE WHEN status = 'completed' AND duration > 0 THEN duration END) as avg_duration,
-                        MAX(created_at) as last_call
-                    FROM call_sessions
-                    WHERE caller_id = %s OR receiver_id = %s
-                """, [user['id'], user['id']])
-
-                credits = execute_query("""
-                    SELECT credits_remaining, credits_purchased, expires_at
-                    FROM user_call_credits
-                    WHERE user_id = %s AND expires_at > NOW()
-                    ORDER BY expires_at DESC
-                    LIMIT 1
-                """, [user['id']])
-
-                s = stats[0] if stats else {}
-                c = credits[0] if credits else {}
+                outgoing = user['outgoing_calls']
+                incoming = user['incoming_calls']
+                timed_calls = user['completed_with_duration']
+                has_credits = user['credits_expire'] is not None
 
                 enriched_users.append({
                     'id': user['id'],
                     'name': user['name'],
                     'email': user['email'],
                     'phone': user['phone'],
-                    'profile_photo': profile[0]['profile_photo'] if profile else None,
-                    'outgoing_calls': outgoing[0]['count'] if outgoing else 0,
-                    'incoming_calls': incoming[0]['count'] if incoming else 0,
-                    'total_calls': (outgoing[0]['count'] if outgoing else 0) + (incoming[0]['count'] if incoming else 0),
+                    'profile_photo': user['profile_photo'],
+                    'outgoing_calls': outgoing,
+                    'incoming_calls': incoming,
+                    'total_calls': outgoing + incoming,
                     'completed_outgoing': 0,
                     'completed_incoming': 0,
-                    'completed_calls': completed[0]['count'] if completed else 0,
-                    'total_minutes': int(s.get('minutes', 0) or 0),
-                    'avg_call_duration': int(s.get('avg_duration', 0) or 0),
-                    'total_cost': float(s.get('total_cost', 0) or 0),
-                    'last_call_date': str(s['last_call']) if s.get('last_call') else None,
-                    'credits_remaining': c.get('credits_remaining', 0),
-                    'credits_purchased': c.get('credits_purchased', 0),
-                    'credits_expire': str(c['expires_at']) if c.get('expires_at') else None,
-                    'has_active_credits': bool(c.get('credits_remaining', 0) > 0 and c.get('expires_at'))
+                    'completed_calls': user['completed_calls'],
+                    'total_minutes': user['total_minutes'],
+                    'avg_call_duration': int(user['completed_seconds'] / timed_calls) if timed_calls else 0,
+                    'total_cost': float(user['total_cost']),
+                    'last_call_date': str(user['last_call_at']) if user['last_call_at'] else None,
+                    'credits_remaining': user['credits_remaining'] if has_credits else 0,
+                    'credits_purchased': user['credits_purchased'] if has_credits else 0,
+                    'credits_expire': str(user['credits_expire']) if has_credits else None,
+                    'has_active_credits': bool(has_credits and user['credits_remaining'] > 0)
                 })
 
             # Get total count
             total = execute_query("""
-                SELECT COUNT(DISTINCT u.id) as total
-                FROM users u
+                SELECT COUNT(*) as total
+                FROM user_call_stats st
+                JOIN users u ON u.id = st.user_id
                 WHERE u.role = 'user'
-                AND u.id IN (
-                    SELECT DISTINCT caller_id FROM call_sessions
-                    UNION
-                    SELECT DISTINCT receiver_id FROM call_sessions
-                )
             """)
 
             return JsonResponse({
@@ -1920,9 +1957,17 @@ def admin_user_call_logs(request):
 
 
 # ====================  SEARCH VISIBILITY ====================
+def _search_visibility_version(request):
+    return stamp("""
+        SELECT COUNT(*) as settings, MAX(COALESCE(updated_at, created_at)) as changed
+        FROM search_visibility_settings
+    """)
+
+
 @csrf_exempt
 @require_http_methods(["GET", "POST", "DELETE"])
 @require_admin
+@conditional_get(_search_visibility_version)
 def search_visibility(request):
     """
     Search Visibility Management
@@ -3,8 +3,14 @@ import re
 from django.http import JsonResponse
 from django.views.decorators.http import require_http_methods
 from django.views.decorators.csrf import csrf_exempt
-from api.utils import hash_password, verify_password, create_jwt_token, verify_token, get_token_from_request
-from api.db_utils import execute_query, execute_insert
+from api.utils import (
+    hash_password, verify_password, create_jwt_token, verify_token, get_token_from_request, require_auth,
+    password_busy_response, password_needs_rehash,
+)
+from api.password_hashing import PasswordHasherBusy
+from api.token_revocations import revoke_token
+from api.db_utils import execute_query, execute_insert, execute_update
+from api.metrics import bump_daily_metrics
 
 @csrf_exempt
 @require_http_methods(["POST"])
@@ -58,6 +64,7 @@ def register(request):
                VALUES (%s, %s, %s, %s, %s, %s, NOW())""",
             [name, email, phone, hashed_password, recovery_password, 'user']
         )
+        bump_daily_metrics(signups=1)
 
         # Create JWT token
         token = create_jwt_token({
@@ -79,11 +86,50 @@ def register(request):
             }
         })
 
+    except PasswordHasherBusy:
+        return password_busy_response()
     except Exception as e:
         print(f"Registration error: {e}")
         return JsonResponse({'error': 'Internal server error'}, status=500)
 
 
+# Only the columns login reads, instead of SELECT *
+_LOGIN_USER_COLUMNS = "u.id, u.name, u.email, u.phone, u.role, u.password, u.recovery_password"
+
+_LOGIN_PROFILE_COLUMNS = "up.id as profile_id, up.is_complete"
+
+_PHONE_RE = re.compile(r'^\+?[\d\s\-\(\)]{10,}$')
+
+def _login_lookup(identifier, login_type):
+    """
+    WHERE clause and params matching the identifier against a single indexed
+    column: email if it has an @, phone if it is phone-shaped, otherwise name
+    for admins and phone as entered for users.
+    """
+    if '@' in identifier:
+        return "u.email = %s", [identifier]
+    if _PHONE_RE.match(identifier):
+        # Phones are stored as entered; also try the bare digits (and leading +)
+        normalised = re.sub(r'[\s\-\(\)]', '', identifier)
+        return "u.phone IN (%s, %s)", [identifier, normalised]
+    if login_type == 'admin':
+        return "u.name = %s", [identifier]
+    return "u.phone = %s", [identifier]
+
+def _upgrade_password_hash(user, password):
+    """Re-hash a just-verified password at the current BCRYPT_ROUNDS; never fails the login"""
+    try:
+        new_hash = hash_password(password)
+        # Only replace the hash we verified, not one set by a concurrent password change
+        execute_update(
+            "UPDATE users SET password = %s, updated_at = NOW() WHERE id = %s AND password = %s",
+            [new_hash, user['id'], user['password']]
+        )
+    except PasswordHasherBusy:
+        pass  # Upgrade on a later login
+    except Exception as e:
+        print(f"Password rehash error for user {user['id']}: {e}")
+
 @csrf_exempt
 @require_http_methods(["POST"])
 def login(request):
@@ -103,17 +149,19 @@ def login(request):
                 'error': 'Identifier, password, and type are required'
             }, status=400)
 
-        # Build query based on login type
+        where, params = _login_lookup(str(identifier).strip(), login_type)
+
         if login_type == 'admin':
-            query = """SELECT * FROM users
-                      WHERE (email = %s OR phone = %s OR name = %s)
-                      AND status = 'active' AND role = 'admin'"""
-            params = [identifier, identifier, identifier]
+            query = f"""SELECT {_LOGIN_USER_COLUMNS} FROM users u
+                      WHERE {where} AND u.status = 'active' AND u.role = 'admin'
+                      LIMIT 1"""
         else:
-            query = """SELECT * FROM users
-                      WHERE (email = %s OR phone = %s)
-                      AND status = 'active'"""
-            params = [identifier, identifier]
+            # Profile completeness comes back in the same round-trip
+            query = f"""SELECT {_LOGIN_USER_COLUMNS}, {_LOGIN_PROFILE_COLUMNS}
+                      FROM users u
+                      LEFT JOIN user_profiles up ON up.user_id = u.id
+                      WHERE {where} AND u.status = 'active'
+                      LIMIT 1"""
 
         users = execute_query(query, params)
 
@@ -129,30 +177,13 @@ def login(request):
         if not (main_password_match or recovery_match):
             return JsonResponse({'error': 'Invalid credentials'}, status=401)
 
+        if main_password_match and password_needs_rehash(user['password']):
+            _upgrade_password_hash(user, password)
+
         # Check profile completion for regular users
         profile_complete = True
         if user['role'] == 'user':
-            profile_rows = execute_query(
-                """SELECT id, status, age, gender, caste, religion, education,
-                   occupation, state, city, marital_status
-                   FROM user_profiles WHERE user_id = %s""",
-                [user['id']]
-            )
-
-            if not profile_rows:
-                profile_complete = False
-            else:
-                profile = profile_rows[0]
-                if profile['status'] == 'rejected':
-                    profile_complete = False
-                else:
-                    required_fields = ['age', 'gender', 'caste', 'religion',
-                                     'education', 'occupation', 'state', 'city',
-                                     'marital_status']
-                    profile_complete = all(
-                        profile.get(field) and str(profile[field]).strip()
-                        for field in required_fields
-                    )
+            profile_complete = bool(user['is_complete'])
 
         # Create JWT token
         token = create_jwt_token({
@@ -190,6 +221,8 @@ def login(request):
                 }
             })
 
+    except PasswordHasherBusy:
+        return password_busy_response()
     except Exception as e:
         print(f"Login error: {e}")
         return JsonResponse({'error': 'Login failed'}, status=500)
@@ -212,10 +245,13 @@ def verify(request):
         if not decoded:
             return JsonResponse({'error': 'Invalid token'}, status=401)
 
-        # Get user details
+        # Get user details, with the profile flags from the same indexed lookup
         users = execute_query(
-            """SELECT id, name, email, phone, role, status
-               FROM users WHERE id = %s AND status = 'active'""",
+            """SELECT u.id, u.name, u.email, u.phone, u.role, up.id as profile_id, up.is_complete
+               FROM users u
+               LEFT JOIN user_profiles up ON up.user_id = u.id
+               WHERE u.id = %s AND u.status = 'active'
+               LIMIT 1""",
             [decoded['userId']]
         )
 
@@ -229,28 +265,8 @@ def verify(request):
         profile_exists = True
 
         if user['role'] == 'user':
-            profile_rows = execute_query(
-                """SELECT id, status, age, gender, caste, religion, education,
-                   occupation, state, city, marital_status
-                   FROM user_profiles WHERE user_id = %s""",
-                [decoded['userId']]
-            )
-
-            if not profile_rows:
-                profile_complete = False
-                profile_exists = False
-            else:
-                profile = profile_rows[0]
-                if profile['status'] == 'rejected':
-                    profile_complete = False
-                else:
-                    required_fields = ['age', 'gender', 'caste', 'religion',
-                                     'education', 'occupation', 'state', 'city',
-                                     'marital_status']
-                    profile_complete = all(
-                        profile.get(field) and str(profile[field]).strip()
-                        for field in required_fields
-                    )
+            profile_exists = user['profile_id'] is not None
+            profile_complete = bool(user['is_complete'])
 
         return JsonResponse({
             'user': {
@@ -267,3 +283,21 @@ def verify(request):
     except Exception as e:
         print(f"Token verification error: {e}")
         return JsonResponse({'error': 'Invalid token'}, status=401)
+
+
+@csrf_exempt
+@require_http_methods(["POST"])
+@require_auth
+def logout(request):
+    """
+    Logout API - revokes the bearer token
+    POST /api/auth/logout
+    Headers: Authorization: Bearer <token>
+    """
+    try:
+        revoke_token(get_token_from_request(request), request.user_data)
+        return JsonResponse({'success': True, 'message': 'Logged out successfully'})
+
+    except Exception as e:
+        print(f"Logout error: {e}")
+        return JsonResponse({'error': 'Logout failed'}, status=500)
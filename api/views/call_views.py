@@ -1,202 +1,18 @@
 import json
-import base64
-import requests
-import threading
-import time
 from datetime import datetime, timedelta
 from django.http import JsonResponse
 from django.views.decorators.http import require_http_methods
 from django.views.decorators.csrf import csrf_exempt
 from django.conf import settings
 from api.utils import require_user
-from api.db_utils import execute_query, execute_insert, execute_update
-from api.exotel_client import parse_price, get_call_details
-# =============================================================================
-# SYNC JOB - Runs every 5 minutes automatically (like Node.js cron.schedule)
-# =============================================================================
-_sync_job_started = False
-def sync_stuck_calls():
-    """Background sync job for stuck calls - matches Node.js sync job exactly"""
-    try:
-        print('[SYNC JOB] Starting sync job for stuck calls')
-
-        # Find stuck calls (older than 2 minutes)
-        two_minutes_ago = datetime.now() - timedelta(minutes=2)
-
-        stuck_calls = execute_query("""
-            SELECT id, exotel_call_sid, caller_id, receiver_id
-            FROM call_sessions
-            WHERE status IN ('initiated', 'ringing', 'in_progress')
-              AND created_at < %s
-        """, [two_minutes_ago])
-
-        if not stuck_calls:
-            return
-
-        print(f'[SYNC JOB] Found {len(stuck_calls)} stuck calls to sync')
-
-        for call in stuck_calls:
-            try:
-                url = f"https://{settings.EXOTEL_SUBDOMAIN}/v1/Accounts/{settings.EXOTEL_SID}/Calls/{call['exotel_call_sid']}.json"
-
-                auth_string = f"{settings.EXOTEL_API_KEY}:{settings.EXOTEL_API_TOKEN}"
-                auth_header = base64.b64encode(auth_string.encode()).decode()
-
-                response = requests.get(url, headers={
-                    'Authorization': f'Basic {auth_header}'
-                }, timeout=10)
-
-                if not response.ok:
-                    continue
-
-                data = response.json()
-                call_data = data.get('Call', {})
-
-                status = (call_data.get('Status') or 'unknown').lower()
-                duration = int(call_data.get('Duration') or 0)
-                recording_url = call_data.get('RecordingUrl')
-                conversation_duration = int(call_data.get('ConversationDuration') or 0)
-                legs = call_data.get('Legs', [])
-                # Actual amount Exotel charged for this call (real money, kept
-                # separate from the internal per-minute credit accounting).
-                exotel_price = parse_price(call_data.get('Price'))
-
-                duration_minutes = (duration + 59) // 60
-                cost_per_minute = 1.0
-                call_cost = duration_minutes * cost_per_minute if duration > 0 else 0
-
-                # Update call session
-                execute_update("""
-                    UPDATE call_sessions
-                    SET status = %s, duration = %s, cost = %s, exotel_price = %s, ended_at = NOW(),
-                        recording_url = %s, conversation_duration = %s,
-                        leg1_status = %s, leg1_duration = %s,
-                        leg2_status = %s, leg2_duration = %s,
-                        updated_at = NOW()
-                    WHERE id = %s
-                """, [
-                    status, duration, call_cost, exotel_price, recording_url, conversation_duration,
-                    legs[0].get('Status') if len(legs) > 0 else None,
-                    legs[0].get('OnCallDuration', 0) if len(legs) > 0 else 0,
-                    legs[1].get('Status') if len(legs) > 1 else None,
-                    legs[1].get('OnCallDuration', 0) if len(legs) > 1 else 0,
-                    call['id']
-                ])
-
-                # Deduct credits if completed and no trigger
-                if status == 'completed' and not getattr(settings, 'HAS_CREDIT_DEDUCTION_TRIGGER', False):
-                    for user_id in [call['caller_id'], call['receiver_id']]:
-                        execute_update("""
-                            UPDATE user_call_credits
-                            SET credits_remaining = GREATEST(0, credits_remaining - %s),
-                                last_used_at = NOW(), updated_at = NOW()
-                            WHERE user_id = %s
-                              AND credits_remaining > 0
-                              AND expires_at > NOW()
-                            ORDER BY expires_at ASC
-                            LIMIT 1
-                        """, [duration_minutes, user_id])
-
-                        execute_insert("""
-                            INSERT INTO exotel_credit_log (
-                                action, credits, user_id, call_session_id, reason, created_at
-                            ) VALUES ('used', %s, %s, %s, 'Call synced', NOW())
-                        """, [duration_minutes, user_id, call['id']])
-
-                print(f"[SYNC JOB] Synced stuck call {call['id']} to status: {status}, duration: {duration}")
-
-            except Exception as e:
-                print(f"[SYNC JOB] Error syncing call {call['id']}: {e}")
-                continue
-
-    except Exception as e:
-        print(f'[SYNC JOB] Sync job error: {e}')
-def run_sync_job_loop():
-    """Run sync job every 5 minutes - matches Node.js cron.schedule('*/5 * * * *')"""
-    while True:
-        try:
-            sync_stuck_calls()
-        except Exception as e:
-            print(f"[SYNC JOB] Loop error: {e}")
-
-        # Sleep for 5 minutes
-        time.sleep(300)
-def start_sync_job():
-    """Start the sync job automatically when module loads - matches Node.js startSyncJob()"""
-    global _sync_job_started
-
-    if _sync_job_started:
-        return
-
-    _sync_job_started = True
-
-    # Start background thread
-    sync_thread = threading.Thread(target=run_sync_job_loop, daemon=True)
-    sync_thread.start()
-
-    print('[SYNC JOB] Call sync job started - will run every 5 minutes')
-# Start sync job automatically when module is imported (like Node.js)
-start_sync_job()
+from api.db_utils import execute_query, execute_insert
+from api.exotel_client import ExotelUnavailable, connect_call
+from api.call_events import process_call_event
+from api.entitlements import get_entitlements, has_call_credits
+from api.webhook_queue import enqueue_webhook
 # =============================================================================
 # HELPER FUNCTIONS
 # =============================================================================
-def initiate_exotel_call(caller_number, receiver_number, user_id, target_user_id):
-    """Helper function to initiate Exotel call"""
-    try:
-        url = f"https://{settings.EXOTEL_SUBDOMAIN}/v1/Accounts/{settings.EXOTEL_SID}/Calls/connect.json"
-        custom_field = json.dumps({
-            'userId': user_id,
-            'targetUserId': target_user_id,
-            'timestamp': str(int(__import__('time').time() * 1000))
-        })
-        data = {
-            'From': caller_number,
-            'To': receiver_number,
-            'CallerId': settings.EXOTEL_VIRTUAL_NUMBER,
-            'CallType': 'trans',
-            'TimeLimit': '3600',
-            'TimeOut': '30',
-            'StatusCallback': f"{settings.APP_URL}/api/calls/webhook",
-            'StatusCallbackEvents[0]': 'terminal',
-            'StatusCallbackEvents[1]': 'answered',
-            'StatusCallbackContentType': 'application/json',
-            'Record': 'true',
-            'CustomField': custom_field
-        }
-        auth_string = f"{settings.EXOTEL_API_KEY}:{settings.EXOTEL_API_TOKEN}"
-        auth_header = base64.b64encode(auth_string.encode()).decode()
-        headers = {
-            'Authorization': f'Basic {auth_header}',
-            'Content-Type': 'application/x-www-form-urlencoded',
-            'Accept': 'application/json'
-        }
-        print('Initiating Exotel call with params:', {
-            'From': caller_number,
-            'To': receiver_number,
-            'CallerId': settings.EXOTEL_VIRTUAL_NUMBER,
-            'StatusCallback': f"{settings.APP_URL}/api/calls/webhook",
-            'StatusCallbackEvents': ['terminal', 'answered']
-        })
-        response = requests.post(url, data=data, headers=headers)
-        result = response.json()
-        print('Exotel API Response:', result)
-        if response.ok and result.get('Call', {}).get('Sid'):
-            return {
-                'success': True,
-                'callSid': result['Call']['Sid'],
-                'status': result['Call']['Status'],
-                'virtualNumber': settings.EXOTEL_VIRTUAL_NUMBER
-            }
-        else:
-            print('Exotel API Error:', result)
-            raise Exception(
-                result.get('RestException', {}).get('Message') or
-                result.get('message') or
-                'Exotel API call failed'
-            )
-    except Exception as e:
-        print(f"Exotel API error: {e}")
-        raise
 # =============================================================================
 # ENDPOINT 1: INITIATE CALL (GET & POST)
 # =============================================================================
@@ -229,30 +45,17 @@ def initiate_call(request):
                     'code': 'CONFIG_ERROR'
                 }, status=500)
 
-            # Check caller credits
-            caller_credits = execute_query("""
-                SELECT id, credits_remaining, expires_at
-                FROM user_call_credits
-                WHERE user_id = %s AND credits_remaining > 0 AND expires_at > NOW()
-                ORDER BY expires_at ASC
-                LIMIT 1
-            """, [user_id])
-
-            if not caller_credits:
+            # Check caller credits against the database, not a cached snapshot:
+            # another worker may have just used up or removed them, and a
+            # stale snapshot would let a paid call through.
+            if not has_call_credits(get_entitlements(user_id, fresh=True)):
                 return JsonResponse({
                     'error': "You don't have active call credits. Please purchase a call plan.",
                     'code': 'NO_CREDITS'
                 }, status=403)
 
             # Check receiver credits
-            receiver_credits = execute_query("""
-                SELECT id, credits_remaining
-                FROM user_call_credits
-                WHERE user_id = %s AND credits_remaining > 0 AND expires_at > NOW()
-                LIMIT 1
-            """, [target_user_id])
-
-            if not receiver_credits:
+            if not has_call_credits(get_entitlements(target_user_id, fresh=True)):
                 return JsonResponse({
                     'error': "The user you're trying to call doesn't have active call credits.",
                     'code': 'TARGET_NO_CREDITS'
@@ -294,7 +97,7 @@ def initiate_call(request):
 
             try:
                 # Initiate Exotel call
-                exotel_result = initiate_exotel_call(
+                exotel_result = connect_call(
                     caller['phone'],
                     receiver['phone'],
                     user_id,
@@ -337,6 +140,13 @@ def initiate_call(request):
                     'exotelCallSid': exotel_result['callSid']
                 })
 
+            except ExotelUnavailable as exotel_error:
+                print('Exotel call refused:', exotel_error)
+                return JsonResponse({
+                    'error': 'Calling is temporarily unavailable. Please try again in a minute.',
+                    'code': 'EXOTEL_UNAVAILABLE'
+                }, status=503)
+
             except Exception as exotel_error:
                 print('Exotel call failed:', exotel_error)
                 return JsonResponse({
@@ -453,6 +263,39 @@ def initiate_call(request):
 # =============================================================================
 # ENDPOINT 2: WEBHOOK (POST ONLY)
 # =============================================================================
+def _parse_webhook_payload(request):
+    """Webhook body as a dict (JSON or Exotel's form encoding); None if unsupported"""
+    content_type = request.content_type or ''
+
+    if 'application/json' in content_type:
+        return json.loads(request.body)
+
+    if 'application/x-www-form-urlencoded' in content_type:
+        webhook_data = dict(request.POST.items())
+
+        # Handle nested Legs array from form data
+        if 'Legs[0][Status]' in webhook_data or 'Legs[1][Status]' in webhook_data:
+            legs = []
+            legs.append({
+                'Status': webhook_data.get('Legs[0][Status]', ''),
+                'OnCallDuration': int(webhook_data.get('Legs[0][OnCallDuration]', 0))
+            })
+            legs.append({
+                'Status': webhook_data.get('Legs[1][Status]', ''),
+                'OnCallDuration': int(webhook_data.get('Legs[1][OnCallDuration]', 0))
+            })
+            webhook_data['Legs'] = legs
+
+        # Convert ConversationDuration to int
+        if 'ConversationDuration' in webhook_data:
+            webhook_data['ConversationDuration'] = int(webhook_data.get('ConversationDuration', 0))
+
+        return webhook_data
+
+    print('Unsupported content type:', content_type)
+    return None
+
+
 @csrf_exempt
 @require_http_methods(["POST"])
 def call_webhook(request):
@@ -460,223 +303,42 @@ def call_webhook(request):
     Exotel Webhook Handler
     POST /api/calls/webhook
 
-    Matches Node.js webhook handler exactly
+    With CALL_WEBHOOK_MODE=queue the payload is only stored in webhook_logs and
+    acknowledged; `manage.py process_webhooks` applies it (see api/webhook_queue.py).
+    Otherwise it is applied inline, matching the Node.js webhook handler.
     """
     webhook_data = None
 
     try:
-        # Parse webhook data
-        content_type = request.content_type or ''
-
-        if 'application/json' in content_type:
-            webhook_data = json.loads(request.body)
-        elif 'application/x-www-form-urlencoded' in content_type:
-            webhook_data = dict(request.POST.items())
-
-            # Handle nested Legs array from form data
-            if 'Legs[0][Status]' in webhook_data or 'Legs[1][Status]' in webhook_data:
-                legs = []
-                legs.append({
-                    'Status': webhook_data.get('Legs[0][Status]', ''),
-                    'OnCallDuration': int(webhook_data.get('Legs[0][OnCallDuration]', 0))
-                })
-                legs.append({
-                    'Status': webhook_data.get('Legs[1][Status]', ''),
-                    'OnCallDuration': int(webhook_data.get('Legs[1][OnCallDuration]', 0))
-                })
-                webhook_data['Legs'] = legs
-
-            # Convert ConversationDuration to int
-            if 'ConversationDuration' in webhook_data:
-                webhook_data['ConversationDuration'] = int(webhook_data.get('ConversationDuration', 0))
-        else:
-            print('Unsupported content type:', content_type)
+        webhook_data = _parse_webhook_payload(request)
+        if webhook_data is None:
             return JsonResponse({'error': 'Unsupported content type'}, status=400)
 
         print('📞 Exotel Webhook Received:', json.dumps(webhook_data, indent=2))
 
-        # Extract webhook data
         call_sid = webhook_data.get('CallSid')
         event_type = webhook_data.get('EventType')
-        call_status = webhook_data.get('Status')
-        conversation_duration = webhook_data.get('ConversationDuration', 0)
-        recording_url = webhook_data.get('RecordingUrl')
-        start_time = webhook_data.get('StartTime')
-        end_time = webhook_data.get('EndTime')
-        custom_field = webhook_data.get('CustomField')
-        legs = webhook_data.get('Legs', [])
-        # Actual amount Exotel charged (real money), separate from internal credits.
-        exotel_price = parse_price(webhook_data.get('Price'))
 
         if not call_sid:
             print('Missing CallSid in webhook')
             return JsonResponse({'error': 'CallSid is required'}, status=400)
 
+        if settings.CALL_WEBHOOK_MODE == 'queue':
+            enqueue_webhook(webhook_data)
+            return JsonResponse({'success': True})
+
         # Log the webhook
-        execute_insert("""
+        webhook_log_id = execute_insert("""
             INSERT INTO webhook_logs (
                 call_sid, event_type, status, payload, created_at, processed
             ) VALUES (%s, %s, %s, %s, NOW(), 0)
-        """, [call_sid, event_type or 'unknown', call_status, json.dumps(webhook_data)])
-
-        # Get session
-        session = execute_query(
-            "SELECT * FROM call_sessions WHERE exotel_call_sid = %s",
-            [call_sid]
-        )
+        """, [call_sid, event_type or 'unknown', webhook_data.get('Status'), json.dumps(webhook_data)])
 
-        if not session:
-            print(f'Call session not found for CallSid: {call_sid}')
+        # Marks the webhook_logs row processed in the same transaction as the change
+        outcome = process_call_event(webhook_data, webhook_log_id)
+        if outcome == 'no_session':
             return JsonResponse({'message': 'Call session not found'}, status=200)
 
-        s = session[0]
-
-        # Parse CustomField if present
-        user_id = None
-        target_user_id = None
-        if custom_field:
-            try:
-                custom_data = json.loads(custom_field)
-                user_id = custom_data.get('userId')
-                target_user_id = custom_data.get('targetUserId')
-            except:
-                pass
-
-        duration = conversation_duration or 0
-        duration_minutes = (duration + 59) // 60 # Ceiling division
-        cost_per_minute = s.get('cost_per_minute', 1.0)
-        call_cost = duration_minutes * cost_per_minute if duration > 0 else 0
-
-        update_query = ""
-        update_params = []
-        should_create_call_logs = False
-        final_status = (call_status or 'unknown').lower()
-
-        # Handle different event types - matches Node.js switch/case exactly
-        if (event_type or '').lower() == 'answered':
-            final_status = 'in_progress'
-            start = start_time if start_time else datetime.now()
-            update_query = """
-                UPDATE call_sessions
-                SET status = 'in_progress', started_at = %s, updated_at = NOW()
-                WHERE id = %s
-            """
-            update_params = [start, s['id']]
-
-        elif (event_type or '').lower() == 'terminal':
-            final_status = (call_status or 'unknown').lower()
-            should_create_call_logs = final_status == 'completed'
-            end = end_time if end_time else datetime.now()
-
-            # Exotel's webhook doesn't always include Price. Pull it from the Call
-            # details API so the real per-call cost is never lost.
-            if exotel_price is None and call_sid:
-                details = get_call_details(call_sid)
-                if details:
-                    exotel_price = parse_price(details.get('Price'))
-
-            update_query = """
-                UPDATE call_sessions
-                SET status = %s, duration = %s, cost = %s, exotel_price = %s, ended_at = %s,
-                    recording_url = %s, conversation_duration = %s,
-                    leg1_status = %s, leg1_duration = %s,
-                    leg2_status = %s, leg2_duration = %s,
-                    updated_at = NOW()
-                WHERE id = %s
-            """
-            update_params = [
-                final_status,
-                duration,
-                call_cost,
-                exotel_price,
-                end,
-                recording_url or None,
-                conversation_duration or 0,
-                legs[0].get('Status') if len(legs) > 0 else None,
-                legs[0].get('OnCallDuration', 0) if len(legs) > 0 else 0,
-                legs[1].get('Status') if len(legs) > 1 else None,
-                legs[1].get('OnCallDuration', 0) if len(legs) > 1 else 0,
-                s['id']
-            ]
-        else:
-            print(f'Unknown event type: {event_type}')
-            return JsonResponse({'success': True})
-
-        # Execute update query
-        if update_query:
-            execute_update(update_query, update_params)
-            print(f"Updated call session {s['id']} with status: {final_status}")
-
-        # Create call logs and deduct credits if completed
-        if should_create_call_logs and duration > 0:
-            print('Creating call logs for completed call')
-
-            # Create call logs
-            execute_insert("""
-                INSERT INTO call_logs (
-                    user_id, other_user_id, call_session_id, call_type,
-                    duration, cost, exotel_price, created_at
-                ) VALUES (%s, %s, %s, 'outgoing', %s, %s, %s, NOW())
-            """, [s['caller_id'], s['receiver_id'], s['id'], duration, call_cost, exotel_price])
-
-            execute_insert("""
-                INSERT INTO call_logs (
-                    user_id, other_user_id, call_session_id, call_type,
-                    duration, cost, exotel_price, created_at
-                ) VALUES (%s, %s, %s, 'incoming', %s, %s, %s, NOW())
-            """, [s['receiver_id'], s['caller_id'], s['id'], duration, call_cost, exotel_price])
-
-            # Only deduct credits if no database trigger handles it
-            has_trigger = getattr(settings, 'HAS_CREDIT_DEDUCTION_TRIGGER', False)
-            if not has_trigger:
-                # Deduct credits for caller
-                execute_update("""
-                    UPDATE user_call_credits
-                    SET credits_remaining = GREATEST(0, credits_remaining - %s),
-                        last_used_at = NOW(),
-                        updated_at = NOW()
-                    WHERE user_id = %s
-                      AND credits_remaining > 0
-                      AND expires_at > NOW()
-                    ORDER BY expires_at ASC
-                    LIMIT 1
-                """, [duration_minutes, s['caller_id']])
-
-                # Deduct credits for receiver
-                execute_update("""
-                    UPDATE user_call_credits
-                    SET credits_remaining = GREATEST(0, credits_remaining - %s),
-                        last_used_at = NOW(),
-                        updated_at = NOW()
-                    WHERE user_id = %s
-                      AND credits_remaining > 0
-                      AND expires_at > NOW()
-                    ORDER BY expires_at ASC
-                    LIMIT 1
-                """, [duration_minutes, s['receiver_id']])
-
-                # Log credit usage
-                execute_insert("""
-                    INSERT INTO exotel_credit_log (
-                        action, credits, user_id, call_session_id, reason, created_at
-                    ) VALUES
-                        ('used', %s, %s, %s, 'Call completed - caller', NOW()),
-                        ('used', %s, %s, %s, 'Call completed - receiver', NOW())
-                """, [
-                    duration_minutes, s['caller_id'], s['id'],
-                    duration_minutes, s['receiver_id'], s['id']
-                ])
-
-                print(f"Call logs created and credits deducted for session {s['id']}")
-            else:
-                print(f"Call logs created for session {s['id']} (credits handled by trigger)")
-
-        # Mark webhook as processed
-        execute_update(
-            "UPDATE webhook_logs SET processed = 1 WHERE call_sid = %s AND event_type = %s",
-            [call_sid, event_type]
-        )
-
         return JsonResponse({'success': True})
 
     except Exception as e:
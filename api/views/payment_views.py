@@ -1,39 +1,29 @@
 import json
-from django.http import JsonResponse
+from django.http import HttpResponse, JsonResponse
 from django.views.decorators.http import require_http_methods
 from django.views.decorators.csrf import csrf_exempt
 from api.utils import require_user
 from api.db_utils import execute_query, execute_insert
+from api.conditional import conditional_get
+from api.plan_catalogue import get_plan_catalogue
+
+
+def _plans_version(request):
+    return get_plan_catalogue()[1]
 
 
 @csrf_exempt
 @require_http_methods(["GET"])
+@conditional_get(_plans_version)
 def get_plans(request):
     """
     Get Active Plans (Public)
     GET /api/plans
+    Served from the per-worker catalogue cache (api/plan_catalogue.py)
     """
     try:
-        plans = execute_query("""
-            SELECT * FROM plans
-            WHERE is_active = 1
-            ORDER BY type, price ASC
-        """)
-
-        # Parse features
-        formatted_plans = []
-        for plan in plans:
-            plan_data = dict(plan)
-            if plan_data.get('features'):
-                plan_data['features'] = [
-                    f.strip() for f in plan_data['features'].split(',')
-                    if f.strip()
-                ]
-            else:
-                plan_data['features'] = None
-            formatted_plans.append(plan_data)
-
-        return JsonResponse({'plans': formatted_plans})
+        body, _ = get_plan_catalogue()
+        return HttpResponse(body, content_type='application/json')
 
     except Exception as e:
         print(f"Plans fetch error: {e}")
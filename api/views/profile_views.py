@@ -4,6 +4,8 @@ from django.views.decorators.http import require_http_methods
 from django.views.decorators.csrf import csrf_exempt
 from api.utils import require_user
 from api.db_utils import execute_query, execute_insert, execute_update
+from api.conditional import conditional_get, stamp
+from api.profile_completeness import IS_COMPLETE_SQL, refresh_profile_complete
 
 @csrf_exempt
 @require_http_methods(["POST"])
@@ -51,6 +53,7 @@ def create_profile(request):
             data.get('about_me'), data.get('partner_preferences'),
             data.get('profile_photo')
         ])
+        refresh_profile_complete(user_id)
 
         return JsonResponse({'success': True})
 
@@ -89,13 +92,14 @@ def edit_profile(request):
             return JsonResponse({'error': 'Profile not found'}, status=404)
 
         # Update profile
-        execute_update("""
+        execute_update(f"""
             UPDATE user_profiles SET
                 age = %s, gender = %s, height = %s, weight = %s, caste = %s,
                 religion = %s, mother_tongue = %s, marital_status = %s,
                 education = %s, occupation = %s, income = %s, state = %s,
                 city = %s, family_type = %s, family_status = %s, about_me = %s,
-                partner_preferences = %s, profile_photo = %s, updated_at = NOW()
+                partner_preferences = %s, profile_photo = %s, updated_at = NOW(),
+                is_complete = {IS_COMPLETE_SQL}
             WHERE user_id = %s
         """, [
             data['age'], data['gender'], data.get('height'), data.get('weight'),
@@ -114,9 +118,18 @@ def edit_profile(request):
         return JsonResponse({'error': 'Internal server error'}, status=500)
 
 
+def _my_profile_version(request):
+    return stamp("""
+        SELECT id, COALESCE(updated_at, created_at) as changed
+        FROM user_profiles
+        WHERE user_id = %s
+    """, [request.user_data['userId']])
+
+
 @csrf_exempt
 @require_http_methods(["GET"])
 @require_user
+@conditional_get(_my_profile_version)
 def my_profile(request):
     """
     Get My Profile
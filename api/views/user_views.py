@@ -1,55 +1,180 @@
 import json
+from django.db import transaction
 from django.http import JsonResponse
 from django.views.decorators.http import require_http_methods
 from django.views.decorators.csrf import csrf_exempt
-from api.utils import require_user, verify_password, hash_password
+from api.utils import require_user, verify_password, hash_password, create_jwt_token, password_busy_response
+from api.password_hashing import PasswordHasherBusy
 from api.db_utils import execute_query, execute_insert, execute_update
+from api.conditional import conditional_get, stamp
+from api.entitlements import VIEW_DETAILS_SQL, get_entitlements
+from api.token_revocations import revoke_user_tokens
+from api.pagination import InvalidPageParam, decode_cursor, encode_cursor, parse_bool, parse_limit
 
 # ==================== MATCHES ====================
+# Profile fields returned by the match / profile detail endpoints
+_PROFILE_DETAIL_COLUMNS = """
+    u.id, u.name, u.email, u.phone,
+    up.age, up.gender, up.height, up.weight, up.caste, up.religion,
+    up.mother_tongue, up.marital_status, up.education, up.occupation,
+    up.income, up.state, up.city, up.family_type, up.family_status,
+    up.about_me, up.partner_preferences, up.profile_photo,
+    up.created_at, up.updated_at
+"""
+
+
+# GET /api/user/matches fields: name -> (SQL expression, join it needs)
+_MATCH_FIELDS = {
+    'id': ('u.id', None),
+    'name': ('u.name', None),
+    'email': ('u.email', None),
+    'phone': ('u.phone', None),
+    **{column: (f'up.{column}', None) for column in (
+        'age', 'gender', 'height', 'weight', 'caste', 'religion',
+        'mother_tongue', 'marital_status', 'education', 'occupation',
+        'income', 'state', 'city', 'family_type', 'family_status',
+        'about_me', 'partner_preferences', 'profile_photo',
+    )},
+    'matched_at': ('m.created_at', None),
+    'created_by_admin': ('m.created_by_admin', None),
+    'matched_by_admin_name': ('admin_user.name', 'admin_user'),
+    'i_blocked_them': ('CASE WHEN ub_me.id IS NOT NULL THEN 1 ELSE 0 END', 'ub_me'),
+    'they_blocked_me': ('CASE WHEN ub_them.id IS NOT NULL THEN 1 ELSE 0 END', 'ub_them'),
+    'blocked_by_me_at': ('ub_me.created_at', 'ub_me'),
+    'blocked_me_at': ('ub_them.created_at', 'ub_them'),
+    'call_allowed': ('COALESCE(ub_me.call_allowed, 0)', 'ub_me'),
+}
+
+# Optional joins, in the order they are added, with how many user_id params each takes
+_MATCH_JOINS = {
+    'admin_user': ('LEFT JOIN users admin_user ON m.created_by_admin = admin_user.id', 0),
+    'ub_me': ('LEFT JOIN user_blocks ub_me ON ub_me.blocker_id = %s AND ub_me.blocked_id = u.id', 1),
+    'ub_them': ('LEFT JOIN user_blocks ub_them ON ub_them.blocker_id = u.id AND ub_them.blocked_id = %s', 1),
+}
+
+# Compact shape for the match list screen (`fields=card`, the default when paginating)
+_MATCH_CARD_FIELDS = (
+    'id', 'name', 'age', 'city', 'profile_photo', 'matched_at',
+    'i_blocked_them', 'they_blocked_me', 'call_allowed',
+)
+
+
+def _match_fields(value, default):
+    """Field names from a `fields` query value; id and matched_at are always included"""
+    if value in (None, ''):
+        names = list(default)
+    elif value == 'card':
+        names = list(_MATCH_CARD_FIELDS)
+    else:
+        names = [name.strip() for name in value.split(',') if name.strip()]
+        unknown = [name for name in names if name not in _MATCH_FIELDS]
+        if unknown:
+            raise InvalidPageParam(f"Unknown field(s): {', '.join(unknown)}")
+    for required in ('matched_at', 'id'):
+        if required not in names:
+            names.insert(0, required)
+    return names
+
+
+def _matches_version(request):
+    user_id = request.user_data['userId']
+    return stamp("""
+        SELECT COUNT(*) as matches, MAX(m.created_at) as last_matched,
+               MAX(COALESCE(up.updated_at, up.created_at)) as profiles_changed,
+               (SELECT CONCAT(COUNT(*), '/', COALESCE(MAX(COALESCE(b.updated_at, b.created_at)), ''))
+                FROM user_blocks b
+                WHERE b.blocker_id = %s OR b.blocked_id = %s) as blocks
+        FROM matches m
+        JOIN users u ON m.matched_user_id = u.id
+        JOIN user_profiles up ON u.id = up.user_id
+        WHERE m.user_id = %s AND u.status = 'active' AND up.status = 'approved'
+    """, [user_id, user_id, user_id])
+
+
 @csrf_exempt
 @require_http_methods(["GET"])
 @require_user
+@conditional_get(_matches_version)
 def user_matches(request):
     """
     Get User's Matches with Block Status
     GET /api/user/matches
+    Query (all optional):
+        fields=card|<name,name,...>  - columns to return (see _MATCH_FIELDS)
+        limit, cursor                - keyset pagination on (matched_at, id)
+        includeTotal=1               - also count all matches
+    Returns: { matches, total } with every field, or a page envelope
+             { matches, nextCursor, hasMore[, total] } with the card fields by
+             default when limit/cursor is given
     """
     try:
         user_id = request.user_data['userId']
-
-        query = """
-            SELECT
-                u.id, u.name, u.email, u.phone,
-                up.age, up.gender, up.height, up.weight, up.caste, up.religion,
-                up.mother_tongue, up.marital_status, up.education, up.occupation,
-                up.income, up.state, up.city, up.family_type, up.family_status,
-                up.about_me, up.partner_preferences, up.profile_photo,
-                m.created_at as matched_at, m.created_by_admin,
-                admin_user.name as matched_by_admin_name,
-                CASE WHEN ub_me.id IS NOT NULL THEN 1 ELSE 0 END as i_blocked_them,
-                CASE WHEN ub_them.id IS NOT NULL THEN 1 ELSE 0 END as they_blocked_me,
-                ub_me.created_at as blocked_by_me_at,
-                ub_them.created_at as blocked_me_at,
-                COALESCE(ub_me.call_allowed, 0) as call_allowed
+        paginate = 'limit' in request.GET or 'cursor' in request.GET
+        limit = parse_limit(request.GET.get('limit'), default=20, maximum=100)
+        fields = _match_fields(request.GET.get('fields'),
+                               _MATCH_CARD_FIELDS if paginate else _MATCH_FIELDS)
+
+        needed = {_MATCH_FIELDS[name][1] for name in fields}
+        joins, params = [], []
+        for alias, (join_sql, param_count) in _MATCH_JOINS.items():
+            if alias in needed:
+                joins.append(join_sql)
+                params += [user_id] * param_count
+
+        where = ["m.user_id = %s", "u.status = 'active'", "up.status = 'approved'"]
+        params.append(user_id)
+        if request.GET.get('cursor'):
+            cursor_matched_at, cursor_id = decode_cursor(request.GET['cursor'], 2)
+            where.append("(m.created_at < %s OR (m.created_at = %s AND m.id < %s))")
+            params += [cursor_matched_at, cursor_matched_at, cursor_id]
+
+        columns = ', '.join(f"{_MATCH_FIELDS[name][0]} as {name}" for name in fields)
+        query = f"""
+            SELECT {columns}, m.id as match_row_id
             FROM matches m
             JOIN users u ON m.matched_user_id = u.id
             JOIN user_profiles up ON u.id = up.user_id
-            LEFT JOIN users admin_user ON m.created_by_admin = admin_user.id
-            LEFT JOIN user_blocks ub_me ON ub_me.blocker_id = %s AND ub_me.blocked_id = u.id
-            LEFT JOIN user_blocks ub_them ON ub_them.blocker_id = u.id AND ub_them.blocked_id = %s
-            WHERE m.user_id = %s
-                AND u.status = 'active'
-                AND up.status = 'approved'
-            ORDER BY m.created_at DESC
+            {' '.join(joins)}
+            WHERE {' AND '.join(where)}
         """
 
-        matches = execute_query(query, [user_id, user_id, user_id])
-
-        return JsonResponse({
-            'matches': matches,
-            'total': len(matches)
-        })
+        if not paginate:
+            matches = execute_query(query + " ORDER BY m.created_at DESC", params)
+            for match in matches:
+                del match['match_row_id']
+            return JsonResponse({
+                'matches': matches,
+                'total': len(matches)
+            })
 
+        # One extra row tells us whether there is a next page.
+        rows = execute_query(query + " ORDER BY m.created_at DESC, m.id DESC LIMIT %s", params + [limit + 1])
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1]['matched_at'], rows[-1]['match_row_id']) if has_more else None
+        for row in rows:
+            del row['match_row_id']
+
+        response = {
+            'matches': rows,
+            'nextCursor': next_cursor,
+            'hasMore': has_more,
+        }
+
+        if parse_bool(request.GET.get('includeTotal')):
+            total = execute_query("""
+                SELECT COUNT(*) as total
+                FROM matches m
+                JOIN users u ON m.matched_user_id = u.id
+                JOIN user_profiles up ON u.id = up.user_id
+                WHERE m.user_id = %s AND u.status = 'active' AND up.status = 'approved'
+            """, [user_id])
+            response['total'] = total[0]['total'] if total else 0
+
+        return JsonResponse(response)
+
+    except InvalidPageParam as e:
+        return JsonResponse({'error': str(e)}, status=400)
     except Exception as e:
         print(f"User matches error: {e}")
         return JsonResponse({'error': 'Internal server error'}, status=500)
@@ -72,50 +197,33 @@ def get_match_details(request):
         if not matched_user_id:
             return JsonResponse({'error': 'Matched user ID is required'}, status=400)
 
-        # Check subscription
-        subscription = execute_query("""
-            SELECT us.*, p.can_view_details
-            FROM user_subscriptions us
-            JOIN plans p ON us.plan_id = p.id
-            WHERE us.user_id = %s
-                AND us.status = 'active'
-                AND p.type = 'normal'
-                AND us.expires_at > NOW()
-            ORDER BY us.expires_at DESC
+        # Plan check, match and profile in one round trip. The anchor row
+        # always comes back: m.id is NULL without a match, u.id is NULL when
+        # the matched user isn't active/approved.
+        profile = execute_query(f"""
+            SELECT {VIEW_DETAILS_SQL} as can_view_details, m.id as match_id,
+                   {_PROFILE_DETAIL_COLUMNS}
+            FROM (SELECT 1) anchor
+            LEFT JOIN matches m ON m.user_id = %s AND m.matched_user_id = %s
+            LEFT JOIN (users u JOIN user_profiles up
+                       ON u.id = up.user_id AND u.status = 'active' AND up.status = 'approved')
+                ON u.id = m.matched_user_id
             LIMIT 1
-        """, [user_id])
+        """, [user_id, user_id, matched_user_id])
+        profile_data = profile[0]
 
-        if not subscription or not subscription[0]['can_view_details']:
+        if not profile_data.pop('can_view_details'):
             return JsonResponse({
                 'error': 'Premium subscription required to view profile details'
             }, status=403)
 
-        # Verify match exists
-        match_check = execute_query(
-            "SELECT id FROM matches WHERE user_id = %s AND matched_user_id = %s",
-            [user_id, matched_user_id]
-        )
-
-        if not match_check:
+        if profile_data.pop('match_id') is None:
             return JsonResponse({'error': 'Match not found'}, status=404)
 
-        # Get profile
-        profile = execute_query("""
-            SELECT u.id, u.name, u.email, u.phone,
-                   up.age, up.gender, up.height, up.weight, up.caste, up.religion,
-                   up.mother_tongue, up.marital_status, up.education, up.occupation,
-                   up.income, up.state, up.city, up.family_type, up.family_status,
-                   up.about_me, up.partner_preferences, up.profile_photo,
-                   up.created_at, up.updated_at
-            FROM users u
-            JOIN user_profiles up ON u.id = up.user_id
-            WHERE u.id = %s AND u.status = 'active' AND up.status = 'approved'
-        """, [matched_user_id])
-
-        if not profile:
+        if profile_data['id'] is None:
             return JsonResponse({'error': 'Profile not found'}, status=404)
 
-        return JsonResponse({'profile': profile[0]})
+        return JsonResponse({'profile': profile_data})
 
     except Exception as e:
         print(f"Match profile error: {e}")
@@ -133,51 +241,30 @@ def profile_details(request, profile_id):
     try:
         user_id = request.user_data['userId']
 
-        # Check subscription
-        subscription = execute_query("""
-            SELECT us.*, p.can_view_details
-            FROM user_subscriptions us
-            JOIN plans p ON us.plan_id = p.id
-            WHERE us.user_id = %s
-                AND us.status = 'active'
-                AND p.type = 'normal'
-                AND us.expires_at > NOW()
-            ORDER BY us.expires_at DESC
-            LIMIT 1
-        """, [user_id])
+        # Plan check, profile and match status (either direction) in one
+        # round trip; u.id is NULL when the profile isn't active/approved
+        profile = execute_query(f"""
+            SELECT {VIEW_DETAILS_SQL} as can_view_details,
+                   {_PROFILE_DETAIL_COLUMNS},
+                   EXISTS(SELECT 1 FROM matches WHERE user_id = %s AND matched_user_id = u.id)
+                   OR EXISTS(SELECT 1 FROM matches WHERE user_id = u.id AND matched_user_id = %s)
+                   as is_matched
+            FROM (SELECT 1) anchor
+            LEFT JOIN (users u JOIN user_profiles up
+                       ON u.id = up.user_id AND u.status = 'active' AND up.status = 'approved')
+                ON u.id = %s
+        """, [user_id, user_id, user_id, profile_id])
+        profile_data = profile[0]
 
-        if not subscription or not subscription[0]['can_view_details']:
+        if not profile_data.pop('can_view_details'):
             return JsonResponse({
                 'error': 'Premium subscription required to view profile details'
             }, status=403)
 
-        # Check if matched
-        match_check = execute_query("""
-            SELECT 1 FROM matches
-            WHERE (user_id = %s AND matched_user_id = %s)
-               OR (user_id = %s AND matched_user_id = %s)
-        """, [user_id, profile_id, profile_id, user_id])
-
-        is_matched = len(match_check) > 0
-
-        # Get profile
-        profile = execute_query("""
-            SELECT u.id, u.name, u.email, u.phone,
-                   up.age, up.gender, up.height, up.weight, up.caste, up.religion,
-                   up.mother_tongue, up.marital_status, up.education, up.occupation,
-                   up.income, up.state, up.city, up.family_type, up.family_status,
-                   up.about_me, up.partner_preferences, up.profile_photo,
-                   up.created_at, up.updated_at
-            FROM users u
-            JOIN user_profiles up ON u.id = up.user_id
-            WHERE u.id = %s AND u.status = 'active' AND up.status = 'approved'
-        """, [profile_id])
-
-        if not profile:
+        if profile_data['id'] is None:
             return JsonResponse({'error': 'Profile not found'}, status=404)
 
-        profile_data = profile[0]
-        profile_data['is_matched'] = is_matched
+        profile_data['is_matched'] = bool(profile_data['is_matched'])
 
         return JsonResponse({'profile': profile_data})
 
@@ -379,31 +466,17 @@ def subscription_status(request):
     try:
         user_id = request.user_data['userId']
 
-        # Check normal subscription
-        normal_sub = execute_query("""
-            SELECT us.*, p.name as plan_name, p.price, p.duration_months,
-                   p.can_view_details, p.can_make_calls
-            FROM user_subscriptions us
-            JOIN plans p ON us.plan_id = p.id
-            WHERE us.user_id = %s
-                AND us.status = 'active'
-                AND p.type = 'normal'
-                AND us.expires_at > NOW()
-            ORDER BY us.expires_at DESC
-            LIMIT 1
-        """, [user_id])
+        # Balances are read fresh: settlement on another worker or container
+        # can't clear this process's cached snapshot
+        entitlements = get_entitlements(user_id, fresh=True)
+        normal_sub = entitlements['normal_plan']
 
-        # Check call credits
-        call_credits = execute_query("""
-            SELECT uc.*, p.name as plan_name, p.price, p.call_credits
-            FROM user_call_credits uc
-            JOIN plans p ON uc.plan_id = p.id
-            WHERE uc.user_id = %s
-                AND uc.credits_remaining > 0
-                AND uc.expires_at > NOW()
-            ORDER BY uc.expires_at DESC
-            LIMIT 1
-        """, [user_id])
+        # Latest-expiring plan allocation that still has credits
+        active_credits = [
+            c for c in entitlements['credits']
+            if c['plan_id'] is not None and c['credits_remaining'] > 0
+        ]
+        call_credits = active_credits[-1] if active_credits else None
 
         # Check profile completion
         profile = execute_query("""
@@ -423,7 +496,7 @@ def subscription_status(request):
 
         normal_plan_data = None
         if normal_sub:
-            sub = normal_sub[0]
+            sub = normal_sub
             expires_at = sub['expires_at']
             days_left = (expires_at - now).days if expires_at > now else 0
 
@@ -438,7 +511,7 @@ def subscription_status(request):
 
         call_plan_data = None
         if call_credits:
-            cc = call_credits[0]
+            cc = call_credits
             expires_at = cc['expires_at']
             days_left = (expires_at - now).days if expires_at > now else 0
 
@@ -463,8 +536,8 @@ def subscription_status(request):
         return JsonResponse({
             'subscription_status': {
                 'is_premium': normal_plan_data is not None,
-                'can_view_details': normal_sub[0]['can_view_details'] if normal_sub else False,
-                'can_make_calls': normal_sub[0]['can_make_calls'] if normal_sub else False,
+                'can_view_details': normal_sub['can_view_details'] if normal_sub else False,
+                'can_make_calls': normal_sub['can_make_calls'] if normal_sub else False,
                 'has_call_credits': call_plan_data is not None,
                 'profile_complete': profile_complete,
                 'normal_plan': normal_plan_data,
@@ -489,52 +562,36 @@ def active_plan(request):
     try:
         user_id = request.user_data['userId']
 
+        from datetime import datetime
+        today = datetime.now().date()
+        entitlements = get_entitlements(user_id, fresh=True)
+
         # Normal plan
-        normal_plan = execute_query("""
-            SELECT p.name AS plan_name, p.price, p.duration_months,
-                   us.expires_at, DATEDIFF(us.expires_at, NOW()) AS days_left, us.status
-            FROM user_subscriptions us
-            JOIN plans p ON us.plan_id = p.id
-            WHERE us.user_id = %s
-                AND us.status = 'active'
-                AND us.expires_at > NOW()
-            ORDER BY us.expires_at DESC
-            LIMIT 1
-        """, [user_id])
+        np = entitlements['normal_plan']
 
-        # Call plan
-        call_plan = execute_query("""
-            SELECT p.name AS plan_name, p.price, ucc.credits_remaining,
-                   ucc.expires_at, DATEDIFF(ucc.expires_at, NOW()) AS days_left, p.call_credits
-            FROM user_call_credits ucc
-            JOIN plans p ON ucc.plan_id = p.id
-            WHERE ucc.user_id = %s
-                AND ucc.expires_at > NOW()
-            ORDER BY ucc.expires_at DESC
-            LIMIT 1
-        """, [user_id])
+        # Call plan: latest-expiring allocation bought with a plan
+        call_plans = [c for c in entitlements['credits'] if c['plan_id'] is not None]
+        cp = call_plans[-1] if call_plans else None
 
         normal_plan_data = None
-        if normal_plan:
-            np = normal_plan[0]
+        if np:
             normal_plan_data = {
                 'plan_name': np['plan_name'],
                 'price': float(np['price']),
                 'duration_months': np['duration_months'],
                 'expires_at': str(np['expires_at']),
-                'daysLeft': max(0, np['days_left']),
-                'isActive': np['status'] == 'active'
+                'daysLeft': max(0, (np['expires_at'].date() - today).days),
+                'isActive': True
             }
 
         call_plan_data = None
-        if call_plan:
-            cp = call_plan[0]
+        if cp:
             call_plan_data = {
                 'plan_name': cp['plan_name'],
                 'price': float(cp['price']),
                 'credits_remaining': cp['credits_remaining'],
                 'expires_at': str(cp['expires_at']),
-                'daysLeft': max(0, cp['days_left']),
+                'daysLeft': max(0, (cp['expires_at'].date() - today).days),
                 'isActive': cp['credits_remaining'] > 0
             }
 
@@ -561,16 +618,8 @@ def call_credits(request):
     try:
         user_id = request.user_data['userId']
 
-        # Get active credits
-        credits = execute_query("""
-            SELECT uc.id, uc.credits_remaining, uc.credits_purchased,
-                   uc.expires_at, uc.admin_allocated, uc.allocation_notes,
-                   uc.last_used_at, p.name as plan_name, p.duration_months
-            FROM user_call_credits uc
-            LEFT JOIN plans p ON uc.plan_id = p.id
-            WHERE uc.user_id = %s AND uc.expires_at > NOW()
-            ORDER BY uc.expires_at ASC
-        """, [user_id])
+        # Get active credits (fresh, like subscription_status)
+        credits = get_entitlements(user_id, fresh=True)['credits']
 
         # Calculate totals
         total_remaining = sum(c['credits_remaining'] for c in credits)
@@ -665,17 +714,30 @@ def change_password(request):
         # Hash new password
         hashed_new_password = hash_password(new_password)
 
-        # Update password and track how many times the user has changed it
-        execute_update(
-            "UPDATE users SET password = %s, password_change_count = COALESCE(password_change_count, 0) + 1 WHERE id = %s",
-            [hashed_new_password, user_id]
-        )
+        # Update password (tracking how many times the user has changed it) and
+        # sign out every session together: neither happens without the other
+        with transaction.atomic():
+            execute_update(
+                "UPDATE users SET password = %s, password_change_count = COALESCE(password_change_count, 0) + 1 WHERE id = %s",
+                [hashed_new_password, user_id]
+            )
+            revoke_user_tokens(user_id)
+
+        # Hand this session a fresh token
+        token = create_jwt_token({
+            'id': user_id,
+            'email': request.user_data.get('email'),
+            'role': request.user_data.get('role', 'user')
+        })
 
         return JsonResponse({
             'success': True,
-            'message': 'Password updated successfully'
+            'message': 'Password updated successfully',
+            'token': token
         })
 
+    except PasswordHasherBusy:
+        return password_busy_response()
     except Exception as e:
         print(f"Change password error: {e}")
         return JsonResponse({'error': 'Internal server error'}, status=500)
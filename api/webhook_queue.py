@@ -0,0 +1,144 @@
+"""
+DB-backed queue for Exotel call webhooks (CALL_WEBHOOK_MODE=queue).
+
+POST /api/calls/webhook stores the raw payload as a webhook_logs row with
+queued = 1 and acknowledges straight away; `manage.py process_webhooks` drains
+the queue and applies each event with api.call_events.process_call_event.
+
+Guarantees, per CallSid:
+  * Ordering - events are applied in arrival order (webhook_logs.id). A row is
+    only claimable when no earlier queued row for the same CallSid is still
+    pending, so a failing event holds back the ones behind it until it
+    succeeds or is dead-lettered.
+  * Retries - each claim counts as an attempt. Failures (including a CallSid
+    with no session yet) are retried with exponential backoff; after
+    WEBHOOK_QUEUE_MAX_ATTEMPTS the row is dead-lettered (processed = 2,
+    last_error kept) and the CallSid unblocks.
+  * Crash safety - a claim is a lease (locked_until). If a worker dies, the
+    row becomes claimable again once the lease expires, so delivery is
+    at-least-once.
+
+processed: 0 = pending, 1 = done, 2 = dead-lettered.
+"""
+import json
+
+from django.conf import settings
+
+from api.call_events import process_call_event
+from api.db_utils import execute_insert, execute_query, execute_update
+
+PENDING, DONE, DEAD = 0, 1, 2
+
+_MAX_BACKOFF_SECONDS = 600
+
+
+def enqueue_webhook(webhook_data):
+    """Persist a parsed webhook payload for the worker; returns the webhook_logs id"""
+    return execute_insert("""
+        INSERT INTO webhook_logs (
+            call_sid, event_type, status, payload, created_at, processed, queued
+        ) VALUES (%s, %s, %s, %s, NOW(), 0, 1)
+    """, [
+        webhook_data.get('CallSid'),
+        webhook_data.get('EventType') or 'unknown',
+        webhook_data.get('Status'),
+        json.dumps(webhook_data),
+    ])
+
+
+def claim_batch(limit):
+    """
+    Lease up to `limit` rows that are due and first in line for their CallSid.
+
+    Candidates are picked with a plain SELECT and then leased one by one with a
+    compare-and-set on locked_until, so concurrent workers never share a row.
+    """
+    candidates = execute_query("""
+        SELECT w.id
+        FROM webhook_logs w
+        WHERE w.queued = 1 AND w.processed = 0
+          AND (w.next_attempt_at IS NULL OR w.next_attempt_at <= NOW())
+          AND (w.locked_until IS NULL OR w.locked_until < NOW())
+          AND NOT EXISTS (
+              SELECT 1 FROM webhook_logs e
+              WHERE e.call_sid = w.call_sid
+                AND e.queued = 1 AND e.processed = 0
+                AND e.id < w.id
+          )
+        ORDER BY w.id
+        LIMIT %s
+    """, [limit])
+
+    claimed = []
+    for row in candidates:
+        leased = execute_update("""
+            UPDATE webhook_logs
+            SET locked_until = NOW() + INTERVAL %s SECOND, attempts = attempts + 1
+            WHERE id = %s AND processed = 0
+              AND (next_attempt_at IS NULL OR next_attempt_at <= NOW())
+              AND (locked_until IS NULL OR locked_until < NOW())
+        """, [settings.WEBHOOK_QUEUE_LEASE_SECONDS, row['id']])
+        if leased:
+            claimed.append(row['id'])
+
+    if not claimed:
+        return []
+    placeholders = ', '.join(['%s'] * len(claimed))
+    return execute_query(f"""
+        SELECT id, call_sid, event_type, payload, attempts
+        FROM webhook_logs
+        WHERE id IN ({placeholders})
+        ORDER BY id
+    """, claimed)
+
+
+def _finish(row_id, processed, error=None):
+    execute_update("""
+        UPDATE webhook_logs
+        SET processed = %s, locked_until = NULL, last_error = %s
+        WHERE id = %s
+    """, [processed, error, row_id])
+
+
+def _retry_later(row, error):
+    if row['attempts'] >= settings.WEBHOOK_QUEUE_MAX_ATTEMPTS:
+        print(f"[WEBHOOK QUEUE] Dead-lettering webhook {row['id']} after {row['attempts']} attempts: {error}")
+        _finish(row['id'], DEAD, error)
+        return
+
+    delay = min(_MAX_BACKOFF_SECONDS, 5 * 2 ** (row['attempts'] - 1))
+    execute_update("""
+        UPDATE webhook_logs
+        SET locked_until = NULL, next_attempt_at = NOW() + INTERVAL %s SECOND, last_error = %s
+        WHERE id = %s
+    """, [delay, error, row['id']])
+
+
+def process_row(row):
+    """Apply one claimed row and record the outcome; returns True if it succeeded"""
+    try:
+        outcome = process_call_event(json.loads(row['payload']), row['id'])
+    except Exception as e:
+        print(f"[WEBHOOK QUEUE] Webhook {row['id']} ({row['call_sid']}) failed: {e}")
+        _retry_later(row, str(e)[:1000])
+        return False
+
+    if outcome == 'no_session':
+        # Exotel can call back before initiate_call has stored the session row
+        _retry_later(row, 'Call session not found')
+        return False
+
+    _finish(row['id'], DONE, None if outcome == 'processed' else outcome)
+    return True
+
+
+def queue_depth():
+    """Pending / dead-lettered counts for monitoring"""
+    rows = execute_query("""
+        SELECT processed, COUNT(*) as count
+        FROM webhook_logs
+        WHERE queued = 1 AND processed IN (0, 2)
+        GROUP BY processed
+    """)
+    counts = {row['processed']: row['count'] for row in rows}
+    return {'pending': counts.get(PENDING, 0), 'dead': counts.get(DEAD, 0)}
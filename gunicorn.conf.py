@@ -0,0 +1,13 @@
+"""
+gunicorn settings for the web container (see the Dockerfile CMD).
+
+Background threads that belong to web workers only are started here rather
+than at import time, so management commands (migrate, test, runworker,
+process_webhooks) that load the same modules never start them.
+"""
+
+
+def post_worker_init(worker):
+    # The app (and Django) is loaded by now
+    from api.call_sync import start_sync_job
+    start_sync_job()
@@ -64,9 +64,34 @@ DATABASES = {
         'OPTIONS': {
             'charset': 'utf8mb4',
             'init_command': "SET sql_mode='STRICT_TRANS_TABLES'",
-        }
+        },
+        # Keep Django's own connection (used inside transaction.atomic) alive
+        # between requests instead of reconnecting every time.
+        'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', '60')),
+        'CONN_HEALTH_CHECKS': True,
+    }
+}
+
+# Connection pool for the raw-SQL helpers in api.db_utils (see api/db_pool.py)
+DB_POOL_ENABLED = os.getenv('DB_POOL_ENABLED', 'true').lower() == 'true'
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', '5'))               # connections per worker
+DB_POOL_MAX_AGE = int(os.getenv('DB_POOL_MAX_AGE', '300'))       # seconds before a connection is recycled
+DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', '10'))      # seconds to wait for a free connection
+DB_POOL_HEALTH_CHECKS = os.getenv('DB_POOL_HEALTH_CHECKS', 'true').lower() == 'true'
+
+# Cache (per-worker memory by default; point CACHE_BACKEND at a shared backend to share it)
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', 'matrimony-default'),
     }
 }
+ADMIN_STATS_CACHE_TTL = int(os.getenv('ADMIN_STATS_CACHE_TTL', '30'))   # seconds; 0 disables
+# Longest a user's plan/credit snapshot is cached (api/entitlements.py); 0 disables.
+# Use a shared CACHE_BACKEND so invalidations reach every worker.
+ENTITLEMENT_CACHE_TTL = int(os.getenv('ENTITLEMENT_CACHE_TTL', '60'))
+# Longest a worker serves its cached GET /api/plans body (api/plan_catalogue.py)
+PLAN_CATALOGUE_TTL = int(os.getenv('PLAN_CATALOGUE_TTL', '300'))
 
 # REST Framework
 REST_FRAMEWORK = {
@@ -82,6 +107,17 @@ CORS_ALLOW_CREDENTIALS = True
 # JWT Settings
 JWT_SECRET = os.getenv('JWT_SECRET', 'fallback-secret')
 JWT_ALGORITHM = 'HS256'
+JWT_EXPIRY_DAYS = int(os.getenv('JWT_EXPIRY_DAYS', '7'))
+JWT_CACHE_SIZE = int(os.getenv('JWT_CACHE_SIZE', '10000'))                  # verified tokens kept per worker; 0 disables
+JWT_REVOCATION_REFRESH = float(os.getenv('JWT_REVOCATION_REFRESH', '2'))    # seconds between revocation list pulls
+
+# bcrypt cost and limits (see api/password_hashing.py)
+BCRYPT_ROUNDS = int(os.getenv('BCRYPT_ROUNDS', '12'))               # work factor; `manage.py benchmark_bcrypt` to tune
+BCRYPT_THREADS = int(os.getenv('BCRYPT_THREADS', '1'))              # hashing threads per process
+BCRYPT_QUEUE_SIZE = int(os.getenv('BCRYPT_QUEUE_SIZE', '4'))        # calls allowed to wait per process
+BCRYPT_HOST_SLOTS = int(os.getenv('BCRYPT_HOST_SLOTS', '2'))        # processes hashing at once per host; 0 = no limit
+BCRYPT_MAX_WAIT_MS = int(os.getenv('BCRYPT_MAX_WAIT_MS', '500'))    # wait for a slot before answering 503
+BCRYPT_SLOT_DIR = os.getenv('BCRYPT_SLOT_DIR', '')                  # slot lock files; default: system temp dir
 
 # Exotel Settings
 EXOTEL_SID = os.getenv('EXOTEL_SID')
@@ -90,6 +126,12 @@ EXOTEL_API_TOKEN = os.getenv('EXOTEL_API_TOKEN')
 EXOTEL_SUBDOMAIN = os.getenv('EXOTEL_SUBDOMAIN')
 EXOTEL_VIRTUAL_NUMBER = os.getenv('EXOTEL_VIRTUAL_NUMBER')
 
+# Exotel HTTP client (see api/exotel_client.py)
+EXOTEL_HTTP_POOL_SIZE = int(os.getenv('EXOTEL_HTTP_POOL_SIZE', '10'))              # keep-alive connections per process
+EXOTEL_HTTP_RETRIES = int(os.getenv('EXOTEL_HTTP_RETRIES', '2'))                   # extra attempts, with jittered backoff
+EXOTEL_BREAKER_THRESHOLD = int(os.getenv('EXOTEL_BREAKER_THRESHOLD', '5'))         # consecutive failures before failing fast
+EXOTEL_BREAKER_RESET_SECONDS = int(os.getenv('EXOTEL_BREAKER_RESET_SECONDS', '30'))  # then let one trial request through
+
 # Cloudinary
 CLOUDINARY_CLOUD_NAME = os.getenv('CLOUDINARY_CLOUD_NAME')
 CLOUDINARY_API_KEY = os.getenv('CLOUDINARY_API_KEY')
@@ -101,6 +143,33 @@ APP_URL = os.getenv('APP_URL', 'http://localhost:8050')
 # Credit Deduction
 HAS_CREDIT_DEDUCTION_TRIGGER = os.getenv('HAS_CREDIT_DEDUCTION_TRIGGER', 'false').lower() == 'true'
 
+# Call webhooks: 'inline' applies them in the request, 'queue' stores and acks them
+# and leaves the work to `manage.py process_webhooks` (see api/webhook_queue.py)
+CALL_WEBHOOK_MODE = os.getenv('CALL_WEBHOOK_MODE', 'inline').lower()
+WEBHOOK_QUEUE_WORKERS = int(os.getenv('WEBHOOK_QUEUE_WORKERS', '4'))              # threads per worker process
+WEBHOOK_QUEUE_BATCH_SIZE = int(os.getenv('WEBHOOK_QUEUE_BATCH_SIZE', '20'))       # rows claimed per poll
+WEBHOOK_QUEUE_POLL_INTERVAL = float(os.getenv('WEBHOOK_QUEUE_POLL_INTERVAL', '1'))  # seconds between empty polls
+WEBHOOK_QUEUE_LEASE_SECONDS = int(os.getenv('WEBHOOK_QUEUE_LEASE_SECONDS', '60'))  # claim lifetime before a retry
+WEBHOOK_QUEUE_MAX_ATTEMPTS = int(os.getenv('WEBHOOK_QUEUE_MAX_ATTEMPTS', '8'))     # then dead-letter (processed = 2)
+
+# Background jobs (see api/jobs.py), run by `manage.py runworker`
+BACKGROUND_JOB_WORKERS = int(os.getenv('BACKGROUND_JOB_WORKERS', '4'))              # threads per worker process
+BACKGROUND_JOB_POLL_INTERVAL = float(os.getenv('BACKGROUND_JOB_POLL_INTERVAL', '1'))  # seconds between empty polls
+BACKGROUND_JOB_MAX_ATTEMPTS = int(os.getenv('BACKGROUND_JOB_MAX_ATTEMPTS', '8'))    # default, then status 'dead'
+BACKGROUND_JOB_RETRY_DELAY = int(os.getenv('BACKGROUND_JOB_RETRY_DELAY', '30'))     # first retry, doubling after
+BACKGROUND_JOB_CLAIM_SCAN = int(os.getenv('BACKGROUND_JOB_CLAIM_SCAN', '20'))       # due rows looked at per claim
+
+# Stuck-call reconciler (see api/call_sync.py). 'embedded' runs the scheduler in
+# every web worker with one lease-elected leader; 'off' leaves it to
+# `manage.py sync_stuck_calls --loop`
+CALL_SYNC_SCHEDULER = os.getenv('CALL_SYNC_SCHEDULER', 'embedded').lower()
+CALL_SYNC_INTERVAL = int(os.getenv('CALL_SYNC_INTERVAL', '300'))        # seconds between runs
+CALL_SYNC_CONCURRENCY = int(os.getenv('CALL_SYNC_CONCURRENCY', '8'))    # parallel Exotel call-detail fetches
+CALL_SYNC_RATE_LIMIT = float(os.getenv('CALL_SYNC_RATE_LIMIT', '10'))   # Exotel requests per second (0 = unlimited)
+CALL_SYNC_BATCH_SIZE = int(os.getenv('CALL_SYNC_BATCH_SIZE', '50'))     # calls settled per transaction
+CALL_SYNC_MAX_CALLS = int(os.getenv('CALL_SYNC_MAX_CALLS', '2000'))     # stuck sessions looked at per run
+CALL_SYNC_MAX_ATTEMPTS = int(os.getenv('CALL_SYNC_MAX_ATTEMPTS', '50'))  # looks at one session before giving up on it
+
 # Language and Timezone
 LANGUAGE_CODE = 'en-us'
 TIME_ZONE = 'UTC'